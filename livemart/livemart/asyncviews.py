@@ -0,0 +1,106 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from rest_framework.exceptions import MethodNotAllowed
+from rest_framework.response import Response
+
+# =========================================
+# === ASYNC READ VIEWS (ASGI)
+# =========================================
+#
+# GET /api/async/products/       same payload as /api/products/
+# GET /api/async/products/7/     same payload as /api/products/7/
+#
+# Under livemart.asgi every DRF view runs in a worker thread for its whole
+# duration. The async twins below are `async def` Django views that reuse
+# the ViewSet's queryset, filters, serializers and renderers, but read the
+# rows with the async ORM, so a request only occupies a thread for the
+# moment a query actually runs. They also work under WSGI (Django runs
+# async views in a private event loop there), just without the benefit.
+#
+# Compare the two deployments with `manage.py bench_async_reads`.
+
+
+class AsyncReadMixin:
+    """
+    Adds async `list` / `retrieve` to a read-only ViewSet:
+
+        path('api/async/products/', ProductViewSet.as_async_view('list')),
+
+    Mixins layer on it the same way they do on the sync actions:
+    `aget_list_response()` is the async counterpart of `get_list_response()`.
+    Anything without an async implementation (pagination, ?stream=1) falls
+    back to the sync code in a worker thread.
+    """
+
+    @classmethod
+    def as_async_view(cls, action, **initkwargs):
+        async def view(request, *args, **kwargs):
+            self = cls(**initkwargs)
+            self.action_map = {'get': action}
+            self.action = action
+            self.get = self.head = getattr(self, f'async_{action}')
+            return await self.adispatch(request, *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, *args, **kwargs):
+        """ APIView.dispatch() with an awaited handler. """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            handler = getattr(self, request.method.lower(), None)
+            if handler is None:
+                raise MethodNotAllowed(request.method)
+            # Authentication and throttles may read the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        if isinstance(self.response, Response):
+            # Render here: Django would otherwise hop to a thread just for this
+            self.response.render()
+        return self.response
+
+    async def aget_filtered_queryset(self):
+        # ?region= and filterset validation may query, so build it in one sync hop
+        return await sync_to_async(lambda: self.filter_queryset(self.get_queryset()))()
+
+    async def async_list(self, request, *args, **kwargs):
+        return await self.aget_list_response(await self.aget_filtered_queryset())
+
+    async def aget_list_response(self, queryset):
+        if self.paginator is not None:
+            return await sync_to_async(self.get_list_response)(queryset)
+        rows = [row async for row in queryset]
+        return Response(self.get_serializer(rows, many=True).data)
+
+    def get_list_response(self, queryset):
+        """ Same body as ListModelMixin.list, minus the queryset lookup. """
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        queryset = await self.aget_filtered_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, DjangoValidationError):
+            # Same outcomes as generics.get_object_or_404
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        self.check_object_permissions(request, instance)
+        return Response(self.get_serializer(instance).data)
@@ -0,0 +1,102 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+# --- Conditional GET (ETag) for list endpoints ---
+
+
+class ConditionalListMixin:
+    """
+    Adds an ETag validator to a ViewSet's `list` action.
+
+    The ETag comes from ONE aggregate query over the filtered queryset
+    (row count + newest `updated_at`), so a client that already has the
+    current data gets `304 Not Modified` without a single row being
+    serialized.
+
+    Lists send no Last-Modified: the newest `updated_at` doesn't move when a
+    row is deleted or leaves the filter, so If-Modified-Since would answer
+    304 for a list that shrank. The row count in the ETag covers that.
+
+    `conditional_timestamp_fields` lists every timestamp that can change the
+    rendered payload, e.g. ['updated_at', 'product__updated_at'] for an
+    Inventory list that embeds its Product.
+    """
+    conditional_timestamp_fields = ['updated_at']
+
+    def get_conditional_timestamp_fields(self):
+        """ Override to vary the timestamps per request (e.g. by sort order). """
+        return self.conditional_timestamp_fields
+
+    def get_extra_conditional_stamps(self):
+        """
+        Override to add timestamps that are not columns of the listed rows,
+        e.g. when rows can leave the result set without being modified.
+        """
+        return []
+
+    def get_list_validators(self, queryset):
+        """ Returns the ETag for the given queryset. """
+        aggregates = self.get_validator_aggregates()
+        return self.build_list_validators(aggregates, queryset.order_by().aggregate(**aggregates))
+
+    async def aget_list_validators(self, queryset):
+        """ get_list_validators() for async views (see livemart.asyncviews). """
+        aggregates = self.get_validator_aggregates()
+        return self.build_list_validators(aggregates, await queryset.order_by().aaggregate(**aggregates))
+
+    def get_validator_aggregates(self):
+        return {
+            'row_count': Count('pk'),
+            **{f'max_{index}': Max(field) for index, field in enumerate(self.get_conditional_timestamp_fields())},
+        }
+
+    def build_list_validators(self, aggregates, values):
+        stamps = [values[key] for key in aggregates if key != 'row_count' and values[key] is not None]
+        stamps += [stamp for stamp in self.get_extra_conditional_stamps() if stamp is not None]
+
+        # The same URL returns different rows per user, so the user is part of the tag.
+        parts = [
+            str(values['row_count']),
+            *(stamp.isoformat() for stamp in stamps),
+            str(self.request.user.pk),
+            self.request.get_full_path(),
+        ]
+        return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = self.get_list_validators(queryset)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.get_list_response(queryset)
+        return self.add_list_validators(response, etag)
+
+    async def async_list(self, request, *args, **kwargs):
+        queryset = await self.aget_filtered_queryset()
+        etag = await self.aget_list_validators(queryset)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await self.aget_list_response(queryset)
+        return self.add_list_validators(response, etag)
+
+    def add_list_validators(self, response, etag):
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Authorization'])
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_list_response(self, queryset):
+        """ Same body as ListModelMixin.list, minus the queryset lookup. """
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+
+# =========================================
+# === KEYSET (SEEK) PAGINATION
+# =========================================
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on the values of the last row seen instead of an OFFSET, so
+    page 1,000 costs the same as page 1:
+
+        GET /api/feedback/?product=7              -> {"next": "...?cursor=eyJ2...", "results": [...]}
+        GET /api/feedback/?product=7&cursor=...   -> the following page
+
+    `ordering` lists model fields, all descending. The last one must be
+    unique (e.g. 'id') so rows with equal values are never skipped or
+    repeated. An index on the same columns makes each page a range scan.
+    DRF's CursorPagination only seeks on the first field and falls back to
+    offsets for ties, which is slow for low-cardinality fields such as counts.
+    """
+    page_size = 20
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = self.get_ordering(view)
+        fields = [name.lstrip('-') for name in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        position = self.decode_cursor(request, queryset.model, fields)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(fields, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = [getattr(rows[-1], field) for field in fields] if self.has_next else None
+        return rows
+
+    @staticmethod
+    def seek_filter(fields, position):
+        """ Rows strictly after `position` in descending (f1, f2, ...) order. """
+        condition = Q()
+        for i, field in enumerate(fields):
+            step = Q(**{f'{field}__lt': position[i]})
+            for previous, value in zip(fields[:i], position[:i]):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def encode_cursor(self, position):
+        raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in position])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request, model, fields):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+        except (binascii.Error, ValueError, TypeError, DjangoValidationError):
+            raise NotFound("Invalid cursor.")
+
+    def get_next_cursor(self):
+        """ Cursor of the page after the one just paginated, or None on the last page. """
+        return self.encode_cursor(self.next_position) if self.has_next else None
+
+    def get_link(self, request, cursor):
+        """ Absolute URL of the page starting after `cursor`; None when there is no cursor. """
+        if cursor is None:
+            return None
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.request, self.get_next_cursor())
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,26 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, fast_json_enabled, orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    Drop-in replacement for DRF's JSONParser backed by orjson when installed.
+    Falls back to the stdlib parser for non UTF-8 bodies or when orjson is
+    unavailable / disabled (settings.JSON_BACKEND = 'stdlib').
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        if not fast_json_enabled() or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
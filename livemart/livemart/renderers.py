@@ -0,0 +1,104 @@
+import decimal
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+# --- Optional fast JSON backend ---
+# orjson is not a hard requirement: without it everything falls back to the
+# stdlib `json` module that DRF uses by default.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def fast_json_enabled():
+    """
+    True when the orjson backend should be used.
+    settings.JSON_BACKEND: 'auto' (default, orjson when installed) or 'stdlib'.
+    """
+    return orjson is not None and getattr(settings, 'JSON_BACKEND', 'auto') != 'stdlib'
+
+
+class DecimalJSONEncoder(encoders.JSONEncoder):
+    """
+    DRF's JSONEncoder, except that Decimals keep their exact digits.
+
+    DRF renders a bare Decimal as a float (30.50 -> 30.5, and large prices
+    lose precision). We render it the same way DecimalField does: as a
+    fixed-point string ('30.50').
+    """
+
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal):
+            return format(obj, 'f')
+        return super().default(obj)
+
+
+_encode_default = DecimalJSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson when installed.
+
+    Produces the same bytes as JSONRenderer for everything our serializers
+    emit. Dates/times and Decimals are routed through DecimalJSONEncoder so
+    they keep DRF's formatting. Pretty-printed (indent) or ASCII-only output,
+    and anything orjson refuses (e.g. integers over 64 bits), falls back to
+    the stdlib path.
+    """
+    encoder_class = DecimalJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (
+            not fast_json_enabled()
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_encode_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same as JSONRenderer: escape U+2028/U+2029 so the output is a strict JavaScript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+# --- Export formats (content negotiation only) ---
+
+class StreamingExportRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate ?format=csv / ?format=ndjson for export actions.
+    The action builds its own StreamingHttpResponse, so this renderer only
+    ever sees error payloads, which it renders as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or isinstance(data, bytes):
+            return data or b''
+        return FastJSONRenderer().render(data)
+
+
+class CSVRenderer(StreamingExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamingExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
     'users',
     'store',
     'orders',
+    'tasks',
+    'realtime',
 
     # 3rd Party Apps
     'rest_framework',
@@ -104,6 +106,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not the default in-memory database: in-memory SQLite shared between
+        # threads fails with "table is locked" instead of waiting
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -160,7 +167,8 @@ AUTH_USER_MODEL = 'users.User'
 # 2. Tell DRF to use Token-based authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # --- UPDATED: TokenAuthentication + cached token/user/profile lookups ---
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -168,9 +176,66 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         # By default, allow anyone to view (read-only)
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    # --- ADDED: orjson-backed JSON (falls back to stdlib json when not installed) ---
+    'DEFAULT_RENDERER_CLASSES': [
+        'livemart.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'livemart.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# --- ADDED: JSON backend for the renderer/parser above ---
+# 'auto' uses orjson when it is installed (pip install orjson), 'stdlib' forces json.
+JSON_BACKEND = 'auto'
+
+# --- ADDED: Fast read path for /api/products/ and /api/inventory/ lists ---
+# Serves those lists from values_list() rows instead of ModelSerializer
+# (same JSON output, far less CPU). Set to False to fall back to the serializers.
+FAST_LIST_SERIALIZERS = True
+
+# --- ADDED: Caches ---
+# 'reviews' holds the first page of each product's reviews (store.reviews).
+# LocMemCache evicts least-recently-used entries past MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reviews': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reviews',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # --- ADDED: token -> user + profile id (users.authentication) ---
+    # Must be shared between processes once DEBUG is off, e.g.
+    # 'django.core.cache.backends.redis.RedisCache' or
+    # 'django.core.cache.backends.db.DatabaseCache' (manage.py createcachetable)
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # --- ADDED: rendered .ics feeds, keyed by their ETag (orders.calendar) ---
+    'calendars': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'calendars',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
 }
 
+# --- ADDED: Pushed order events (/api/events/, see realtime.brokers) ---
+# 'local' relays events within one process: fine for a single ASGI worker.
+# With several worker processes use 'database' (events relayed through the
+# realtime_event table) or point this at a Redis-backed broker class.
+REALTIME_BROKER = 'local'
+
 # 3. Tell dj-rest-auth to use our new custom registration serializer
 REST_AUTH = {
     'REGISTER_SERIALIZER': 'users.serializers.CustomRegisterSerializer',
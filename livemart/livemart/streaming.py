@@ -0,0 +1,224 @@
+import csv
+import datetime
+import zlib
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+
+from .renderers import FastJSONRenderer, CSVRenderer, NDJSONRenderer
+
+# =========================================
+# === STREAMING RESPONSES FOR LARGE LISTS
+# =========================================
+
+
+def batched(iterable, size):
+    """ Yields lists of up to `size` items from `iterable`. """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def stream_json_array(batches, renderer=None):
+    """
+    Yields a JSON array as bytes, one chunk per batch of rows.
+    Each batch is rendered in one call and spliced into the array, so only
+    one batch is ever held in memory.
+    """
+    renderer = renderer or FastJSONRenderer()
+    yield b'['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        if not first:
+            yield b','
+        yield renderer.render(batch)[1:-1]  # strip the batch's own [ ]
+        first = False
+    yield b']'
+
+
+class StreamingListMixin:
+    """
+    Opt-in streaming for a ViewSet's `list`: add ?stream=1 to the URL.
+
+    The queryset is read with .iterator(chunk_size=...) (a server-side cursor
+    where the database supports one), each chunk is serialized and written
+    straight to a StreamingHttpResponse. Memory stays flat no matter how many
+    rows there are, and the first bytes go out before the last row is read.
+    Pagination does not apply to streamed lists.
+    """
+    stream_chunk_size = 2000
+
+    def wants_stream(self):
+        return self.request.query_params.get('stream', '').lower() in ('1', 'true', 'yes')
+
+    def list(self, request, *args, **kwargs):
+        if not self.wants_stream():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_json_array(self.iter_stream_batches(queryset)),
+            content_type='application/json',
+        )
+        # Tell buffering proxies (nginx) to pass chunks through as they come
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def async_list(self, request, *args, **kwargs):
+        # Streams are written by a sync iterator: serve them from a worker thread
+        if not self.wants_stream():
+            return await super().async_list(request, *args, **kwargs)
+        return await sync_to_async(self.list)(request, *args, **kwargs)
+
+    def iter_stream_batches(self, queryset):
+        """ Yields lists of serialized rows, `stream_chunk_size` at a time. """
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        for batch in batched(rows, self.stream_chunk_size):
+            yield self.get_serializer(batch, many=True).data
+
+
+# =========================================
+# === CSV / NDJSON EXPORTS
+# =========================================
+
+
+class _Echo:
+    """ File-like object whose write() just hands the line back (for csv.writer). """
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(header, rows, chunk_size):
+    """ Yields a CSV document as bytes, one chunk per `chunk_size` rows. """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode()
+    for batch in batched(rows, chunk_size):
+        yield ''.join(writer.writerow([_csv_cell(value) for value in row]) for row in batch).encode()
+
+
+def iter_ndjson(header, rows, chunk_size):
+    """ Yields one JSON object per line, one chunk per `chunk_size` rows. """
+    renderer = FastJSONRenderer()
+    for batch in batched(rows, chunk_size):
+        yield b''.join(renderer.render(dict(zip(header, row))) + b'\n' for row in batch)
+
+
+def gzip_chunks(chunks):
+    """ Compresses a byte stream on the fly, flushing after every chunk. """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """ Whether an Accept-Encoding header allows gzip: listed (or covered by *) with a non-zero q-value. """
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, *params = [piece.strip() for piece in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def parse_datetime_param(name, value):
+    """ Accepts a date (YYYY-MM-DD, meaning midnight) or a full ISO datetime. """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is not None:
+                parsed = datetime.datetime.combine(day, datetime.time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class ExportMixin:
+    """
+    Adds a streaming `export` action to a ViewSet:
+
+        GET .../export/?format=csv       (default)
+        GET .../export/?format=ndjson
+        GET .../export/?created_after=2026-01-01&created_before=2026-02-01
+
+    Rows are read with values_list(...).iterator() in `export_chunk_size`
+    chunks, written as CSV or NDJSON and gzip-compressed on the fly when the
+    client sends `Accept-Encoding: gzip`, so memory use does not grow with the
+    export size.
+
+    - export_columns: [(column header, ORM lookup), ...]
+    - export_date_field: lookup filtered by ?created_after= / ?created_before=
+    """
+    export_columns = []
+    export_date_field = None
+    export_filename = 'export'
+    export_chunk_size = 2000
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_export_queryset(self.filter_queryset(self.get_queryset()))
+
+        header = [name for name, _ in self.export_columns]
+        lookups = [lookup for _, lookup in self.export_columns]
+        rows = queryset.values_list(*lookups).iterator(chunk_size=self.export_chunk_size)
+
+        export_format = request.accepted_renderer.format
+        writer = iter_ndjson if export_format == 'ndjson' else iter_csv
+        chunks = writer(header, rows, self.export_chunk_size)
+
+        gzipped = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if gzipped:
+            chunks = gzip_chunks(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename}.{export_format}"'
+        response['X-Accel-Buffering'] = 'no'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    def filter_export_queryset(self, queryset):
+        if not self.export_date_field:
+            return queryset
+        params = self.request.query_params
+        if params.get('created_after'):
+            queryset = queryset.filter(**{f'{self.export_date_field}__gte': parse_datetime_param('created_after', params['created_after'])})
+        if params.get('created_before'):
+            queryset = queryset.filter(**{f'{self.export_date_field}__lt': parse_datetime_param('created_before', params['created_before'])})
+        return queryset
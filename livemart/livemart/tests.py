@@ -0,0 +1,60 @@
+import io
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest import skipIf
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer, orjson
+from .streaming import accepts_gzip
+
+
+@skipIf(orjson is None, "orjson is not installed")
+class FastJSONRendererTest(SimpleTestCase):
+    payload = [{
+        'id': 1,
+        'name': 'Dahi \u2028 दही',
+        'price': '30.50',
+        'created_at': datetime(2026, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc),
+        'availability_date': date(2026, 1, 2),
+        'stock': 5,
+        'ratio': 0.1,
+        'flags': [True, False, None],
+    }]
+
+    def test_matches_drf_json_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_decimals_keep_their_digits(self):
+        data = {'total_price': Decimal('1200.50'), 'huge': Decimal('12345678901234567.10')}
+        self.assertEqual(FastJSONRenderer().render(data), b'{"total_price":"1200.50","huge":"12345678901234567.10"}')
+        with override_settings(JSON_BACKEND='stdlib'):
+            self.assertEqual(FastJSONRenderer().render(data), b'{"total_price":"1200.50","huge":"12345678901234567.10"}')
+
+    def test_indent_uses_stdlib_path(self):
+        rendered = FastJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+    def test_parser_round_trip(self):
+        body = FastJSONRenderer().render({'inventory_id': 3, 'quantity': 2})
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), {'inventory_id': 3, 'quantity': 2})
+
+
+class AcceptsGzipTest(SimpleTestCase):
+    def test_q_values_are_honoured(self):
+        for header, expected in [
+            ('gzip, deflate', True),
+            ('deflate, gzip;q=0.5', True),
+            ('gzip;q=0', False),
+            ('GZIP ; Q=0.0, deflate', False),
+            ('*', True),
+            ('*;q=0', False),
+            ('gzip;q=0, *', False),  # the explicit refusal wins
+            ('x-gzip', True),
+            ('deflate, br', False),
+            ('', False),
+        ]:
+            with self.subTest(header=header):
+                self.assertIs(accepts_gzip(header), expected)
@@ -9,8 +9,10 @@ from store.views import (
     CategoryViewSet, 
     ProductViewSet, 
     InventoryViewSet, 
+    InventoryImportViewSet,
     FeedbackViewSet,
-    RetailerViewSet
+    RetailerViewSet,
+    RegionViewSet
 )
 
 # --- Import ViewSets from Orders ---
@@ -29,6 +31,12 @@ from orders.views import (
 # --- Import Views from Users ---
 from users.views import GoogleLogin
 
+# --- Subscribable order calendars (signed URLs, no login) ---
+from orders.calendar import calendar_feed
+
+# --- Server-sent events (ASGI only) ---
+from realtime.views import event_stream, StreamTicketView
+
 # --- API URL Routing ---
 router = DefaultRouter()
 
@@ -36,8 +44,10 @@ router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'inventory', InventoryViewSet, basename='inventory')
+router.register(r'inventory-imports', InventoryImportViewSet, basename='inventory-import')
 router.register(r'feedback', FeedbackViewSet, basename='feedback')
 router.register(r'shops', RetailerViewSet, basename='shop')
+router.register(r'regions', RegionViewSet, basename='region')
 
 # Orders App (Customer)
 router.register(r'orders', OrderViewSet, basename='order')
@@ -61,6 +71,17 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     # --- API URLs ---
+    path('api/events/', event_stream, name='event-stream'),
+    path('api/events/ticket/', StreamTicketView.as_view(), name='event-stream-ticket'),
+    path('api/calendar/<str:token>/', calendar_feed, name='calendar-feed'),
+
+    # --- Async twins of the hottest read endpoints (ASGI, see livemart.asyncviews) ---
+    path('api/async/categories/', CategoryViewSet.as_async_view('list'), name='async-category-list'),
+    path('api/async/categories/<str:pk>/', CategoryViewSet.as_async_view('retrieve'), name='async-category-detail'),
+    path('api/async/products/', ProductViewSet.as_async_view('list'), name='async-product-list'),
+    path('api/async/products/<str:pk>/', ProductViewSet.as_async_view('retrieve'), name='async-product-detail'),
+    path('api/async/shops/', RetailerViewSet.as_async_view('list'), name='async-shop-list'),
+
     path('api/', include(router.urls)), 
     
     # --- Authentication URLs ---
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem
+from django.utils import timezone
+
+from .models import Cart, CartItem, Order, OrderItem, DeliverySlot
+from .rollup import rebuild_rollups
+from .slots import refresh_day
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
@@ -18,7 +22,26 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
     list_display = ('id', 'customer', 'status', 'total_price', 'created_at')
     list_filter = ('status', 'is_offline_payment')
-    readonly_fields = ('customer', 'total_price')
+    readonly_fields = ('customer', 'total_price', 'item_count', 'items_processing', 'items_shipped', 'items_delivered', 'items_cancelled')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Item statuses may have been edited inline: recount this order's roll-up
+        rebuild_rollups(Order, [form.instance.pk])
+
+class DeliverySlotAdmin(admin.ModelAdmin):
+    list_display = ('retailer', 'start', 'booked', 'capacity')
+    list_filter = ('retailer',)
+    # Slots are created by checkouts; only their capacity is edited here
+    readonly_fields = ('retailer', 'start', 'booked')
+
+    def has_add_permission(self, request):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_day(obj.retailer_id, timezone.localdate(obj.start))
 
 admin.site.register(Cart, CartAdmin)
 admin.site.register(Order, OrderAdmin)
+admin.site.register(DeliverySlot, DeliverySlotAdmin)
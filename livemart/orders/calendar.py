@@ -0,0 +1,247 @@
+import hashlib
+import secrets
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import caches
+from django.db.models import Count, Max, Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from livemart.streaming import batched
+from users.models import User
+from .models import Order, OrderItem
+
+# =========================================
+# === SUBSCRIBABLE ORDER CALENDARS (.ics)
+# =========================================
+#
+# GET  /api/orders/calendar-url/            -> {"url": ".../api/calendar/<token>/"}  (customers)
+# POST /api/orders/calendar-url/            -> a new URL; the previous ones stop working
+# GET  /api/retailer/orders/calendar-url/   -> the same for a shop's pickup calendar
+# GET  /api/calendar/<token>/               -> text/calendar, no login needed
+#
+# Calendar apps subscribe to the feed URL and poll it, without sending an
+# Authorization header, so the URL itself carries a signed token naming
+# the user, the kind of feed and the user's calendar_secret. Rotating the
+# secret revokes every URL issued so far, and a feed is refused once its
+# user is deactivated or no longer has the role the feed was issued for.
+# A poll costs the user lookup and one aggregate query: the ETag comes
+# from the row count and newest updated_at of the orders in the window,
+# so an unchanged calendar is a 304. Rendered feeds are kept in
+# settings.CACHES['calendars'] under that ETag. Rescheduling an order
+# saves it, which bumps updated_at and so retires its cached feeds.
+# A feed that is not cached is streamed, a batch of orders at a time.
+#
+# Only scheduled offline orders from CALENDAR_PAST_DAYS ago to
+# CALENDAR_FUTURE_DAYS ahead are included.
+
+CUSTOMER_FEED = 'customer'
+RETAILER_FEED = 'retailer'
+TOKEN_SALT = 'orders.calendar'
+FEED_NAMES = {
+    CUSTOMER_FEED: 'Live MART orders',
+    RETAILER_FEED: 'Live MART pickups',
+}
+FEED_ROLES = {
+    CUSTOMER_FEED: User.Role.CUSTOMER,
+    RETAILER_FEED: User.Role.RETAILER,
+}
+
+CALENDAR_PAST_DAYS = 30
+CALENDAR_FUTURE_DAYS = 180
+RENDER_BATCH_SIZE = 200
+
+
+def calendar_cache():
+    return caches['calendars']
+
+
+def feed_token(user, kind):
+    return signing.dumps([user.pk, kind, user.calendar_secret], salt=TOKEN_SALT)
+
+
+def feed_url(request, kind, rotate=False):
+    """ The user's feed URL; `rotate` revokes the ones issued before. """
+    user = request.user
+    if rotate or not user.calendar_secret:
+        user.calendar_secret = secrets.token_hex(16)
+        user.save(update_fields=['calendar_secret'])
+    return request.build_absolute_uri(reverse('calendar-feed', args=[feed_token(user, kind)]))
+
+
+def read_feed_token(token):
+    """ (user id, kind) of a token that is still valid, else Http404. """
+    try:
+        user_id, kind, secret = signing.loads(token, salt=TOKEN_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise Http404('Unknown calendar.')
+    if kind not in FEED_ROLES or not secret:
+        raise Http404('Unknown calendar.')
+    user = User.objects.filter(pk=user_id).only('is_active', 'role', 'calendar_secret').first()
+    if (
+        user is None or not user.is_active or user.role != FEED_ROLES[kind]
+        or not constant_time_compare(user.calendar_secret, secret)
+    ):
+        raise Http404('Unknown calendar.')
+    return user_id, kind
+
+
+def feed_window(now=None):
+    """ (start, end) of the scheduled dates shown; whole days, so it moves once a day. """
+    today = timezone.localdate(now)
+    start = timezone.make_aware(datetime.combine(today - timedelta(days=CALENDAR_PAST_DAYS), time.min))
+    end = timezone.make_aware(datetime.combine(today + timedelta(days=CALENDAR_FUTURE_DAYS), time.min))
+    return start, end
+
+
+def feed_orders(user_id, kind, window):
+    orders = Order.objects.filter(
+        is_offline_payment=True,
+        scheduled_delivery_date__gte=window[0],
+        scheduled_delivery_date__lt=window[1],
+    )
+    if kind == CUSTOMER_FEED:
+        # Profiles share their user's primary key
+        return orders.filter(customer_id=user_id)
+    return orders.filter(items__inventory__retailer_id=user_id).distinct()
+
+
+def feed_etag(user_id, kind, window, orders):
+    values = orders.order_by().aggregate(count=Count('pk', distinct=True), latest=Max('updated_at'))
+    parts = [kind, str(user_id), window[0].isoformat(), str(values['count'])]
+    if values['latest'] is not None:
+        parts.append(values['latest'].isoformat())
+    return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+
+# --- iCalendar (RFC 5545) ---
+
+def _text(value):
+    """ Escapes a TEXT value. """
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _utc(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _fold(line):
+    """ Splits content lines longer than 75 octets, as the RFC requires. """
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b'\r\n'
+    chunks = []
+    while data:
+        size = 75 if not chunks else 74
+        # Don't cut a multi-byte character in half
+        while size < len(data) and (data[size] & 0xC0) == 0x80:
+            size -= 1
+        chunks.append(data[:size])
+        data = data[size:]
+    return b'\r\n '.join(chunks) + b'\r\n'
+
+
+def _event(order, summary, description, location):
+    return b''.join(_fold(line) for line in [
+        'BEGIN:VEVENT',
+        f'UID:order-{order.pk}@livemart',
+        f'DTSTAMP:{_utc(order.updated_at)}',
+        f'DTSTART:{_utc(order.scheduled_delivery_date)}',
+        f'SUMMARY:{_text(summary)}',
+        f'DESCRIPTION:{_text(description)}',
+        f'LOCATION:{_text(location)}',
+        'STATUS:CANCELLED' if order.status == Order.OrderStatus.CANCELLED else 'STATUS:CONFIRMED',
+        'END:VEVENT',
+    ])
+
+
+def customer_event(order):
+    return _event(
+        order,
+        f'Live MART Order #{order.pk} (Pickup/Delivery)',
+        f'Scheduled offline payment/delivery for Order #{order.pk}. Total: {order.total_price}',
+        order.shipping_address,
+    )
+
+
+def retailer_event(order):
+    lines = [f'{item.quantity} x {item.inventory.product.name}' for item in order.pickup_items]
+    return _event(
+        order,
+        f'Pickup: Order #{order.pk}',
+        f"Prepare for {order.customer.user.username}:\n" + '\n'.join(lines),
+        order.shipping_address,
+    )
+
+
+def render_feed(user_id, kind, orders, name):
+    """ Yields the .ics document as bytes, one chunk per RENDER_BATCH_SIZE orders. """
+    yield b''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Live MART//Ecommerce App//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_text(name)}',
+    ])
+    orders = orders.order_by('scheduled_delivery_date', 'pk')
+    if kind == CUSTOMER_FEED:
+        render = customer_event
+    else:
+        render = retailer_event
+        items = OrderItem.objects.filter(inventory__retailer_id=user_id).select_related('inventory__product')
+        orders = orders.select_related('customer__user').prefetch_related(
+            Prefetch('items', queryset=items, to_attr='pickup_items'),
+        )
+    for batch in batched(orders.iterator(chunk_size=RENDER_BATCH_SIZE), RENDER_BATCH_SIZE):
+        yield b''.join(render(order) for order in batch)
+    yield b'END:VCALENDAR\r\n'
+
+
+def cache_while_streaming(chunks, key):
+    """ Passes the chunks through and caches the whole body once the last one went out. """
+    body = []
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+    calendar_cache().set(key, b''.join(body))
+
+
+def calendar_response(request, user_id, kind, filename=None):
+    """ The feed of `user_id`, or a 304 when the client's If-None-Match still matches. """
+    window = feed_window()
+    orders = feed_orders(user_id, kind, window)
+    etag = feed_etag(user_id, kind, window, orders)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = f'{kind}:{user_id}:{etag}'
+        body = calendar_cache().get(key)
+        if body is not None:
+            response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        else:
+            chunks = render_feed(user_id, kind, orders, FEED_NAMES[kind])
+            response = StreamingHttpResponse(cache_while_streaming(chunks, key), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_safe
+def calendar_feed(request, token):
+    """
+    The subscribable feed: GET /api/calendar/<token>/
+    ACCESS: Anyone holding the signed URL.
+    """
+    user_id, kind = read_feed_token(token)
+    return calendar_response(request, user_id, kind)
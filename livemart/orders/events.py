@@ -0,0 +1,51 @@
+from collections import defaultdict
+
+from realtime.events import publish, ORDER_CREATED, ITEMS_STATUS_CHANGED
+from .models import WholesaleOrder
+from .rollup import BUYER_FIELDS
+
+# =========================================
+# === PUSHED ORDER EVENTS (see realtime.views)
+# =========================================
+#
+# Profiles share their user's primary key, so buyer and seller profile ids
+# are used as user ids directly (no lookups).
+
+
+def _buyer_id(order):
+    return getattr(order, f'{BUYER_FIELDS[type(order)]}_id')
+
+
+def order_created(order, items):
+    """ Tells the buyer, and every seller with items in the order, that it was placed. """
+    wholesale = isinstance(order, WholesaleOrder)
+    seller_field = 'wholesaler_id' if wholesale else 'retailer_id'
+    payload = {'order_id': order.pk, 'wholesale': wholesale, 'status': order.status}
+
+    publish([_buyer_id(order)], ORDER_CREATED, {**payload, 'items': [item.pk for item in items]})
+    by_seller = defaultdict(list)
+    for item in items:
+        by_seller[getattr(item.inventory, seller_field)].append(item.pk)
+    for seller_id, item_ids in by_seller.items():
+        publish([seller_id], ORDER_CREATED, {**payload, 'items': item_ids})
+
+
+def items_changed(orders, changes, seller_id):
+    """
+    One event per order to its buyer and to the seller who made the change.
+    `orders` maps order ids to orders (as returned by the roll-up);
+    `changes` lists (item_id, order_id, new_status).
+    """
+    by_order = defaultdict(list)
+    for item_id, order_id, status in changes:
+        by_order[order_id].append({'id': item_id, 'status': status})
+    for order_id, items in by_order.items():
+        order = orders.get(order_id)
+        if order is None:  # nothing actually changed
+            continue
+        publish([_buyer_id(order), seller_id], ITEMS_STATUS_CHANGED, {
+            'order_id': order_id,
+            'wholesale': isinstance(order, WholesaleOrder),
+            'order_status': order.status,
+            'items': items,
+        })
@@ -0,0 +1,95 @@
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import FulfillmentStatus, Order, OrderItem, WholesaleOrder, WholesaleOrderItem
+from .rollup import apply_transitions
+from . import events
+from .tasks import send_delivery_notifications, DELIVERY_EMAIL_DELAY
+
+# =========================================
+# === BULK FULFILLMENT TRANSITIONS
+# =========================================
+#
+# POST /api/retailer/order-items/transition/
+# POST /api/wholesaler/order-items/transition/
+#
+#     {"ids": [31, 32, 40], "status": "SHIPPED"}
+#
+# Every id must be one of the seller's items, and every move must be an
+# allowed transition (single-item PATCHes follow the same rules, see
+# check_transition). Otherwise nothing changes. The moves are one UPDATE
+# scoped to the seller, the order roll-ups are adjusted once per order, one
+# pushed event goes out per order, and all delivery emails go out as a
+# single queued batch job.
+
+MAX_TRANSITION_BATCH = 1000
+
+# Items only move forward; they can be cancelled until they ship
+ALLOWED_TRANSITIONS = {
+    FulfillmentStatus.PENDING: {
+        FulfillmentStatus.PROCESSING, FulfillmentStatus.SHIPPED, FulfillmentStatus.DELIVERED, FulfillmentStatus.CANCELLED,
+    },
+    FulfillmentStatus.PROCESSING: {FulfillmentStatus.SHIPPED, FulfillmentStatus.DELIVERED, FulfillmentStatus.CANCELLED},
+    FulfillmentStatus.SHIPPED: {FulfillmentStatus.DELIVERED},
+    FulfillmentStatus.DELIVERED: set(),
+    FulfillmentStatus.CANCELLED: set(),
+}
+
+ORDER_MODELS = {OrderItem: Order, WholesaleOrderItem: WholesaleOrder}
+SELLER_FIELDS = {OrderItem: 'retailer', WholesaleOrderItem: 'wholesaler'}
+
+
+def check_transition(old, new):
+    """ Raises ValidationError unless an item may move from `old` to `new` (staying put is fine). """
+    if old != new and new not in ALLOWED_TRANSITIONS[old]:
+        raise serializers.ValidationError({'status': [f"Cannot move an item from {old} to {new}."]})
+
+
+class BulkTransitionSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_TRANSITION_BATCH,
+    )
+    status = serializers.ChoiceField(choices=FulfillmentStatus.choices)
+
+    def validate_ids(self, ids):
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each item id may appear only once.")
+        return ids
+
+
+def apply_bulk_transition(item_model, seller, ids, status):
+    """
+    Moves the seller's (a retailer or wholesaler user's) items to `status`.
+    Items already in `status` are left alone. Returns {'updated': n, 'unchanged': m}.
+    """
+    order_model = ORDER_MODELS[item_model]
+    # Profiles share the user's primary key, so no profile lookup is needed
+    seller_filter = {f'inventory__{SELLER_FIELDS[item_model]}_id': seller.pk}
+    with transaction.atomic():
+        items = list(
+            item_model.objects.select_for_update()
+            .filter(pk__in=ids, **seller_filter)
+            .values_list('pk', 'order_id', 'status')
+        )
+        missing = sorted(set(ids) - {pk for pk, _, _ in items})
+        if missing:
+            raise serializers.ValidationError({'ids': [f"Order items not found or not yours: {missing}."]})
+
+        moving = [(pk, order_id, old) for pk, order_id, old in items if old != status]
+        invalid = sorted(pk for pk, _, old in moving if status not in ALLOWED_TRANSITIONS[old])
+        if invalid:
+            raise serializers.ValidationError({'ids': [f"Cannot move items {invalid} to {status}."]})
+
+        moved_ids = [pk for pk, _, _ in moving]
+        if moved_ids:
+            item_model.objects.filter(pk__in=moved_ids, **seller_filter).update(status=status)
+            orders = apply_transitions(order_model, [(order_id, old, status) for _, order_id, old in moving])
+            events.items_changed(orders, [(pk, order_id, status) for pk, order_id, _ in moving], seller.pk)
+
+            if status == FulfillmentStatus.DELIVERED:
+                # One queued call for the whole batch (see orders.tasks)
+                send_delivery_notifications.delay(
+                    countdown=DELIVERY_EMAIL_DELAY, item_ids=moved_ids, wholesale=item_model is WholesaleOrderItem,
+                )
+
+    return {'updated': len(moved_ids), 'unchanged': len(items) - len(moved_ids)}
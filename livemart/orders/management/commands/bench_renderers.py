@@ -0,0 +1,110 @@
+import io
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from livemart.parsers import FastJSONParser
+from livemart.renderers import FastJSONRenderer, fast_json_enabled
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer
+from store.models import Category, Product, Inventory
+from store.serializers import Fieldset, InventorySerializer
+from users.models import User, CustomerProfile, RetailerProfile
+
+
+class Rollback(Exception):
+    """ Raised to undo the benchmark's fixture rows. """
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares DRF's JSONRenderer/JSONParser with livemart's FastJSONRenderer/"
+        "FastJSONParser on large inventory and order pages. Fixture rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Inventory rows / orders per page")
+        parser.add_argument('--items', type=int, default=5, help="Items per order")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not fast_json_enabled():
+            self.stdout.write("orjson is not installed (or JSON_BACKEND='stdlib'): both sides use stdlib json.")
+        try:
+            with transaction.atomic():
+                pages = self.build_pages(options['rows'], options['items'])
+                for name, data in pages:
+                    self.compare(name, data, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def build_pages(self, rows, items_per_order):
+        category = Category.objects.create(name='Bench Category')
+        user = User.objects.create_user(username='bench_renderers_shop', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(user=user, shop_name='Bench Shop')
+        user = User.objects.create_user(username='bench_renderers_customer', role=User.Role.CUSTOMER)
+        customer = CustomerProfile.objects.create(user=user, address='221B Baker Street')
+
+        products = Product.objects.bulk_create(
+            Product(name=f'Bench product {i}', description='Fresh & local ' * 10, category=category)
+            for i in range(rows)
+        )
+        inventories = Inventory.objects.bulk_create(
+            Inventory(product=product, retailer=retailer, price=Decimal('12.50') + i, stock=i % 50 + 1)
+            for i, product in enumerate(products)
+        )
+        orders = Order.objects.bulk_create(
+            Order(customer=customer, total_price=Decimal('99.99'), shipping_address=customer.address)
+            for _ in range(rows)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                inventory=inventories[(i + j) % len(inventories)],
+                quantity=j + 1,
+                price_at_purchase=Decimal('12.50'),
+            )
+            for i, order in enumerate(orders) for j in range(items_per_order)
+        )
+
+        context = {'request': Request(APIRequestFactory().get('/'))}
+        fieldset = Fieldset()
+        inventory_page = InventorySerializer(
+            InventorySerializer.prepare_queryset(Inventory.objects.filter(retailer=retailer), fieldset),
+            many=True, context=context,
+        ).data
+        order_page = OrderSerializer(
+            OrderSerializer.prepare_queryset(Order.objects.filter(customer=customer), fieldset),
+            many=True, context=context,
+        ).data
+        return [('inventory', inventory_page), ('orders', order_page)]
+
+    def compare(self, name, data, repeat):
+        stdlib_body = JSONRenderer().render(data)
+        fast_body = FastJSONRenderer().render(data)
+        if stdlib_body != fast_body:
+            self.stderr.write(f"{name}: FastJSONRenderer output differs from JSONRenderer!")
+
+        render_slow = self.best_ms(lambda: JSONRenderer().render(data), repeat)
+        render_fast = self.best_ms(lambda: FastJSONRenderer().render(data), repeat)
+        parse_slow = self.best_ms(lambda: JSONParser().parse(io.BytesIO(stdlib_body)), repeat)
+        parse_fast = self.best_ms(lambda: FastJSONParser().parse(io.BytesIO(stdlib_body)), repeat)
+
+        self.stdout.write(f"{name} page: {len(data)} rows, {len(stdlib_body) / 1024:.0f} KiB")
+        self.stdout.write(f"  render  stdlib {render_slow:8.2f} ms   fast {render_fast:8.2f} ms   ({render_slow / render_fast:.1f}x)")
+        self.stdout.write(f"  parse   stdlib {parse_slow:8.2f} ms   fast {parse_fast:8.2f} ms   ({parse_slow / parse_fast:.1f}x)")
+
+    def best_ms(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import Order, WholesaleOrder
+from orders.rollup import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recounts every order's item-status counters from its items and re-derives its status (drift correction)."
+
+    def handle(self, *args, **options):
+        fixed = rebuild_rollups(Order)
+        fixed_wholesale = rebuild_rollups(WholesaleOrder)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt order roll-ups; {fixed} orders and {fixed_wholesale} wholesale orders were out of date."
+        ))
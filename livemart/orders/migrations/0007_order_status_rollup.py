@@ -0,0 +1,148 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+COUNTERS = {
+    "PROCESSING": "items_processing",
+    "SHIPPED": "items_shipped",
+    "DELIVERED": "items_delivered",
+    "CANCELLED": "items_cancelled",
+}
+
+
+def rolled_up_status(counts, status):
+    # Same rules as orders.models.ItemStatusCounts.rolled_up_status
+    total = counts["item_count"]
+    active = total - counts["items_cancelled"]
+    if total == 0:
+        return status
+    if active == 0:
+        return "CANCELLED"
+    if counts["items_delivered"] == active:
+        return "DELIVERED"
+    if counts["items_delivered"] + counts["items_shipped"] == active:
+        return "SHIPPED"
+    if counts["items_processing"] + counts["items_shipped"] + counts["items_delivered"]:
+        return "PROCESSING"
+    return status if status in ("PENDING", "PAID") else "PENDING"
+
+
+def backfill_rollups(apps, schema_editor):
+    """Initial counters (and the statuses they imply) from the existing items."""
+    fields = ["item_count", *COUNTERS.values(), "status"]
+    for order_name, item_name in (
+        ("Order", "OrderItem"),
+        ("WholesaleOrder", "WholesaleOrderItem"),
+    ):
+        order_model = apps.get_model("orders", order_name)
+        item_model = apps.get_model("orders", item_name)
+        statuses = dict(order_model.objects.values_list("pk", "status"))
+        orders = []
+        for row in (
+            item_model.objects.order_by()
+            .values("order_id")
+            .annotate(
+                item_count=Count("id"),
+                **{
+                    field: Count("id", filter=Q(status=status))
+                    for status, field in COUNTERS.items()
+                },
+            )
+        ):
+            counts = {field: row[field] for field in fields[:-1]}
+            status = rolled_up_status(counts, statuses[row["order_id"]])
+            orders.append(order_model(pk=row["order_id"], status=status, **counts))
+        order_model.objects.bulk_update(orders, fields, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0006_order_updated_at"),
+        ("users", "0003_region_retailerprofile_region"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_cancelled",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_delivered",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_processing",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_shipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="wholesaleorder",
+            name="item_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="wholesaleorder",
+            name="items_cancelled",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="wholesaleorder",
+            name="items_delivered",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="wholesaleorder",
+            name="items_processing",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="wholesaleorder",
+            name="items_shipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("PAID", "Paid"),
+                    ("PROCESSING", "Processing"),
+                    ("SHIPPED", "Shipped"),
+                    ("DELIVERED", "Delivered"),
+                    ("CANCELLED", "Cancelled"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["customer", "status", "-created_at"],
+                name="order_customer_status",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wholesaleorder",
+            index=models.Index(
+                fields=["retailer", "status", "-created_at"],
+                name="wholesaleorder_retailer_status",
+            ),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0007_order_status_rollup"),
+        ("users", "0003_region_retailerprofile_region"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliverySlot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start", models.DateTimeField()),
+                ("capacity", models.PositiveIntegerField()),
+                ("booked", models.PositiveIntegerField(default=0)),
+                (
+                    "retailer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="delivery_slots",
+                        to="users.retailerprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SlotBooking",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="slot_bookings",
+                        to="orders.order",
+                    ),
+                ),
+                (
+                    "slot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bookings",
+                        to="orders.deliveryslot",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SlotDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("full_slots", models.PositiveIntegerField(default=0)),
+                (
+                    "retailer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="slot_days",
+                        to="users.retailerprofile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="deliveryslot",
+            constraint=models.UniqueConstraint(
+                fields=("retailer", "start"), name="deliveryslot_retailer_start"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="deliveryslot",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("booked__lte", models.F("capacity"))),
+                name="deliveryslot_within_capacity",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="slotbooking",
+            unique_together={("order", "slot")},
+        ),
+        migrations.AddConstraint(
+            model_name="slotday",
+            constraint=models.UniqueConstraint(
+                fields=("retailer", "day"), name="slotday_retailer_day"
+            ),
+        ),
+    ]
@@ -15,6 +15,36 @@ class FulfillmentStatus(models.TextChoices):
     DELIVERED = "DELIVERED", "Delivered"
     CANCELLED = "CANCELLED", "Cancelled"
 
+class ItemStatusCounts(models.Model):
+    """
+    Per-order counters of item fulfillment statuses (items still PENDING are
+    item_count minus the rest). Kept in step by orders.rollup on every item
+    status change, so the order's own status is derived without reading items.
+    """
+    item_count = models.PositiveIntegerField(default=0)
+    items_processing = models.PositiveIntegerField(default=0)
+    items_shipped = models.PositiveIntegerField(default=0)
+    items_delivered = models.PositiveIntegerField(default=0)
+    items_cancelled = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def rolled_up_status(self):
+        """ The order status implied by the counters; PENDING / PAID stay until an item moves. """
+        active = self.item_count - self.items_cancelled
+        if self.item_count == 0:
+            return self.status
+        if active == 0:
+            return FulfillmentStatus.CANCELLED
+        if self.items_delivered == active:
+            return FulfillmentStatus.DELIVERED
+        if self.items_delivered + self.items_shipped == active:
+            return FulfillmentStatus.SHIPPED
+        if self.items_processing + self.items_shipped + self.items_delivered:
+            return FulfillmentStatus.PROCESSING
+        return self.status if self.status in ('PENDING', 'PAID') else 'PENDING'
+
 # =========================================
 # === CUSTOMER CART & ORDER MODELS
 # =========================================
@@ -38,10 +68,11 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.inventory.product.name} in {self.cart}"
 
 
-class Order(models.Model):
+class Order(ItemStatusCounts):
     class OrderStatus(models.TextChoices):
         PENDING = "PENDING", "Pending"
         PAID = "PAID", "Paid"
+        PROCESSING = "PROCESSING", "Processing" # Some items are being fulfilled
         SHIPPED = "SHIPPED", "Shipped" # This could mean 'all items shipped'
         DELIVERED = "DELIVERED", "Delivered" # This could mean 'all items delivered'
         CANCELLED = "CANCELLED", "Cancelled"
@@ -61,6 +92,16 @@ class Order(models.Model):
     )
     # --------------------------------------
 
+    # --- ADDED for conditional GET (ETag) ---
+    # Bumped on every save and whenever one of the order's items changes status.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # "My orders" filtered by status: ?status=SHIPPED
+            models.Index(fields=['customer', 'status', '-created_at'], name='order_customer_status'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer.user.username} ({self.status})"
 
@@ -107,7 +148,7 @@ class WholesaleCartItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.inventory.product.name} in {self.cart}"
 
-class WholesaleOrder(models.Model):
+class WholesaleOrder(ItemStatusCounts):
     class OrderStatus(models.TextChoices):
         PENDING = "PENDING", "Pending"
         PAID = "PAID", "Paid"
@@ -122,6 +163,11 @@ class WholesaleOrder(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     delivery_address = models.TextField() 
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['retailer', 'status', '-created_at'], name='wholesaleorder_retailer_status'),
+        ]
+
     def __str__(self):
         return f"Wholesale Order {self.id} by {self.retailer.shop_name}"
 
@@ -142,4 +188,52 @@ class WholesaleOrderItem(models.Model):
         unique_together = [['order', 'inventory']]
 
     def __str__(self):
-        return f"{self.quantity} x {self.inventory.product.name} in Wholesale Order {self.order.id}"
\ No newline at end of file
+        return f"{self.quantity} x {self.inventory.product.name} in Wholesale Order {self.order.id}"
+
+# =========================================
+# === DELIVERY SLOTS (orders.slots)
+# =========================================
+
+class DeliverySlot(models.Model):
+    """ One hour of a shop's pickup/delivery schedule, booked by checkouts until `capacity`. """
+    retailer = models.ForeignKey(RetailerProfile, on_delete=models.CASCADE, related_name='delivery_slots')
+    start = models.DateTimeField()
+    capacity = models.PositiveIntegerField()
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['retailer', 'start'], name='deliveryslot_retailer_start'),
+            models.CheckConstraint(condition=models.Q(booked__lte=models.F('capacity')), name='deliveryslot_within_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.retailer.shop_name} @ {self.start:%Y-%m-%d %H:%M} ({self.booked}/{self.capacity})"
+
+
+class SlotDay(models.Model):
+    """
+    A shop's full slots on one day as a bitmap: bit i set means slot i of
+    the day (see orders.slots.SLOT_HOURS) is full. Days without a row have
+    every slot free.
+    """
+    retailer = models.ForeignKey(RetailerProfile, on_delete=models.CASCADE, related_name='slot_days')
+    day = models.DateField()
+    full_slots = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['retailer', 'day'], name='slotday_retailer_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.retailer.shop_name} on {self.day}: {self.full_slots:b}"
+
+
+class SlotBooking(models.Model):
+    """ The slot an order took at one of its shops; released when the order is cancelled. """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='slot_bookings')
+    slot = models.ForeignKey(DeliverySlot, on_delete=models.CASCADE, related_name='bookings')
+
+    class Meta:
+        unique_together = [['order', 'slot']]
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from livemart.streaming import batched
+from .models import FulfillmentStatus, Order, OrderItem, WholesaleOrder, WholesaleOrderItem
+from .slots import release_slots
+
+# =========================================
+# === ORDER STATUS ROLL-UP
+# =========================================
+#
+# Order and WholesaleOrder carry counters of their items' statuses
+# (models.ItemStatusCounts). Each fulfillment update moves one item between
+# two counters with a single UPDATE of F() expressions, then the order's
+# status is re-derived from the counters alone (O(1), no item scan):
+#
+#     every item DELIVERED (ignoring cancelled ones)  -> DELIVERED
+#     every item SHIPPED or DELIVERED                 -> SHIPPED
+#     any item PROCESSING / SHIPPED / DELIVERED       -> PROCESSING
+#     every item CANCELLED                            -> CANCELLED
+#
+# A customer order that becomes CANCELLED gives back its delivery slots
+# (orders.slots); reviving it later does not book them again.
+#
+# `manage.py rebuild_order_rollups` recounts everything from the items.
+
+COUNTERS = {
+    FulfillmentStatus.PROCESSING: 'items_processing',
+    FulfillmentStatus.SHIPPED: 'items_shipped',
+    FulfillmentStatus.DELIVERED: 'items_delivered',
+    FulfillmentStatus.CANCELLED: 'items_cancelled',
+}
+COUNTER_FIELDS = ['item_count', *COUNTERS.values()]
+REBUILD_BATCH_SIZE = 1000
+
+ITEM_MODELS = {Order: OrderItem, WholesaleOrder: WholesaleOrderItem}
+# The buyer's profile (whose id is also their user id)
+BUYER_FIELDS = {Order: 'customer', WholesaleOrder: 'retailer'}
+
+
+def _timestamp_fields(order_model):
+    # Item statuses are part of the customer's order payload: bump the order's validator
+    return {'updated_at': timezone.now()} if order_model is Order else {}
+
+
+def apply_transitions(order_model, transitions):
+    """
+    Records item status changes, given as (order_id, old_status, new_status)
+    tuples, and re-derives the status of the orders they belong to.
+    One UPDATE per order for the counters, one more per order whose status changed.
+    Returns the touched orders by id (see refresh_statuses).
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for order_id, old, new in transitions:
+        if old == new:
+            continue
+        if old in COUNTERS:
+            deltas[order_id][COUNTERS[old]] -= 1
+        if new in COUNTERS:
+            deltas[order_id][COUNTERS[new]] += 1
+
+    for order_id, changes in deltas.items():
+        fields = {field: F(field) + delta for field, delta in changes.items() if delta}
+        if fields:
+            order_model.objects.filter(pk=order_id).update(**fields, **_timestamp_fields(order_model))
+    return refresh_statuses(order_model, deltas)
+
+
+def item_status_changed(order_model, order_id, old, new):
+    return apply_transitions(order_model, [(order_id, old, new)])
+
+
+def refresh_statuses(order_model, order_ids):
+    """
+    Re-derives the status of these orders from their (already updated) counters.
+    Returns {order id: order} with the buyer id, counters and current status loaded.
+    """
+    orders = {}
+    cancelled = []
+    for batch in batched(order_ids, REBUILD_BATCH_SIZE):
+        for order in order_model.objects.filter(pk__in=batch).only('pk', 'status', BUYER_FIELDS[order_model], *COUNTER_FIELDS):
+            status = order.rolled_up_status()
+            if status != order.status:
+                order_model.objects.filter(pk=order.pk).update(status=status, **_timestamp_fields(order_model))
+                order.status = status
+                if status == FulfillmentStatus.CANCELLED:
+                    cancelled.append(order.pk)
+            orders[order.pk] = order
+    if cancelled and order_model is Order:
+        release_slots(cancelled)
+    return orders
+
+
+def rebuild_rollups(order_model, order_ids=None):
+    """
+    Recounts the counters of these orders (all when None) from their items with
+    one grouped query per batch, then re-derives their statuses.
+    Returns the number of orders whose counters were wrong.
+    """
+    item_model = ITEM_MODELS[order_model]
+    orders = order_model.objects.only('pk', *COUNTER_FIELDS).order_by('pk')
+    if order_ids is not None:
+        orders = orders.filter(pk__in=order_ids)
+
+    fixed = 0
+    for batch in batched(orders, REBUILD_BATCH_SIZE):
+        counts = {
+            row['order_id']: row
+            for row in item_model.objects.filter(order_id__in=[order.pk for order in batch])
+            .order_by().values('order_id').annotate(
+                item_count=Count('id'),
+                **{field: Count('id', filter=Q(status=status)) for status, field in COUNTERS.items()},
+            )
+        }
+        stale = []
+        for order in batch:
+            row = counts.get(order.pk, {})
+            expected = {field: row.get(field, 0) for field in COUNTER_FIELDS}
+            if any(getattr(order, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(order, field, value)
+                stale.append(order)
+        if stale:
+            order_model.objects.bulk_update(stale, COUNTER_FIELDS)
+        refresh_statuses(order_model, [order.pk for order in batch])
+        fixed += len(stale)
+    return fixed
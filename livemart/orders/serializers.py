@@ -4,7 +4,7 @@ from .models import (
     WholesaleCart, WholesaleCartItem, WholesaleOrder, WholesaleOrderItem,
     FulfillmentStatus # --- IMPORTED ---
 )
-from store.serializers import InventorySerializer
+from store.serializers import InventorySerializer, FieldsetMixin
 from users.models import User, RetailerProfile
 from store.models import Inventory
 
@@ -14,7 +14,7 @@ from store.models import Inventory
 # === CUSTOMER CART & ORDER SERIALIZERS
 # =========================================
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     inventory_id = serializers.PrimaryKeyRelatedField(
         queryset=Inventory.objects.all(),
@@ -26,16 +26,18 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['id', 'inventory', 'inventory_id', 'quantity']
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(FieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     customer_name = serializers.CharField(source='customer.user.username', read_only=True)
 
+    related_fields = {'customer_name': 'customer__user'}
+
     class Meta:
         model = Cart
         fields = ['id', 'customer', 'customer_name', 'created_at', 'items']
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     status = serializers.CharField(read_only=True) # --- ADDED (Customer can't change it) ---
     
@@ -44,10 +46,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'inventory', 'quantity', 'price_at_purchase', 'status'] # --- ADDED 'status' ---
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(FieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     customer_name = serializers.CharField(source='customer.user.username', read_only=True)
 
+    related_fields = {'customer_name': 'customer__user'}
+    deferrable_fields = ['shipping_address']
+
     class Meta:
         model = Order
         fields = [
@@ -67,7 +72,7 @@ class OrderSerializer(serializers.ModelSerializer):
 # === RETAILER-FACING ORDER SERIALIZERS
 # =========================================
 
-class RetailerOrderItemSerializer(serializers.ModelSerializer):
+class RetailerOrderItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     """
     Shows OrderItem details relevant to a retailer.
     --- THIS IS NOW WRITABLE FOR THE 'status' FIELD ---
@@ -75,9 +80,15 @@ class RetailerOrderItemSerializer(serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     customer_username = serializers.CharField(source='order.customer.user.username', read_only=True)
     shipping_address = serializers.CharField(source='order.shipping_address', read_only=True)
-    order_id = serializers.IntegerField(source='order.id', read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
     order_status = serializers.CharField(source='order.status', read_only=True)
 
+    related_fields = {
+        'customer_username': 'order__customer__user',
+        'shipping_address': 'order',
+        'order_status': 'order',
+    }
+
     class Meta:
         model = OrderItem
         fields = [
@@ -103,10 +114,12 @@ class RetailerOrderItemSerializer(serializers.ModelSerializer):
             'price_at_purchase',
         ]
 
-class RetailerOrderSerializer(serializers.ModelSerializer):
+class RetailerOrderSerializer(FieldsetMixin, serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
     customer_name = serializers.CharField(source='customer.user.username', read_only=True)
 
+    related_fields = {'customer_name': 'customer__user'}
+
     class Meta:
         model = Order
         fields = [
@@ -130,7 +143,7 @@ class RetailerOrderSerializer(serializers.ModelSerializer):
 # === WHOLESALE CART & ORDER SERIALIZERS
 # =========================================
 
-class WholesaleCartItemSerializer(serializers.ModelSerializer):
+class WholesaleCartItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     inventory_id = serializers.PrimaryKeyRelatedField(
         queryset=Inventory.objects.filter(wholesaler__isnull=False),
@@ -142,16 +155,18 @@ class WholesaleCartItemSerializer(serializers.ModelSerializer):
         model = WholesaleCartItem
         fields = ['id', 'inventory', 'inventory_id', 'quantity']
 
-class WholesaleCartSerializer(serializers.ModelSerializer):
+class WholesaleCartSerializer(FieldsetMixin, serializers.ModelSerializer):
     items = WholesaleCartItemSerializer(many=True, read_only=True)
     retailer_name = serializers.CharField(source='retailer.shop_name', read_only=True)
 
+    related_fields = {'retailer_name': 'retailer'}
+
     class Meta:
         model = WholesaleCart
         fields = ['id', 'retailer', 'retailer_name', 'created_at', 'items']
 
 
-class WholesaleOrderItemSerializer(serializers.ModelSerializer):
+class WholesaleOrderItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     status = serializers.CharField(read_only=True) # --- ADDED (Retailer can't change) ---
     
@@ -159,11 +174,14 @@ class WholesaleOrderItemSerializer(serializers.ModelSerializer):
         model = WholesaleOrderItem
         fields = ['id', 'inventory', 'quantity', 'price_at_purchase', 'status'] # --- ADDED 'status' ---
 
-class WholesaleOrderSerializer(serializers.ModelSerializer):
+class WholesaleOrderSerializer(FieldsetMixin, serializers.ModelSerializer):
     # --- UPDATED: Use the new Order Item serializer ---
     items = WholesaleOrderItemSerializer(many=True, read_only=True)
     retailer_name = serializers.CharField(source='retailer.shop_name', read_only=True)
 
+    related_fields = {'retailer_name': 'retailer'}
+    deferrable_fields = ['delivery_address']
+
     class Meta:
         model = WholesaleOrder
         fields = [
@@ -181,7 +199,7 @@ class WholesaleOrderSerializer(serializers.ModelSerializer):
 # === WHOLESALER-FACING SERIALIZERS (NEW)
 # =========================================
 
-class WholesalerFulfillmentItemSerializer(serializers.ModelSerializer):
+class WholesalerFulfillmentItemSerializer(FieldsetMixin, serializers.ModelSerializer):
     """
     Shows WholesaleOrderItem details to a Wholesaler
     and allows them to update the status.
@@ -189,9 +207,15 @@ class WholesalerFulfillmentItemSerializer(serializers.ModelSerializer):
     inventory = InventorySerializer(read_only=True)
     retailer_name = serializers.CharField(source='order.retailer.shop_name', read_only=True)
     delivery_address = serializers.CharField(source='order.delivery_address', read_only=True)
-    order_id = serializers.IntegerField(source='order.id', read_only=True)
+    order_id = serializers.IntegerField(read_only=True)
     order_status = serializers.CharField(source='order.status', read_only=True)
 
+    related_fields = {
+        'retailer_name': 'order__retailer',
+        'delivery_address': 'order',
+        'order_status': 'order',
+    }
+
     class Meta:
         model = WholesaleOrderItem
         fields = [
@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.serializers import ValidationError
+
+from .models import DeliverySlot, SlotBooking, SlotDay
+
+# =========================================
+# === DELIVERY SLOT CAPACITY
+# =========================================
+#
+# GET /api/shops/<id>/slots/   -> the bookable slots of the next SLOT_DAYS_AHEAD days
+#
+# A shop's day is split into one-hour slots (SLOT_HOURS), each taking up to
+# `capacity` scheduled orders. Checkout books the slot of the requested
+# scheduled_delivery_date at every shop in the cart with one conditional
+# UPDATE per shop (booked < capacity -> booked + 1) on the (retailer, start)
+# unique index: a full slot is simply not matched, so two checkouts can't
+# both take its last place. Slot rows are created on first booking.
+#
+# Each shop also keeps one SlotDay row per day whose bitmap marks its full
+# slots. It is updated when a booking fills a slot and when a cancelled
+# order gives its place back, so availability is read from at most
+# SLOT_DAYS_AHEAD small rows, whatever the number of orders.
+#
+# Change one hour's capacity (or close it with 0) on its DeliverySlot in
+# the admin, which recomputes that day's bitmap.
+
+SLOT_HOURS = range(9, 21)  # slot i starts at SLOT_HOURS[i]:00 local time
+SLOT_CAPACITY = 10
+SLOT_DAYS_AHEAD = 7  # today included
+ALL_SLOTS = (1 << len(SLOT_HOURS)) - 1
+
+
+def slot_bit(start):
+    return 1 << (timezone.localtime(start).hour - SLOT_HOURS[0])
+
+
+def slot_start(value, now=None):
+    """ The start of the slot `value` falls in; ValidationError when that slot can't be booked. """
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value.strip())
+        except ValueError:
+            value = None
+    if not isinstance(value, datetime):
+        raise ValidationError("scheduled_delivery_date must be a date and time, e.g. 2026-10-20T10:00:00Z.")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+
+    start = timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+    now = timezone.localtime(now)
+    if start.hour not in SLOT_HOURS:
+        raise ValidationError(
+            f"Pickups and deliveries are scheduled between {SLOT_HOURS[0]}:00 and {SLOT_HOURS[-1] + 1}:00."
+        )
+    if start <= now:
+        raise ValidationError("That delivery slot has already started. Please pick a later one.")
+    if start.date() >= now.date() + timedelta(days=SLOT_DAYS_AHEAD):
+        raise ValidationError(f"Delivery slots can only be booked up to {SLOT_DAYS_AHEAD} days ahead.")
+    return start
+
+
+def book_slot(order, retailer_ids, start):
+    """
+    Takes a place for this order in the `start` slot of each shop, or raises
+    ValidationError. Call it inside the checkout's transaction, so that a full
+    shop also gives back the places already taken at the others.
+    """
+    retailer_ids = sorted(set(retailer_ids))
+    DeliverySlot.objects.bulk_create(
+        [DeliverySlot(retailer_id=retailer_id, start=start, capacity=SLOT_CAPACITY) for retailer_id in retailer_ids],
+        ignore_conflicts=True,
+    )
+    slots = DeliverySlot.objects.filter(retailer_id__in=retailer_ids, start=start)
+    for retailer_id in retailer_ids:
+        # The capacity check and the booking are the same statement
+        taken = slots.filter(retailer_id=retailer_id, booked__lt=F('capacity')).update(booked=F('booked') + 1)
+        if not taken:
+            shop = slots.select_related('retailer').get(retailer_id=retailer_id).retailer.shop_name
+            raise ValidationError(
+                f"The {start:%H:%M} slot on {start:%Y-%m-%d} is fully booked at {shop}. Please pick another slot."
+            )
+
+    rows = list(slots.values_list('pk', 'retailer_id', 'booked', 'capacity'))
+    SlotBooking.objects.bulk_create(SlotBooking(order=order, slot_id=pk) for pk, _, _, _ in rows)
+    filled = [retailer_id for _, retailer_id, booked, capacity in rows if booked >= capacity]
+    if filled:
+        day = start.date()
+        SlotDay.objects.bulk_create([SlotDay(retailer_id=retailer_id, day=day) for retailer_id in filled], ignore_conflicts=True)
+        SlotDay.objects.filter(retailer_id__in=filled, day=day).update(full_slots=F('full_slots').bitor(slot_bit(start)))
+
+
+def release_slots(order_ids):
+    """ Gives back the places these (cancelled) orders took. """
+    bookings = SlotBooking.objects.filter(order_id__in=order_ids)
+    per_slot = Counter(bookings.values_list('slot_id', flat=True))
+    if not per_slot:
+        return
+
+    by_count = defaultdict(list)
+    for slot_id, count in per_slot.items():
+        by_count[count].append(slot_id)
+    for count, slot_ids in by_count.items():
+        DeliverySlot.objects.filter(pk__in=slot_ids).update(booked=F('booked') - count)
+
+    # A slot with a place given back is no longer full
+    freed = defaultdict(list)
+    for retailer_id, start in DeliverySlot.objects.filter(pk__in=per_slot).values_list('retailer_id', 'start'):
+        freed[timezone.localdate(start), slot_bit(start)].append(retailer_id)
+    for (day, bit), retailer_ids in freed.items():
+        SlotDay.objects.filter(retailer_id__in=retailer_ids, day=day).update(full_slots=F('full_slots').bitand(ALL_SLOTS ^ bit))
+    bookings.delete()
+
+
+def refresh_day(retailer_id, day):
+    """ Recomputes a day's bitmap from its slots, e.g. after a capacity was edited. """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    full_slots = 0
+    slots = DeliverySlot.objects.filter(retailer_id=retailer_id, start__gte=start, start__lt=start + timedelta(days=1))
+    for moment, booked, capacity in slots.values_list('start', 'booked', 'capacity'):
+        if booked >= capacity:
+            full_slots |= slot_bit(moment)
+    SlotDay.objects.update_or_create(retailer_id=retailer_id, day=day, defaults={'full_slots': full_slots})
+
+
+def available_slots(retailer_id, now=None):
+    """ [{'date', 'available': [slot starts]}] for today and the following days, from the bitmaps alone. """
+    now = timezone.localtime(now)
+    days = [now.date() + timedelta(days=offset) for offset in range(SLOT_DAYS_AHEAD)]
+    full = dict(
+        SlotDay.objects.filter(retailer_id=retailer_id, day__gte=days[0], day__lte=days[-1])
+        .values_list('day', 'full_slots')
+    )
+    result = []
+    for day in days:
+        full_slots = full.get(day, 0)
+        starts = [
+            timezone.make_aware(datetime.combine(day, time(hour)))
+            for index, hour in enumerate(SLOT_HOURS)
+            if not full_slots >> index & 1
+        ]
+        result.append({'date': day, 'available': [start for start in starts if start > now]})
+    return result
@@ -0,0 +1,133 @@
+import smtplib
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from tasks.queue import task, backoff
+from .models import OrderItem, WholesaleOrderItem
+
+# =========================================
+# === DELIVERY NOTIFICATIONS (background tasks)
+# =========================================
+#
+# Fulfillment views queue one call per delivered item (or one per bulk transition):
+#
+#     send_delivery_notifications.delay(countdown=DELIVERY_EMAIL_DELAY, item_id=7, wholesale=False)
+#     send_delivery_notifications.delay(countdown=DELIVERY_EMAIL_DELAY, item_ids=[7, 8, 9], wholesale=True)
+#
+# It is a batch task: the worker drains up to MAIL_BATCH_SIZE queued calls at
+# once, merges the items of the same Order / WholesaleOrder into one email
+# and sends every email over ONE SMTP connection (one TLS handshake). The
+# short delay lets items marked delivered one PATCH at a time land in the
+# same batch.
+#
+# Each email is sent on its own over that connection: an email the server
+# rejects is queued again for its order's items alone (with backoff, up to
+# MAIL_MAX_ATTEMPTS tries), so the others are not sent twice. Only a failure
+# to connect propagates, and the queue retries the whole batch.
+
+MAIL_BATCH_SIZE = 200
+MAIL_MAX_ATTEMPTS = 5
+DELIVERY_EMAIL_DELAY = 10  # seconds
+
+
+def _from_email():
+    return settings.DEFAULT_FROM_EMAIL or 'noreply@livemart.com'
+
+
+def _product_lines(items):
+    return ''.join(f'  - {item.inventory.product.name} (x{item.quantity})\n' for item in items)
+
+
+def customer_delivery_message(order, items):
+    """ One email for every delivered item of a customer order in this batch. """
+    user = order.customer.user
+    if len(items) == 1:
+        subject = f'Live MART: Order #{order.id} - Item Delivered'
+        message = (
+            f'Hi {user.username},\n\n'
+            f'Your item "{items[0].inventory.product.name}" from Order #{order.id} '
+            f'has been successfully delivered.\n\n'
+            f'Thank you for shopping with Live MART!'
+        )
+    else:
+        subject = f'Live MART: Order #{order.id} - {len(items)} Items Delivered'
+        message = (
+            f'Hi {user.username},\n\n'
+            f'These items from Order #{order.id} have been successfully delivered:\n'
+            f'{_product_lines(items)}\n'
+            f'Thank you for shopping with Live MART!'
+        )
+    return EmailMessage(subject, message, _from_email(), [user.email])
+
+
+def wholesale_delivery_message(order, items):
+    """ One email for every delivered item of a wholesale order in this batch. """
+    retailer = order.retailer
+    if len(items) == 1:
+        subject = f'Live MART Wholesale: Order #{order.id} Delivered'
+        message = (
+            f'Dear {retailer.shop_name},\n\n'
+            f'Your wholesale item "{items[0].inventory.product.name}" from Order #{order.id} '
+            f'has arrived at your shop location.\n\n'
+            f'Regards,\nLive MART Wholesale Team'
+        )
+    else:
+        subject = f'Live MART Wholesale: Order #{order.id} - {len(items)} Items Delivered'
+        message = (
+            f'Dear {retailer.shop_name},\n\n'
+            f'These wholesale items from Order #{order.id} have arrived at your shop location:\n'
+            f'{_product_lines(items)}\n'
+            f'Regards,\nLive MART Wholesale Team'
+        )
+    return EmailMessage(subject, message, _from_email(), [retailer.user.email])
+
+
+def _messages(model, item_ids, related, build, wholesale):
+    """ (wholesale, email, item ids) for each order among these items. """
+    items = model.objects.filter(pk__in=item_ids).select_related(*related).order_by('order_id', 'id')
+    messages = []
+    for order, group in groupby(items, key=lambda item: item.order):
+        group = list(group)
+        messages.append((wholesale, build(order, group), [item.pk for item in group]))
+    return messages
+
+
+@task(batch_size=MAIL_BATCH_SIZE)
+def send_delivery_notifications(batch):
+    """ Sends the queued delivery emails, one per order, over a single SMTP connection. """
+    retail_ids, wholesale_ids = set(), set()
+    attempts = {}
+    for call in batch:
+        # A call names one item (item_id) or a bulk transition's items (item_ids);
+        # `attempt` is set on the calls that re-queue a failed email
+        ids = call.get('item_ids') or [call['item_id']]
+        wholesale = bool(call.get('wholesale'))
+        (wholesale_ids if wholesale else retail_ids).update(ids)
+        for item_id in ids:
+            attempts[wholesale, item_id] = max(attempts.get((wholesale, item_id), 1), call.get('attempt', 1))
+    messages = [
+        *_messages(OrderItem, retail_ids, ['order__customer__user', 'inventory__product'], customer_delivery_message, False),
+        *_messages(WholesaleOrderItem, wholesale_ids, ['order__retailer__user', 'inventory__product'], wholesale_delivery_message, True),
+    ]
+    if not messages:
+        return
+
+    sent = items = 0
+    with get_connection() as connection:
+        for wholesale, message, ids in messages:
+            try:
+                connection.send_messages([message])
+            except (smtplib.SMTPException, OSError) as exc:
+                attempt = max(attempts[wholesale, item_id] for item_id in ids)
+                if attempt >= MAIL_MAX_ATTEMPTS:
+                    print(f"--- Gave up on the delivery email to {', '.join(message.to)}: {exc} ---")
+                else:
+                    send_delivery_notifications.delay(
+                        countdown=backoff(attempt), item_ids=ids, wholesale=wholesale, attempt=attempt + 1,
+                    )
+                continue
+            sent += 1
+            items += len(ids)
+    print(f"--- Sent {sent} delivery emails for {items} items ---")
@@ -1,3 +1,548 @@
-from django.test import TestCase
+import gzip
+import json
+import smtplib
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocMemBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User, CustomerProfile, RetailerProfile, WholesalerProfile
+from store.models import Product, Inventory, StockMovement
+from tasks.queue import run_pending
+from tasks.models import Task
+from .models import Cart, CartItem, Order, OrderItem, WholesaleOrder, WholesaleOrderItem
+from .tasks import send_delivery_notifications
+from .rollup import rebuild_rollups
+from .calendar import calendar_cache
+from .models import DeliverySlot, SlotDay
+
+
+class OrdersTestCase(TestCase):
+    """ Shared fixture: one customer, one retailer, one wholesaler and their stock. """
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.customer_user = User.objects.create_user(
+            username='customer', email='customer@example.com', role=User.Role.CUSTOMER,
+        )
+        self.customer = CustomerProfile.objects.create(user=self.customer_user, address='12 MG Road')
+
+        self.retailer_user = User.objects.create_user(
+            username='retailer', email='retailer@example.com', role=User.Role.RETAILER,
+        )
+        self.retailer = RetailerProfile.objects.create(user=self.retailer_user, shop_name='Corner Shop')
+        CustomerProfile.objects.create(user=self.retailer_user, address='1 Market Lane')
+
+        self.wholesaler_user = User.objects.create_user(
+            username='wholesaler', email='wholesaler@example.com', role=User.Role.WHOLESALER,
+        )
+        self.wholesaler = WholesalerProfile.objects.create(user=self.wholesaler_user, business_name='Bulk Co')
+
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.rice = Product.objects.create(name='Basmati Rice 5kg')
+        self.milk_stock = Inventory.objects.create(
+            product=self.milk, retailer=self.retailer, price=Decimal('30.00'), stock=10,
+        )
+        self.rice_stock = Inventory.objects.create(
+            product=self.rice, retailer=self.retailer, price=Decimal('450.00'), stock=10,
+        )
+        self.bulk_milk = Inventory.objects.create(
+            product=self.milk, wholesaler=self.wholesaler, price=Decimal('25.00'), stock=500,
+        )
+
+    def create_order(self, *inventories, quantity=1):
+        order = Order.objects.create(
+            customer=self.customer, total_price=Decimal('0.00'), shipping_address=self.customer.address,
+        )
+        for inventory in inventories:
+            OrderItem.objects.create(
+                order=order, inventory=inventory, quantity=quantity, price_at_purchase=inventory.price,
+            )
+        return order
+
+    def create_wholesale_order(self, *inventories, quantity=1):
+        order = WholesaleOrder.objects.create(
+            retailer=self.retailer, total_price=Decimal('0.00'), delivery_address='1 Market Lane',
+        )
+        for inventory in inventories:
+            WholesaleOrderItem.objects.create(
+                order=order, inventory=inventory, quantity=quantity, price_at_purchase=inventory.price,
+            )
+        return order
+
+
+class StreamingListTest(OrdersTestCase):
+    def test_streamed_fulfillment_list_matches_list(self):
+        for _ in range(3):
+            self.create_wholesale_order(self.bulk_milk)
+        self.client.force_authenticate(self.wholesaler_user)
+
+        expected = self.client.get('/api/wholesaler/order-items/').content
+        response = self.client.get('/api/wholesaler/order-items/?stream=1')
+        self.assertEqual(b''.join(response.streaming_content), expected)
+
+
+class ExportTest(OrdersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old_order = self.create_order(self.milk_stock, quantity=2)
+        Order.objects.filter(pk=self.old_order.pk).update(created_at=timezone.make_aware(datetime(2025, 12, 31, 23, 0)))
+        self.new_order = self.create_order(self.milk_stock, self.rice_stock)
+        self.client.force_authenticate(self.retailer_user)
+
+    def test_csv_export_with_date_range(self):
+        response = self.client.get('/api/retailer/order-items/export/?created_after=2026-01-01')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['order_item_id', 'order_id', 'order_created_at'])
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line.split(',')[1] == str(self.new_order.id) for line in lines[1:]))
+
+    def test_gzipped_ndjson_export(self):
+        response = self.client.get(
+            '/api/retailer/order-items/export/?format=ndjson&created_before=2026-01-01',
+            HTTP_ACCEPT_ENCODING='gzip, deflate',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = [json.loads(line) for line in gzip.decompress(b''.join(response.streaming_content)).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['order_id'], self.old_order.id)
+        self.assertEqual(rows[0]['price_at_purchase'], '30.00')
+        self.assertEqual(rows[0]['quantity'], 2)
+
+    def test_invalid_date_is_rejected(self):
+        response = self.client.get('/api/retailer/order-items/export/?created_after=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+    def test_inventory_export_is_scoped_to_seller(self):
+        response = self.client.get('/api/inventory/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)  # header + milk + rice, not the wholesaler's stock
+
+
+class CheckoutLedgerTest(OrdersTestCase):
+    def test_checkout_records_sales_in_the_stock_ledger(self):
+        cart = Cart.objects.create(customer=self.customer)
+        CartItem.objects.create(cart=cart, inventory=self.milk_stock, quantity=3)
+        CartItem.objects.create(cart=cart, inventory=self.rice_stock, quantity=1)
+        self.client.force_authenticate(self.customer_user)
+
+        response = self.client.post(f'/api/cart/{cart.pk}/checkout/', {}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        order_id = response.json()['id']
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('inventory_id', 'delta', 'reason', 'reference')),
+            sorted([
+                (self.milk_stock.id, -3, 'SALE', f'order:{order_id}'),
+                (self.rice_stock.id, -1, 'SALE', f'order:{order_id}'),
+            ]),
+        )
+
+
+class SMTPStandIn(threading.Thread):
+    """ A minimal local SMTP server: accepts everything, counts connections and messages. """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.port = self.server.getsockname()[1]
+        self.connections = 0
+        self.messages = []
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn, conn.makefile('rb') as reader:
+                conn.sendall(b'220 localhost\r\n')
+                for line in reader:
+                    command = line[:4].upper()
+                    if command == b'DATA':
+                        conn.sendall(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                        self.messages.append(b''.join(iter(reader.readline, b'.\r\n')))
+                        conn.sendall(b'250 OK\r\n')
+                    elif command == b'QUIT':
+                        conn.sendall(b'221 Bye\r\n')
+                        break
+                    else:
+                        conn.sendall(b'250 OK\r\n')
+
+    def stop(self):
+        self.server.close()
+
+
+class DeliveryEmailTest(OrdersTestCase):
+    def deliver(self, url, item):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(f'{url}{item.pk}/', {'status': 'DELIVERED'}, format='json')
+
+    def drain(self):
+        Task.objects.update(run_at=timezone.now())  # skip the coalescing delay
+        return run_pending()
+
+    def test_status_update_only_queues_the_email(self):
+        item = self.create_order(self.milk_stock).items.get()
+        self.client.force_authenticate(self.retailer_user)
+
+        response = self.deliver('/api/retailer/order-items/', item)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().name, 'orders.tasks.send_delivery_notifications')
+
+        self.drain()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['customer@example.com'])
+        self.assertEqual(mail.outbox[0].subject, f'Live MART: Order #{item.order_id} - Item Delivered')
+
+    def test_items_of_one_order_share_an_email(self):
+        bulk_rice = Inventory.objects.create(product=self.rice, wholesaler=self.wholesaler, price=Decimal('400.00'), stock=50)
+        order = self.create_wholesale_order(self.bulk_milk, bulk_rice)
+        self.client.force_authenticate(self.wholesaler_user)
+        for item in order.items.all():
+            self.deliver('/api/wholesaler/order-items/', item)
+
+        self.assertEqual(self.drain(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['retailer@example.com'])
+        self.assertIn('2 Items Delivered', mail.outbox[0].subject)
+
+    def test_a_rejected_email_is_retried_alone(self):
+        retail_item = self.create_order(self.milk_stock).items.get()
+        wholesale_items = list(self.create_wholesale_order(self.bulk_milk).items.values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            send_delivery_notifications.delay(item_id=retail_item.pk)
+            send_delivery_notifications.delay(item_ids=wholesale_items, wholesale=True)
+
+        send_messages = LocMemBackend.send_messages
+
+        def refuse_the_retailer(backend, messages):
+            if messages[0].to == ['retailer@example.com']:
+                raise smtplib.SMTPRecipientsRefused({'retailer@example.com': (550, b'Mailbox unavailable')})
+            return send_messages(backend, messages)
+
+        with patch.object(LocMemBackend, 'send_messages', refuse_the_retailer), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.drain(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [['customer@example.com']])
+        retry = Task.objects.get()
+        self.assertEqual(retry.kwargs, {'item_ids': wholesale_items, 'wholesale': True, 'attempt': 2})
+
+        self.drain()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[1].to, ['retailer@example.com'])
+
+    def test_batch_uses_one_smtp_connection(self):
+        products = Product.objects.bulk_create([Product(name=f'Product {n}') for n in range(100)])
+        listings = Inventory.objects.bulk_create([
+            Inventory(product=product, retailer=self.retailer, price=Decimal('10.00'), stock=5) for product in products
+        ])
+        # Two orders of 100 items each
+        self.create_order(*listings)
+        self.create_order(*listings)
+        with self.captureOnCommitCallbacks(execute=True):
+            for item_id in OrderItem.objects.values_list('id', flat=True):
+                send_delivery_notifications.delay(item_id=item_id)
+
+        smtp = SMTPStandIn()
+        smtp.start()
+        self.addCleanup(smtp.stop)
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=smtp.port,
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            started = time.monotonic()
+            self.assertEqual(run_pending(), 1)
+            elapsed = time.monotonic() - started
+
+        # 200 delivered items -> 2 emails over 1 connection
+        self.assertEqual((smtp.connections, len(smtp.messages)), (1, 2))
+        self.assertFalse(Task.objects.exists())
+        self.assertLess(elapsed, 5)
+
+
+class StatusRollupTest(OrdersTestCase):
+    def set_status(self, item, value):
+        self.client.force_authenticate(self.retailer_user)
+        response = self.client.patch(f'/api/retailer/order-items/{item.pk}/', {'status': value}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_status_follows_its_items(self):
+        order = self.create_order(self.milk_stock, self.rice_stock)
+        rebuild_rollups(Order)  # fixture orders are created without going through checkout
+        milk, rice = order.items.order_by('id')
+
+        steps = [
+            (milk, 'PROCESSING', 'PROCESSING'),
+            (milk, 'SHIPPED', 'PROCESSING'),
+            (rice, 'CANCELLED', 'SHIPPED'),
+            (milk, 'DELIVERED', 'DELIVERED'),
+        ]
+        for item, item_status, order_status in steps:
+            with self.subTest(item=item.pk, status=item_status):
+                self.set_status(item, item_status)
+                self.assertEqual(Order.objects.get(pk=order.pk).status, order_status)
+
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.item_count, order.items_processing, order.items_shipped, order.items_delivered, order.items_cancelled),
+            (2, 0, 0, 1, 1),
+        )
+        self.assertEqual(rebuild_rollups(Order), 0)  # the incremental counters match a full recount
+
+    def test_items_do_not_move_backwards(self):
+        order = self.create_order(self.milk_stock, self.rice_stock)
+        rebuild_rollups(Order)
+        milk, rice = order.items.order_by('id')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set_status(milk, 'DELIVERED')
+            self.set_status(rice, 'CANCELLED')
+            self.set_status(milk, 'DELIVERED')  # staying put is allowed
+
+            for item, item_status in [(milk, 'PENDING'), (milk, 'SHIPPED'), (rice, 'SHIPPED')]:
+                with self.subTest(item=item.pk, status=item_status):
+                    response = self.client.patch(f'/api/retailer/order-items/{item.pk}/', {'status': item_status}, format='json')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('Cannot move an item', response.json()['status'][0])
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'DELIVERED')
+        self.assertEqual((order.items_delivered, order.items_cancelled), (1, 1))
+        self.assertEqual(Task.objects.count(), 1)  # one delivery email, not re-sent
+
+    def test_customers_filter_orders_by_status(self):
+        cart = Cart.objects.create(customer=self.customer)
+        CartItem.objects.create(cart=cart, inventory=self.milk_stock, quantity=1)
+        self.client.force_authenticate(self.customer_user)
+        order_id = self.client.post(f'/api/cart/{cart.pk}/checkout/', {}, format='json').json()['id']
+        self.assertEqual(Order.objects.get(pk=order_id).item_count, 1)
+
+        self.set_status(OrderItem.objects.get(order_id=order_id), 'DELIVERED')
+        self.client.force_authenticate(self.customer_user)
+        delivered = self.client.get('/api/orders/?status=DELIVERED').json()
+        self.assertEqual([order['id'] for order in delivered], [order_id])
+        self.assertEqual(self.client.get('/api/orders/?status=PENDING').json(), [])
+
+    def test_wholesale_orders_roll_up(self):
+        order = self.create_wholesale_order(self.bulk_milk)
+        rebuild_rollups(WholesaleOrder)
+        item = order.items.get()
+        self.client.force_authenticate(self.wholesaler_user)
+        self.client.patch(f'/api/wholesaler/order-items/{item.pk}/', {'status': 'SHIPPED'}, format='json')
+        self.assertEqual(WholesaleOrder.objects.get(pk=order.pk).status, 'SHIPPED')
+
+
+class BulkTransitionTest(OrdersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.orders = [self.create_order(self.milk_stock, self.rice_stock), self.create_order(self.milk_stock)]
+        rebuild_rollups(Order)
+        self.items = list(OrderItem.objects.order_by('id'))
+        self.client.force_authenticate(self.retailer_user)
+
+    def transition(self, ids, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/retailer/order-items/transition/', {'ids': ids, 'status': status}, format='json')
+
+    def test_bulk_delivery_updates_items_orders_and_queues_one_job(self):
+        ids = [item.pk for item in self.items]
+        self.assertEqual(self.transition(ids[:1], 'SHIPPED').json(), {'updated': 1, 'unchanged': 0})
+
+        # lock + read, 1 item UPDATE, 1 counter UPDATE and 1 status UPDATE per order, the queued job
+        with self.assertNumQueries(10):
+            response = self.transition(ids, 'DELIVERED')
+        self.assertEqual(response.json(), {'updated': 3, 'unchanged': 0})
+        self.assertEqual(set(OrderItem.objects.values_list('status', flat=True)), {'DELIVERED'})
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'DELIVERED'})
+
+        # One queued job, two emails (one per order)
+        self.assertEqual(Task.objects.filter(name='orders.tasks.send_delivery_notifications').count(), 1)
+        Task.objects.update(run_at=timezone.now())
+        run_pending()
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_invalid_batches_change_nothing(self):
+        self.transition([self.items[0].pk], 'CANCELLED')
+
+        response = self.transition([self.items[0].pk, self.items[1].pk], 'SHIPPED')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.items[0].pk), response.json()['ids'][0])
+
+        other_retailer = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='other', role=User.Role.RETAILER), shop_name='Other',
+        )
+        theirs = self.create_order(Inventory.objects.create(product=self.milk, retailer=other_retailer, price=1, stock=1))
+        response = self.transition([self.items[1].pk, theirs.items.get().pk], 'SHIPPED')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(OrderItem.objects.get(pk=self.items[1].pk).status, 'PENDING')
+
+    def test_plain_post_is_still_rejected(self):
+        response = self.client.post('/api/retailer/order-items/', {}, format='json')
+        self.assertEqual(response.status_code, 405)
+
+
+class OrderEventsTest(OrdersTestCase):
+    def test_checkout_and_status_changes_are_pushed(self):
+        cart = Cart.objects.create(customer=self.customer)
+        CartItem.objects.create(cart=cart, inventory=self.milk_stock, quantity=1)
+        with patch('realtime.events.get_broker') as get_broker, self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(self.customer_user)
+            order_id = self.client.post(f'/api/cart/{cart.pk}/checkout/', {}, format='json').json()['id']
+        item = OrderItem.objects.get(order_id=order_id)
+        created = [c.args for c in get_broker().publish.call_args_list]
+        self.assertEqual(created, [
+            ([self.customer_user.pk], 'order.created', {'order_id': order_id, 'wholesale': False, 'status': 'PENDING', 'items': [item.pk]}),
+            ([self.retailer_user.pk], 'order.created', {'order_id': order_id, 'wholesale': False, 'status': 'PENDING', 'items': [item.pk]}),
+        ])
+
+        with patch('realtime.events.get_broker') as get_broker, self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(self.retailer_user)
+            self.client.post('/api/retailer/order-items/transition/', {'ids': [item.pk], 'status': 'SHIPPED'}, format='json')
+        get_broker().publish.assert_called_once_with(
+            [self.customer_user.pk, self.retailer_user.pk], 'order.items_changed',
+            {'order_id': order_id, 'wholesale': False, 'order_status': 'SHIPPED', 'items': [{'id': item.pk, 'status': 'SHIPPED'}]},
+        )
+
+
+class OrderCalendarTest(OrdersTestCase):
+    def setUp(self):
+        super().setUp()
+        calendar_cache().clear()
+        self.soon = self.create_order(self.milk_stock, self.rice_stock, quantity=2)
+        self.long_ago = self.create_order(self.rice_stock)
+        online = self.create_order(self.milk_stock)
+        Order.objects.filter(pk__in=[self.soon.pk, self.long_ago.pk]).update(is_offline_payment=True)
+        Order.objects.filter(pk=self.soon.pk).update(scheduled_delivery_date=timezone.now() + timedelta(days=2))
+        Order.objects.filter(pk__in=[self.long_ago.pk, online.pk]).update(scheduled_delivery_date=timezone.now() - timedelta(days=400))
+
+    def feed_url(self, user, path):
+        self.client.force_authenticate(user)
+        url = self.client.get(path).json()['url']
+        self.client.force_authenticate(None)
+        return url
+
+    def test_customer_feed_is_conditional_and_cached(self):
+        url = self.feed_url(self.customer_user, '/api/orders/calendar-url/')
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:order-{self.soon.pk}@livemart', body)
+
+        with self.assertNumQueries(4):  # the user and one aggregate per poll, no rendering
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            cached = self.client.get(url)
+        self.assertEqual(cached.content.decode(), body)
+
+        # Rescheduling saves the order, which retires the cached feed
+        self.soon.refresh_from_db()
+        self.soon.scheduled_delivery_date += timedelta(days=1)
+        self.soon.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.soon.scheduled_delivery_date.strftime('DTSTART:%Y%m%d'), b''.join(response.streaming_content).decode())
+
+        self.assertEqual(self.client.get(url.replace('/api/calendar/', '/api/calendar/x')).status_code, 404)
+
+    def test_feed_urls_can_be_revoked(self):
+        url = self.feed_url(self.customer_user, '/api/orders/calendar-url/')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_authenticate(self.customer_user)
+        new_url = self.client.post('/api/orders/calendar-url/').json()['url']
+        self.client.force_authenticate(None)
+        self.assertNotEqual(new_url, url)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+    def test_feeds_of_deactivated_users_or_changed_roles_are_refused(self):
+        url = self.feed_url(self.customer_user, '/api/orders/calendar-url/')
+        self.customer_user.is_active = False
+        self.customer_user.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        url = self.feed_url(self.retailer_user, '/api/retailer/orders/calendar-url/')
+        self.retailer_user.role = User.Role.CUSTOMER
+        self.retailer_user.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_retailer_pickup_feed(self):
+        url = self.feed_url(self.retailer_user, '/api/retailer/orders/calendar-url/')
+        body = b''.join(self.client.get(url).streaming_content).decode().replace('\r\n ', '')
+        self.assertIn('SUMMARY:Pickup: Order #', body)
+        self.assertIn('Prepare for customer:\\n2 x Amul Milk 1L\\n2 x Basmati Rice 5kg', body)
+
+
+@patch('orders.slots.SLOT_CAPACITY', 2)
+class DeliverySlotTest(OrdersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.when = timezone.localtime().replace(hour=10, minute=30, second=0, microsecond=0) + timedelta(days=1)
+        self.slot = self.when.replace(minute=0)
+
+    def checkout(self, when):
+        cart, _ = Cart.objects.get_or_create(customer=self.customer)
+        CartItem.objects.get_or_create(cart=cart, inventory=self.milk_stock)
+        self.client.force_authenticate(self.customer_user)
+        return self.client.post(
+            f'/api/cart/{cart.pk}/checkout/', {'scheduled_delivery_date': when.isoformat()}, format='json',
+        )
+
+    def open_slots(self):
+        with self.assertNumQueries(2):  # the shop, then its day bitmaps
+            days = self.client.get(f'/api/shops/{self.retailer.pk}/slots/').json()['days']
+        return {day['date']: day['available'] for day in days}
+
+    def test_checkout_books_the_slot_until_it_is_full(self):
+        first, second = self.checkout(self.when), self.checkout(self.when)
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(Order.objects.get(pk=first.json()['id']).scheduled_delivery_date, self.slot)
+
+        response = self.checkout(self.when)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fully booked at Corner Shop', response.json()['error'])
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(CartItem.objects.count(), 1)  # the failed checkout left the cart as it was
+
+        slot = DeliverySlot.objects.get()
+        self.assertEqual((slot.booked, slot.capacity), (2, 2))
+        self.assertEqual(SlotDay.objects.get().full_slots, 1 << 1)  # 9:00 is bit 0
+        available = self.open_slots()[self.slot.date().isoformat()]
+        self.assertEqual(len(available), 11)
+        self.assertNotIn(self.slot.isoformat().replace('+00:00', 'Z'), available)
+
+    def test_cancelled_order_gives_its_place_back(self):
+        order_ids = [self.checkout(self.when).json()['id'] for _ in range(2)]
+        self.client.force_authenticate(self.retailer_user)
+        item = OrderItem.objects.get(order_id=order_ids[0])
+        self.client.patch(f'/api/retailer/order-items/{item.pk}/', {'status': 'CANCELLED'}, format='json')
+
+        self.assertEqual(DeliverySlot.objects.get().booked, 1)
+        self.assertEqual(SlotDay.objects.get().full_slots, 0)
+        self.assertEqual(len(self.open_slots()[self.slot.date().isoformat()]), 12)
+        self.assertEqual(self.checkout(self.when).status_code, 201)
+
+    def test_unbookable_dates_are_rejected(self):
+        for when in [
+            self.when.replace(hour=3),
+            self.when - timedelta(days=2),
+            self.when + timedelta(days=8),
+        ]:
+            with self.subTest(when=when):
+                self.assertEqual(self.checkout(when).status_code, 400)
+        cart = Cart.objects.get(customer=self.customer)
+        response = self.client.post(f'/api/cart/{cart.pk}/checkout/', {'scheduled_delivery_date': 'tomorrow'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DeliverySlot.objects.exists())
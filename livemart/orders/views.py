@@ -1,15 +1,13 @@
 from rest_framework import viewsets, permissions, mixins, status
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
+from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.decorators import action
 from django.db import transaction
 
-# --- IMPORTS FOR CALENDAR & EMAIL ---
-from django.http import HttpResponse
-from datetime import datetime
-from django.core.mail import send_mail
-from django.conf import settings
-# ------------------------------------
+# --- IMPORTS FOR CALENDAR ---
+from .calendar import calendar_response, feed_url, CUSTOMER_FEED, RETAILER_FEED
+# ----------------------------
 
 from .models import (
     Cart, CartItem, Order, OrderItem,
@@ -21,11 +19,21 @@ from .serializers import (
     WholesaleCartSerializer, WholesaleCartItemSerializer, WholesaleOrderSerializer,
     WholesalerFulfillmentItemSerializer 
 )
+from store.serializers import Fieldset
 from users.models import CustomerProfile, RetailerProfile, WholesalerProfile
-from store.models import Inventory
+from store.models import Inventory, StockMovement
+from store.signals import send_inventory_changed
+from store.ledger import record_movements
+from .tasks import send_delivery_notifications, DELIVERY_EMAIL_DELAY
+from .rollup import item_status_changed
+from .slots import book_slot, slot_start
+from .fulfillment import BulkTransitionSerializer, apply_bulk_transition, check_transition
+from . import events
 
 # --- Import our custom permissions ---
 from users.permissions import IsCustomer, IsRetailer, IsWholesaler
+from livemart.conditional import ConditionalListMixin
+from livemart.streaming import StreamingListMixin, ExportMixin
 
 # =========================================
 # === CUSTOMER-FACING VIEWS
@@ -43,9 +51,10 @@ class CartItemViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """ Users can only see and manage their own cart items. """
         try:
-            return CartItem.objects.filter(cart__customer=self.request.user.customerprofile)
+            queryset = CartItem.objects.filter(cart__customer=self.request.user.customerprofile)
         except CustomerProfile.DoesNotExist:
             return CartItem.objects.none()
+        return CartItemSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     def create(self, request, *args, **kwargs):
         """ Custom logic for adding an item to the cart. """
@@ -111,7 +120,10 @@ class CartViewSet(mixins.RetrieveModelMixin,
 
     def get_object(self):
         cart, _ = Cart.objects.get_or_create(customer=self.request.user.customerprofile)
-        return cart
+        # Re-fetch with only the joins/prefetches that ?fields= and ?expand= will render
+        return CartSerializer.prepare_queryset(
+            Cart.objects.filter(pk=cart.pk), Fieldset.from_request(self.request)
+        ).get()
 
     def list(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -146,6 +158,10 @@ class CartViewSet(mixins.RetrieveModelMixin,
         total_price = 0
 
         try:
+            # --- ADDED: only bookable slots (see orders.slots) ---
+            if scheduled_delivery_date:
+                scheduled_delivery_date = slot_start(scheduled_delivery_date)
+
             with transaction.atomic():
                 order = Order.objects.create(
                     customer=cart.customer,
@@ -184,10 +200,23 @@ class CartViewSet(mixins.RetrieveModelMixin,
                         )
                     )
 
+                # --- ADDED: take a place in the slot at every shop of the cart ---
+                if scheduled_delivery_date:
+                    retailer_ids = [inv.retailer_id for inv in inventory_map.values() if inv.retailer_id]
+                    book_slot(order, retailer_ids, scheduled_delivery_date)
+
                 order.total_price = total_price
+                order.item_count = len(order_items_to_create)
                 order.save()
+                record_movements(
+                    StockMovement.Reason.SALE,
+                    [(item.inventory_id, -item.quantity) for item in cart_items],
+                    reference=f'order:{order.id}',
+                )
+                send_inventory_changed(inventory_map)
                 OrderItem.objects.bulk_create(order_items_to_create)
                 cart.items.all().delete()
+                events.order_created(order, order_items_to_create)
 
             order_serializer = OrderSerializer(order)
             return Response(order_serializer.data, status=status.HTTP_201_CREATED)
@@ -198,67 +227,42 @@ class CartViewSet(mixins.RetrieveModelMixin,
             return Response({"error": f"An error occurred during checkout: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(ConditionalListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing a customer's order history.
+    Supports conditional GET (ETag) on the list.
+    Filter by the rolled-up fulfillment status: ?status=DELIVERED
     ACCESS: Customers only.
     """
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsCustomer]
+    filterset_fields = ['status']
 
     def get_queryset(self):
         try:
-            return Order.objects.filter(customer=self.request.user.customerprofile).order_by('-created_at')
+            queryset = Order.objects.filter(customer=self.request.user.customerprofile).order_by('-created_at')
         except CustomerProfile.DoesNotExist:
             return Order.objects.none()
+        return OrderSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     # --- ADDED: Calendar Export Action ---
     @action(detail=False, methods=['get'], url_path='download-calendar')
     def download_calendar(self, request):
         """
-        Generates an iCalendar (.ics) file for all PENDING offline orders.
+        Downloads an iCalendar (.ics) file of the scheduled offline orders
+        (see orders.calendar for the date window).
         Users can import this into Google Calendar/Outlook.
         """
-        try:
-            # 1. Filter for offline orders that have a scheduled date
-            orders = Order.objects.filter(
-                customer=self.request.user.customerprofile,
-                is_offline_payment=True,
-                scheduled_delivery_date__isnull=False
-            )
+        return calendar_response(request, request.user.pk, CUSTOMER_FEED, filename='livemart_schedule.ics')
 
-            # 2. Start building the .ics file content
-            cal_content = [
-                "BEGIN:VCALENDAR",
-                "VERSION:2.0",
-                "PRODID:-//Live MART//Ecommerce App//EN",
-                "CALSCALE:GREGORIAN",
-            ]
-
-            for order in orders:
-                # Format date to YYYYMMDDTHHMMSSZ
-                dt_start = order.scheduled_delivery_date.strftime('%Y%m%dT%H%M%S')
-                
-                cal_content.extend([
-                    "BEGIN:VEVENT",
-                    f"SUMMARY:Live MART Order #{order.id} (Pickup/Delivery)",
-                    f"DTSTART:{dt_start}",
-                    f"DESCRIPTION:Scheduled offline payment/delivery for Order #{order.id}. Total: {order.total_price}",
-                    f"LOCATION:{order.shipping_address}",
-                    "STATUS:CONFIRMED",
-                    "END:VEVENT",
-                ])
-
-            cal_content.append("END:VCALENDAR")
-
-            # 3. Create the file response
-            response_text = "\n".join(cal_content)
-            response = HttpResponse(response_text, content_type='text/calendar')
-            response['Content-Disposition'] = 'attachment; filename="livemart_schedule.ics"'
-            return response
-        except Exception as e:
-             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    # -------------------------------------
+    # --- ADDED: subscribable feed (calendar apps keep it up to date) ---
+    @action(detail=False, methods=['get', 'post'], url_path='calendar-url')
+    def calendar_url(self, request):
+        """
+        The private URL to subscribe to in Google Calendar/Outlook/Apple Calendar.
+        POST issues a new URL and revokes the previous ones.
+        """
+        return Response({'url': feed_url(request, CUSTOMER_FEED, rotate=request.method == 'POST')})
 
 
 # =========================================
@@ -276,27 +280,54 @@ class RetailerOrderViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         try:
-            return Order.objects.filter(
+            queryset = Order.objects.filter(
                 items__inventory__retailer=self.request.user.retailerprofile
             ).distinct().order_by('-created_at')
         except RetailerProfile.DoesNotExist:
             return Order.objects.none()
+        return RetailerOrderSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
     
     def get_serializer_context(self):
         return {'request': self.request}
 
+    # --- ADDED: pickup calendar of the scheduled offline orders (see orders.calendar) ---
+    @action(detail=False, methods=['get', 'post'], url_path='calendar-url')
+    def calendar_url(self, request):
+        """
+        The private URL of the shop's pickup calendar, to subscribe to in a calendar app.
+        POST issues a new URL and revokes the previous ones.
+        """
+        return Response({'url': feed_url(request, RETAILER_FEED, rotate=request.method == 'POST')})
+
 
-class RetailerOrderItemViewSet(viewsets.ModelViewSet):
+class RetailerOrderItemViewSet(StreamingListMixin, ExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for a Retailer to view and UPDATE the status
     of *individual order items* that belong to them.
+    Supports streaming the full list: ?stream=1
+    Sales export: /api/retailer/order-items/export/?format=csv|ndjson&created_after=&created_before=
+    Bulk status change: POST /api/retailer/order-items/transition/ {"ids": [...], "status": "SHIPPED"}
     ACCESS: Retailers only.
     """
     serializer_class = RetailerOrderItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsRetailer]
+
+    export_filename = 'sales'
+    export_date_field = 'order__created_at'
+    export_columns = [
+        ('order_item_id', 'id'),
+        ('order_id', 'order_id'),
+        ('order_created_at', 'order__created_at'),
+        ('customer_username', 'order__customer__user__username'),
+        ('product_id', 'inventory__product_id'),
+        ('product_name', 'inventory__product__name'),
+        ('quantity', 'quantity'),
+        ('price_at_purchase', 'price_at_purchase'),
+        ('status', 'status'),
+    ]
     
-    # Allow GET, PATCH, PUT. Disallow POST, DELETE.
-    http_method_names = ['get', 'patch', 'put', 'head', 'options']
+    # Allow GET, PATCH, PUT. Disallow DELETE. POST is only for the bulk transition.
+    http_method_names = ['get', 'post', 'patch', 'put', 'head', 'options']
 
     def get_queryset(self):
         """
@@ -304,36 +335,43 @@ class RetailerOrderItemViewSet(viewsets.ModelViewSet):
         from their inventory.
         """
         try:
-            return OrderItem.objects.filter(
+            queryset = OrderItem.objects.filter(
                 inventory__retailer=self.request.user.retailerprofile
-            ).select_related(
-                'order', 
-                'order__customer__user', 
-                'inventory__product'
             ).order_by('-order__created_at')
         except RetailerProfile.DoesNotExist:
             return OrderItem.objects.none()
+        # Joins only what ?fields= and ?expand= will render (all of it by default)
+        return RetailerOrderItemSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     # --- Email Notification Logic ---
     def perform_update(self, serializer):
-        instance = serializer.save()
-        
-        if instance.status == 'DELIVERED':
-            try:
-                subject = f'Live MART: Order #{instance.order.id} - Item Delivered'
-                message = (
-                    f'Hi {instance.order.customer.user.username},\n\n'
-                    f'Your item "{instance.inventory.product.name}" from Order #{instance.order.id} '
-                    f'has been successfully delivered.\n\n'
-                    f'Thank you for shopping with Live MART!'
-                )
-                from_email = settings.DEFAULT_FROM_EMAIL or 'noreply@livemart.com'
-                recipient_list = [instance.order.customer.user.email]
+        with transaction.atomic():
+            # Lock the item: the counters move from the status it really has now
+            previous_status = OrderItem.objects.select_for_update().values_list('status', flat=True).get(pk=serializer.instance.pk)
+            check_transition(previous_status, serializer.validated_data.get('status', previous_status))
+            instance = serializer.save()
+            # --- ADDED: keep the order's item counters and status in step (see orders.rollup) ---
+            orders = item_status_changed(Order, instance.order_id, previous_status, instance.status)
+            events.items_changed(orders, [(instance.pk, instance.order_id, instance.status)], self.request.user.pk)
+
+        if instance.status == 'DELIVERED' and previous_status != 'DELIVERED':
+            # Sent by the task worker, batched with other deliveries (see orders.tasks)
+            send_delivery_notifications.delay(countdown=DELIVERY_EMAIL_DELAY, item_id=instance.pk)
 
-                send_mail(subject, message, from_email, recipient_list)
-                print(f"--- Email sent to {instance.order.customer.user.email} ---")
-            except Exception as e:
-                print(f"Failed to send email: {e}")
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Moves many of the retailer's items to one status.
+        Body: {"ids": [31, 32], "status": "SHIPPED"}
+        All-or-nothing: unknown ids or disallowed transitions change nothing.
+        """
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = apply_bulk_transition(OrderItem, request.user, **serializer.validated_data)
+        return Response(result)
 
 
 # =========================================
@@ -351,9 +389,10 @@ class WholesaleCartItemViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         try:
-            return WholesaleCartItem.objects.filter(cart__retailer=self.request.user.retailerprofile)
+            queryset = WholesaleCartItem.objects.filter(cart__retailer=self.request.user.retailerprofile)
         except RetailerProfile.DoesNotExist:
             return WholesaleCartItem.objects.none()
+        return WholesaleCartItemSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     def create(self, request, *args, **kwargs):
         """ Custom logic for adding to wholesale cart """
@@ -419,7 +458,10 @@ class WholesaleCartViewSet(mixins.RetrieveModelMixin,
 
     def get_object(self):
         cart, _ = WholesaleCart.objects.get_or_create(retailer=self.request.user.retailerprofile)
-        return cart
+        # Re-fetch with only the joins/prefetches that ?fields= and ?expand= will render
+        return WholesaleCartSerializer.prepare_queryset(
+            WholesaleCart.objects.filter(pk=cart.pk), Fieldset.from_request(self.request)
+        ).get()
 
     def list(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -489,9 +531,17 @@ class WholesaleCartViewSet(mixins.RetrieveModelMixin,
                     )
 
                 order.total_price = total_price
+                order.item_count = len(order_items_to_create)
                 order.save()
+                record_movements(
+                    StockMovement.Reason.WHOLESALE_SALE,
+                    [(item.inventory_id, -item.quantity) for item in cart_items],
+                    reference=f'wholesale-order:{order.id}',
+                )
+                send_inventory_changed(inventory_map)
                 WholesaleOrderItem.objects.bulk_create(order_items_to_create)
                 cart.items.all().delete()
+                events.order_created(order, order_items_to_create)
 
             order_serializer = WholesaleOrderSerializer(order)
             return Response(order_serializer.data, status=status.HTTP_201_CREATED)
@@ -505,32 +555,52 @@ class WholesaleCartViewSet(mixins.RetrieveModelMixin,
 class WholesaleOrderViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for a Retailer to view their past wholesale orders.
+    Filter by the rolled-up fulfillment status: ?status=SHIPPED
     ACCESS: Retailers only.
     """
     serializer_class = WholesaleOrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsRetailer]
+    filterset_fields = ['status']
 
     def get_queryset(self):
         try:
-            return WholesaleOrder.objects.filter(retailer=self.request.user.retailerprofile).order_by('-created_at')
+            queryset = WholesaleOrder.objects.filter(retailer=self.request.user.retailerprofile).order_by('-created_at')
         except RetailerProfile.DoesNotExist:
             return WholesaleOrder.objects.none()
+        return WholesaleOrderSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
 # =========================================
 # === WHOLESALER-FACING VIEWS (NEW)
 # =========================================
 
-class WholesalerFulfillmentViewSet(viewsets.ModelViewSet):
+class WholesalerFulfillmentViewSet(StreamingListMixin, ExportMixin, viewsets.ModelViewSet):
     """
     API endpoint for a Wholesaler to view and UPDATE the status
     of *individual order items* that belong to them.
+    Supports streaming the full list: ?stream=1
+    Sales export: /api/wholesaler/order-items/export/?format=csv|ndjson&created_after=&created_before=
+    Bulk status change: POST /api/wholesaler/order-items/transition/ {"ids": [...], "status": "SHIPPED"}
     ACCESS: Wholesalers only.
     """
     serializer_class = WholesalerFulfillmentItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsWholesaler]
+
+    export_filename = 'wholesale-sales'
+    export_date_field = 'order__created_at'
+    export_columns = [
+        ('order_item_id', 'id'),
+        ('order_id', 'order_id'),
+        ('order_created_at', 'order__created_at'),
+        ('retailer_name', 'order__retailer__shop_name'),
+        ('product_id', 'inventory__product_id'),
+        ('product_name', 'inventory__product__name'),
+        ('quantity', 'quantity'),
+        ('price_at_purchase', 'price_at_purchase'),
+        ('status', 'status'),
+    ]
     
-    # Allow GET, PATCH, PUT. Disallow POST, DELETE.
-    http_method_names = ['get', 'patch', 'put', 'head', 'options']
+    # Allow GET, PATCH, PUT. Disallow DELETE. POST is only for the bulk transition.
+    http_method_names = ['get', 'post', 'patch', 'put', 'head', 'options']
 
     def get_queryset(self):
         """
@@ -538,33 +608,37 @@ class WholesalerFulfillmentViewSet(viewsets.ModelViewSet):
         from their inventory.
         """
         try:
-            return WholesaleOrderItem.objects.filter(
+            queryset = WholesaleOrderItem.objects.filter(
                 inventory__wholesaler=self.request.user.wholesalerprofile
-            ).select_related(
-                'order', 
-                'order__retailer__user', 
-                'inventory__product'
             ).order_by('-order__created_at')
         except WholesalerProfile.DoesNotExist:
             return WholesaleOrderItem.objects.none()
+        # Joins only what ?fields= and ?expand= will render (all of it by default)
+        return WholesalerFulfillmentItemSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     # --- Email Notification Logic ---
     def perform_update(self, serializer):
-        instance = serializer.save()
-
-        if instance.status == 'DELIVERED':
-            try:
-                subject = f'Live MART Wholesale: Order #{instance.order.id} Delivered'
-                message = (
-                    f'Dear {instance.order.retailer.shop_name},\n\n'
-                    f'Your wholesale item "{instance.inventory.product.name}" from Order #{instance.order.id} '
-                    f'has arrived at your shop location.\n\n'
-                    f'Regards,\nLive MART Wholesale Team'
-                )
-                from_email = settings.DEFAULT_FROM_EMAIL or 'noreply@livemart.com'
-                recipient_list = [instance.order.retailer.user.email]
+        with transaction.atomic():
+            previous_status = WholesaleOrderItem.objects.select_for_update().values_list('status', flat=True).get(pk=serializer.instance.pk)
+            check_transition(previous_status, serializer.validated_data.get('status', previous_status))
+            instance = serializer.save()
+            orders = item_status_changed(WholesaleOrder, instance.order_id, previous_status, instance.status)
+            events.items_changed(orders, [(instance.pk, instance.order_id, instance.status)], self.request.user.pk)
+
+        if instance.status == 'DELIVERED' and previous_status != 'DELIVERED':
+            send_delivery_notifications.delay(countdown=DELIVERY_EMAIL_DELAY, item_id=instance.pk, wholesale=True)
+
+    def create(self, request, *args, **kwargs):
+        raise MethodNotAllowed(request.method)
 
-                send_mail(subject, message, from_email, recipient_list)
-                print(f"--- Email sent to {instance.order.retailer.user.email} ---")
-            except Exception as e:
-                print(f"Failed to send email: {e}")
\ No newline at end of file
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Moves many of the wholesaler's items to one status.
+        Body: {"ids": [31, 32], "status": "SHIPPED"}
+        All-or-nothing: unknown ids or disallowed transitions change nothing.
+        """
+        serializer = BulkTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = apply_bulk_transition(WholesaleOrderItem, request.user, **serializer.validated_data)
+        return Response(result)
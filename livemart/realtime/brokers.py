@@ -0,0 +1,201 @@
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Event
+
+# =========================================
+# === PUB/SUB FOR PUSHED EVENTS
+# =========================================
+#
+# Each open /api/events/ stream subscribes to its user's events. Publishers
+# are ordinary (sync) request code; events are handed to the subscriber's
+# event loop with call_soon_threadsafe.
+#
+# settings.REALTIME_BROKER picks the broker:
+#
+# - LocalBroker (default): in-process only. Right for one ASGI worker.
+# - DatabaseBroker: a stand-in for Redis pub/sub when there are several
+#   worker processes. Events are rows in realtime.Event; each process runs
+#   ONE poller that relays new rows to its own subscribers. Clients can
+#   resume after a reconnect with Last-Event-ID.
+#
+# A subscriber that falls SUBSCRIBER_QUEUE_SIZE events behind gets a single
+# OVERFLOW marker instead: its stream tells the client to refetch.
+
+SUBSCRIBER_QUEUE_SIZE = 100
+OVERFLOW = {'type': 'overflow', 'data': {}}
+
+POLL_INTERVAL = 1.0  # seconds
+POLL_BATCH_SIZE = 500
+EVENT_RETENTION = timedelta(hours=1)
+PRUNE_EVERY = timedelta(minutes=5)
+
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self.last_id = 0
+        # While a reconnect is replayed, live events wait here
+        self.held = None
+
+    def deliver(self, event):
+        """ Runs on the subscriber's loop. Drops events already seen (replay overlap). """
+        if self.held is not None:
+            self.held.append(event)
+            return
+        if event is not OVERFLOW and event['id'] <= self.last_id:
+            return
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = OVERFLOW
+        else:
+            self.last_id = event['id']
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Subscribed:
+    """
+    The context manager returned by subscribe(). A plain class rather than an
+    @asynccontextmanager generator, so an abandoned stream is cleaned up
+    without depending on the order in which generators are finalized.
+    """
+
+    def __init__(self, broker, user_id, last_event_id):
+        self.broker = broker
+        self.subscription = Subscription(user_id, None)
+        self.last_event_id = last_event_id
+
+    async def __aenter__(self):
+        self.subscription.loop = asyncio.get_running_loop()
+        self.broker.add(self.subscription)
+        try:
+            await self.broker.started(self.subscription, self.last_event_id)
+        except BaseException:
+            self.broker.remove(self.subscription)
+            raise
+        return self.subscription
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self.subscription)
+
+
+class LocalBroker:
+    """ In-process pub/sub. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+
+    def publish(self, user_ids, event_type, data):
+        event_id = next(self._ids)
+        for user_id in set(user_ids):
+            self.dispatch(user_id, {'id': event_id, 'type': event_type, 'data': data})
+
+    def dispatch(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def subscribe(self, user_id, last_event_id=None):
+        """ `async with broker.subscribe(user_id) as subscription:` then `await subscription.get()`. """
+        return Subscribed(self, user_id, last_event_id)
+
+    def add(self, subscription):
+        with self._lock:
+            self._subscribers[subscription.user_id].add(subscription)
+
+    def remove(self, subscription):
+        with self._lock:
+            self._subscribers[subscription.user_id].discard(subscription)
+            if not self._subscribers[subscription.user_id]:
+                del self._subscribers[subscription.user_id]
+
+    async def started(self, subscription, last_event_id):
+        """ Hook run once a subscription is registered. """
+
+
+class DatabaseBroker(LocalBroker):
+    """ Cross-process pub/sub through the realtime.Event table. """
+
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._last_seq = 0
+
+    def publish(self, user_ids, event_type, data):
+        Event.objects.bulk_create([Event(user_id=user_id, type=event_type, data=data) for user_id in set(user_ids)])
+
+    async def started(self, subscription, last_event_id):
+        if self._poller is None or self._poller.done():
+            latest = await Event.objects.order_by('-seq').values_list('seq', flat=True).afirst()
+            self._last_seq = latest or 0
+            self._poller = asyncio.create_task(self._poll())
+        if last_event_id is None:
+            subscription.last_id = self._last_seq
+            return
+
+        # Replay what the client missed, holding live events back so ids stay in order
+        subscription.held = []
+        missed = Event.objects.filter(user_id=subscription.user_id, seq__gt=last_event_id).order_by('seq')
+        replay = [event.as_event() async for event in missed[:SUBSCRIBER_QUEUE_SIZE + 1]]
+        held, subscription.held = subscription.held, None
+        subscription.last_id = last_event_id
+        if len(replay) > SUBSCRIBER_QUEUE_SIZE:
+            # Too far behind (or pruned): the client has to refetch anyway
+            subscription.last_id = max(event['id'] for event in replay + held)
+            subscription.deliver(OVERFLOW)
+            return
+        for event in replay + held:
+            subscription.deliver(event)
+
+    async def _poll(self):
+        last_pruned = timezone.now()
+        while self.subscriber_count():
+            rows = [row async for row in Event.objects.filter(seq__gt=self._last_seq).order_by('seq')[:POLL_BATCH_SIZE]]
+            for row in rows:
+                self._last_seq = row.seq
+                self.dispatch(row.user_id, row.as_event())
+
+            now = timezone.now()
+            if now - last_pruned > PRUNE_EVERY:
+                await Event.objects.filter(created_at__lt=now - EVENT_RETENTION).adelete()
+                last_pruned = now
+            if len(rows) < POLL_BATCH_SIZE:
+                await asyncio.sleep(POLL_INTERVAL)
+
+
+BROKERS = {
+    'local': 'realtime.brokers.LocalBroker',
+    'database': 'realtime.brokers.DatabaseBroker',
+}
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """ The process-wide broker named by settings.REALTIME_BROKER ('local' or 'database'). """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            name = getattr(settings, 'REALTIME_BROKER', 'local')
+            _broker = import_string(BROKERS.get(name, name))()
+        return _broker
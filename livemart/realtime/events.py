@@ -0,0 +1,14 @@
+from django.db import transaction
+
+from .brokers import get_broker
+
+# Event types pushed to /api/events/
+ORDER_CREATED = 'order.created'
+ITEMS_STATUS_CHANGED = 'order.items_changed'
+
+
+def publish(user_ids, event_type, data):
+    """ Pushes an event to these users' streams once the current transaction commits. """
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if user_ids:
+        transaction.on_commit(lambda: get_broker().publish(user_ids, event_type, data))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Event",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                ("user_id", models.IntegerField()),
+                ("type", models.CharField(max_length=50)),
+                ("data", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["user_id", "seq"], name="event_user_seq")
+                ],
+            },
+        ),
+    ]
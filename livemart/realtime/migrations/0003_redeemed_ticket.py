@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("realtime", "0002_event_user_id_bigint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RedeemedTicket",
+            fields=[
+                (
+                    "nonce",
+                    models.CharField(max_length=32, primary_key=True, serialize=False),
+                ),
+                ("redeemed_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
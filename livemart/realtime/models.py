@@ -0,0 +1,41 @@
+from django.db import models
+
+# --- OOP Class Design (Real-time events) ---
+
+
+class Event(models.Model):
+    """
+    One event for one user, as relayed by the database broker
+    (realtime.brokers.DatabaseBroker). seq doubles as the SSE event id, so a
+    reconnecting client resumes from its Last-Event-ID. Rows are pruned after
+    realtime.brokers.EVENT_RETENTION.
+    """
+    seq = models.BigAutoField(primary_key=True)
+    user_id = models.BigIntegerField()
+    type = models.CharField(max_length=50)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'seq'], name='event_user_seq'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.type} for user {self.user_id}"
+
+    def as_event(self):
+        return {'id': self.seq, 'type': self.type, 'data': self.data}
+
+
+class RedeemedTicket(models.Model):
+    """
+    The nonce of a stream ticket that has been used (realtime.views.redeem_ticket).
+    Kept in the database so every worker process refuses a second use; rows are
+    pruned once their ticket has expired anyway.
+    """
+    nonce = models.CharField(max_length=32, primary_key=True)
+    redeemed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Ticket {self.nonce} (used {self.redeemed_at:%Y-%m-%d %H:%M:%S})"
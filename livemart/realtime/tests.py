@@ -0,0 +1,130 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.client import AsyncClient
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import User
+from . import brokers
+from .brokers import LocalBroker, DatabaseBroker, OVERFLOW, SUBSCRIBER_QUEUE_SIZE
+from .models import Event, RedeemedTicket
+
+
+async def close_thread_connections():
+    # The async ORM's worker thread keeps its own connection, which would
+    # otherwise hold locks on the shared in-memory test database
+    await sync_to_async(connections.close_all)()
+
+
+class LocalBrokerTest(TestCase):
+    def test_events_reach_only_their_user(self):
+        broker = LocalBroker()
+
+        async def scenario():
+            async with broker.subscribe(1) as mine, broker.subscribe(2) as theirs:
+                # Publishers are sync request threads
+                await asyncio.to_thread(broker.publish, [1], 'order.created', {'order_id': 7})
+                event = await asyncio.wait_for(mine.get(), 1)
+                self.assertEqual((event['type'], event['data']), ('order.created', {'order_id': 7}))
+                self.assertTrue(theirs.queue.empty())
+            self.assertEqual(broker.subscriber_count(), 0)
+
+        asyncio.run(scenario())
+
+    def test_slow_subscriber_gets_an_overflow_marker(self):
+        broker = LocalBroker()
+
+        async def scenario():
+            async with broker.subscribe(1) as subscription:
+                for n in range(SUBSCRIBER_QUEUE_SIZE + 5):
+                    broker.publish([1], 'order.created', {'n': n})
+                await asyncio.sleep(0)
+                self.assertIs(await subscription.get(), OVERFLOW)
+
+        asyncio.run(scenario())
+
+
+class DatabaseBrokerTest(TransactionTestCase):
+    def test_events_cross_processes_and_resume(self):
+        publisher, subscriber = DatabaseBroker(), DatabaseBroker()  # two worker processes
+        publisher.publish([1], 'order.created', {'order_id': 1})
+        missed = Event.objects.get().seq
+
+        async def scenario():
+            async with subscriber.subscribe(1, last_event_id=missed - 1) as subscription:
+                replayed = await asyncio.wait_for(subscription.get(), 1)
+                self.assertEqual(replayed['id'], missed)
+
+                await sync_to_async(publisher.publish)([1, 2], 'order.items_changed', {'order_id': 1})
+                live = await asyncio.wait_for(subscription.get(), 3)
+                self.assertEqual((live['type'], live['data']), ('order.items_changed', {'order_id': 1}))
+            await close_thread_connections()
+
+        asyncio.run(scenario())
+
+
+class EventStreamTest(TransactionTestCase):
+    # The ORM runs in worker threads here, so rows must be committed
+    def setUp(self):
+        self.user = User.objects.create_user(username='customer', role=User.Role.CUSTOMER)
+        self.token = Token.objects.create(user=self.user)
+        brokers._broker = None
+        self.addCleanup(setattr, brokers, '_broker', None)
+
+    def test_requires_asgi_and_a_token(self):
+        self.assertEqual(APIClient().get('/api/events/').status_code, 501)
+
+        async def scenario():
+            self.assertEqual((await AsyncClient().get('/api/events/')).status_code, 401)
+            await close_thread_connections()
+        asyncio.run(scenario())
+
+    def ticket(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return client.post('/api/events/ticket/').json()['ticket']
+
+    def test_tickets_are_single_use_and_tokens_stay_out_of_urls(self):
+        ticket = self.ticket()
+
+        async def status_of(path, **headers):
+            response = await AsyncClient().get(path, headers=headers)
+            if response.streaming:
+                await response.streaming_content.aclose()
+            return response.status_code
+
+        async def scenario():
+            self.assertEqual(await status_of(f'/api/events/?ticket={ticket}'), 200)
+            self.assertEqual(await status_of(f'/api/events/?ticket={ticket}'), 401)
+            self.assertEqual(await status_of(f'/api/events/?ticket={ticket[:-2]}xx'), 401)
+            self.assertEqual(await status_of(f'/api/events/?token={self.token.key}'), 401)
+            self.assertEqual(await status_of('/api/events/', Authorization=f'Token {self.token.key}'), 200)
+            self.assertEqual(await status_of('/api/events/', Authorization='Token nope'), 401)
+            await close_thread_connections()
+        asyncio.run(scenario())
+        # Used tickets are remembered in the database, where every worker process sees them
+        self.assertEqual(RedeemedTicket.objects.count(), 1)
+
+    def test_stream_pushes_published_events(self):
+        ticket = self.ticket()
+
+        async def scenario():
+            response = await AsyncClient().get(f'/api/events/?ticket={ticket}')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            iterator = aiter(response.streaming_content)
+            self.assertEqual(await anext(iterator), b'retry: 3000\n\n')
+
+            # The first read subscribes; publish once the subscription exists
+            pending = asyncio.ensure_future(anext(iterator))
+            while not brokers.get_broker().subscriber_count():
+                await asyncio.sleep(0.01)
+            await asyncio.to_thread(brokers.get_broker().publish, [self.user.pk], 'order.created', {'order_id': 9})
+            chunk = await asyncio.wait_for(pending, 2)
+            self.assertIn(b'event: order.created\ndata: {"order_id":9}', chunk)
+            await iterator.aclose()
+            await close_thread_connections()
+
+        asyncio.run(scenario())
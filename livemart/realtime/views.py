@@ -0,0 +1,139 @@
+import asyncio
+import json
+import secrets
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import exceptions, permissions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from users.models import User
+from .brokers import get_broker, OVERFLOW
+from .models import RedeemedTicket
+
+# =========================================
+# === SERVER-SENT EVENTS
+# =========================================
+#
+# GET  /api/events/          (Authorization: Token <key>, or ?ticket=<ticket> for EventSource)
+# POST /api/events/ticket/   -> {"ticket": "...", "expires_in": 60}
+#
+#     id: 42
+#     event: order.items_changed
+#     data: {"order_id": 7, "order_status": "SHIPPED", "items": [{"id": 31, "status": "SHIPPED"}], ...}
+#
+# Replaces polling /api/orders/ and /api/retailer/order-items/: the client
+# refetches only when an event says something changed. Each open stream
+# holds no thread, so it must be served by the ASGI application
+# (livemart.asgi, e.g. `uvicorn livemart.asgi:application`).
+#
+# Requests are authenticated by the configured DRF authentication classes.
+# Browsers' EventSource can't send headers, so a client first POSTs for a
+# ticket and opens the stream with ?ticket=: tickets name the user, expire
+# after TICKET_SECONDS and work once (redeemed tickets are remembered in the
+# RedeemedTicket table, which every worker process sees).
+# API tokens never go into URLs, where logs and Referer headers keep them.
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+TICKET_SECONDS = 60
+TICKET_SALT = 'realtime.ticket'
+
+
+def format_event(event):
+    if event is OVERFLOW:
+        # The client missed events: it should refetch its lists, then carry on
+        return b'event: overflow\ndata: {}\n\n'
+    data = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+
+
+def issue_ticket(user_id):
+    return signing.dumps([user_id, secrets.token_hex(8)], salt=TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """ The active user of an unexpired, unused ticket, or None. """
+    try:
+        user_id, nonce = signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_SECONDS)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    # Tickets older than this are refused by max_age above: their nonces can go
+    RedeemedTicket.objects.filter(redeemed_at__lt=timezone.now() - timedelta(seconds=2 * TICKET_SECONDS)).delete()
+    try:
+        with transaction.atomic():
+            RedeemedTicket.objects.create(nonce=nonce)
+    except IntegrityError:
+        return None  # already used
+    return User.objects.filter(pk=user_id, is_active=True).first()
+
+
+def authenticate(request):
+    """ The user signed in by the configured DRF authentication classes or a ticket, or None. """
+    ticket = request.GET.get('ticket')
+    if ticket:
+        return redeem_ticket(ticket)
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = request.user
+    except exceptions.APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+def parse_last_event_id(request):
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    return int(value) if value and value.isdigit() else None
+
+
+async def stream_events(user_id, last_event_id):
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'.encode()
+    async with get_broker().subscribe(user_id, last_event_id) as subscription:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield b': keep-alive\n\n'
+                continue
+            yield format_event(event)
+
+
+async def event_stream(request):
+    """
+    Pushes order events for the signed-in user:
+    order.created (customers and the sellers in the order) and
+    order.items_changed (fulfillment status updates, to buyer and seller).
+    ACCESS: Any authenticated user, for their own events.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Event streams are only served by the ASGI application.'}, status=501)
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    response = StreamingHttpResponse(
+        stream_events(user.pk, parse_last_event_id(request)), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return response
+
+
+class StreamTicketView(APIView):
+    """
+    A single-use ticket for opening /api/events/?ticket= from EventSource.
+    ACCESS: Any authenticated user.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        return Response({'ticket': issue_ticket(request.user.pk), 'expires_in': TICKET_SECONDS})
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Product, Inventory, Feedback
+from .models import Category, Product, Inventory, InventoryChange, StockMovement, StockSnapshot, Feedback, InventoryImportJob
+from .ledger import record_movements
+from .signals import send_inventory_changed
+from .tasks import shrink_product_image
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -11,14 +14,61 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category', 'is_region_specific')
     search_fields = ('name', 'description')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            shrink_product_image.delay(product_id=obj.pk)
+
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
     list_display = ('product', 'retailer', 'wholesaler', 'price', 'stock')
     list_filter = ('retailer', 'wholesaler')
     search_fields = ('product__name',)
 
+    def save_model(self, request, obj, form, change):
+        previous_stock = form.initial.get('stock', 0) if change else 0
+        moved_from = [form.initial['product']] if change and 'product' in form.changed_data else []
+        super().save_model(request, obj, form, change)
+        reason = StockMovement.Reason.ADJUSTMENT if change else StockMovement.Reason.LISTED
+        record_movements(reason, [(obj.pk, obj.stock - previous_stock)], reference='admin')
+        send_inventory_changed([obj.pk], product_ids=moved_from)
+
+class HistoryAdmin(admin.ModelAdmin):
+    """ Append-only history: viewable, never added, edited or deleted by hand. """
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(InventoryChange)
+class InventoryChangeAdmin(HistoryAdmin):
+    list_display = ('seq', 'op', 'inventory_id', 'retailer_id', 'wholesaler_id', 'price', 'stock', 'created_at')
+    list_filter = ('op',)
+
+@admin.register(StockMovement)
+class StockMovementAdmin(HistoryAdmin):
+    list_display = ('inventory_id', 'delta', 'reason', 'reference', 'created_at')
+    list_filter = ('reason',)
+    search_fields = ('reference',)
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(HistoryAdmin):
+    list_display = ('inventory_id', 'stock', 'taken_at')
+
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
-    list_display = ('product', 'customer', 'rating', 'created_at')
+    list_display = ('product', 'customer', 'rating', 'helpful_count', 'created_at')
     list_filter = ('product', 'customer', 'rating')
 
+@admin.register(InventoryImportJob)
+class InventoryImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'seller', 'file_format', 'status', 'total_rows', 'error_count', 'created_at')
+    list_filter = ('status', 'file_format')
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "store"
+
+    def ready(self):
+        # Connect the inventory signal receivers
+        from . import signals, changefeed, ledger, offers, regions, ratings  # noqa: F401
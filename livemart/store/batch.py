@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .imports import seller_field_for
+from .ledger import record_movements
+from .models import Inventory, StockMovement
+from .signals import send_inventory_changed
+
+# =========================================
+# === BATCH PRICE / STOCK UPDATES
+# =========================================
+#
+# POST /api/inventory/batch-update/
+#
+#     {"items": [{"id": 12, "price": "30.00", "stock": 120},
+#                {"id": 13, "stock": 0}]}
+#
+# Each item names one of the seller's listings and the fields to change.
+# The whole batch is all-or-nothing: ownership of every id is checked with
+# one query, then all rows are written with one bulk_update() in a single
+# transaction, and inventory_changed is sent once for the batch.
+
+MAX_BATCH_SIZE = 1000
+
+BATCH_FIELDS = ['price', 'stock', 'available_via_wholesaler', 'availability_date']
+
+
+class InventoryBatchItemSerializer(serializers.Serializer):
+    """ One item of a batch update: the listing id plus at least one field to change. """
+    id = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    available_via_wholesaler = serializers.BooleanField(required=False)
+    availability_date = serializers.DateField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in BATCH_FIELDS):
+            raise serializers.ValidationError(f"Give at least one of: {', '.join(BATCH_FIELDS)}.")
+        return attrs
+
+
+class InventoryBatchUpdateSerializer(serializers.Serializer):
+    items = InventoryBatchItemSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SIZE)
+
+    def validate_items(self, items):
+        ids = [item['id'] for item in items]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("Each inventory id may appear only once per batch.")
+        return items
+
+
+def apply_batch_update(seller, items):
+    """
+    Applies validated batch items to the seller's listings and returns the
+    number of rows updated. Ids that do not exist or belong to another seller
+    raise a ValidationError listing them, and nothing is written.
+    """
+    changes = {item['id']: item for item in items}
+    seller_field = seller_field_for(seller)
+
+    with transaction.atomic():
+        # Ownership check for the whole batch: one query, no profile/user joins
+        # (profiles share the user's primary key)
+        listings = list(
+            Inventory.objects.select_for_update()
+            .filter(id__in=changes, **{f'{seller_field}_id': seller.pk})
+        )
+        missing = sorted(set(changes) - {listing.id for listing in listings})
+        if missing:
+            raise serializers.ValidationError({'items': [f"Inventory items not found or not yours: {missing}."]})
+
+        # bulk_update() skips auto_now, so stamp updated_at ourselves
+        now = timezone.now()
+        fields = {'updated_at'}
+        deltas = []
+        for listing in listings:
+            previous_stock = listing.stock
+            for field, value in changes[listing.id].items():
+                if field != 'id':
+                    setattr(listing, field, value)
+                    fields.add(field)
+            listing.updated_at = now
+            deltas.append((listing.id, listing.stock - previous_stock))
+
+        Inventory.objects.bulk_update(listings, sorted(fields), batch_size=MAX_BATCH_SIZE)
+        record_movements(StockMovement.Reason.ADJUSTMENT, deltas, reference='batch')
+        send_inventory_changed(changes)
+
+    return len(listings)
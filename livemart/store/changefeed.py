@@ -0,0 +1,85 @@
+from django.dispatch import receiver
+
+from .models import Inventory, InventoryChange
+from .signals import inventory_changed
+
+# =========================================
+# === INVENTORY CHANGE FEED
+# =========================================
+#
+# POS terminals and the mobile app mirror a seller's inventory by polling
+#
+#     GET /api/inventory/changes/?since=<seq>
+#
+# instead of re-downloading the whole list. Every Inventory write appends
+# one InventoryChange row per listing (an upsert with the new state, or a
+# tombstone), so a sync costs one indexed range scan over the changes made
+# since the client's last `seq`.
+#
+# A client starts from since=0 (the migration seeded one upsert per listing
+# that existed at the time), applies the changes in order and stores
+# `next_since` for its next poll.
+#
+# Sequence numbers come from the table's auto-increment. They are handed out
+# when the row is written but become visible when the writer commits, so the
+# feed relies on writers committing in order; SQLite's single-writer model
+# guarantees that.
+
+FEED_DEFAULT_LIMIT = 500
+FEED_MAX_LIMIT = 5000
+
+CHANGE_COLUMNS = ('id', 'product_id', 'retailer_id', 'wholesaler_id', 'price', 'stock', 'available_via_wholesaler', 'availability_date')
+
+
+@receiver(inventory_changed, dispatch_uid='store.changefeed.record_changes')
+def record_changes(sender, ids, deleted=False, **kwargs):
+    """ Appends one feed entry per changed listing: one read and one insert per batch. """
+    op = InventoryChange.Op.DELETE if deleted else InventoryChange.Op.UPSERT
+    changes = []
+    for id, product_id, retailer_id, wholesaler_id, price, stock, via_wholesaler, availability_date in (
+        Inventory.objects.filter(id__in=ids).order_by('id').values_list(*CHANGE_COLUMNS)
+    ):
+        change = InventoryChange(
+            op=op,
+            inventory_id=id,
+            product_id=product_id,
+            retailer_id=retailer_id,
+            wholesaler_id=wholesaler_id,
+        )
+        if not deleted:
+            change.price = price
+            change.stock = stock
+            change.available_via_wholesaler = via_wholesaler
+            change.availability_date = availability_date
+        changes.append(change)
+    InventoryChange.objects.bulk_create(changes)
+
+
+def change_to_dict(change):
+    """ Compact wire format: upserts carry the listing state, tombstones only the ids. """
+    data = {
+        'seq': change.seq,
+        'op': change.op,
+        'id': change.inventory_id,
+        'product': change.product_id,
+        'retailer': change.retailer_id,
+        'wholesaler': change.wholesaler_id,
+    }
+    if change.op == InventoryChange.Op.UPSERT:
+        data['price'] = change.price
+        data['stock'] = change.stock
+        data['available_via_wholesaler'] = change.available_via_wholesaler
+        data['availability_date'] = change.availability_date
+    return data
+
+
+def read_feed(queryset, since, limit):
+    """ One page of the feed after `since`: {'changes', 'next_since', 'has_more'}. """
+    page = list(queryset.filter(seq__gt=since).order_by('seq')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+    return {
+        'changes': [change_to_dict(change) for change in page],
+        'next_since': page[-1].seq if page else since,
+        'has_more': has_more,
+    }
@@ -0,0 +1,82 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, IntegerField, Q, Value, When
+
+# =========================================
+# === CATALOG FACETS
+# =========================================
+#
+# GET /api/products/facets/?search=milk&category=2
+#
+# Returns one page of the filtered products plus, for the same result set,
+# how many products fall into each category, best-price bucket and star
+# rating bucket. All three facets come from ONE grouped query: the rows are
+# grouped by (category, price bucket, rating bucket) in the database and the
+# (few) groups are rolled up per facet in Python.
+
+# (label, lower bound inclusive, upper bound exclusive) on BestOffer.price
+PRICE_BUCKETS = [
+    ('0-50', None, Decimal('50')),
+    ('50-100', Decimal('50'), Decimal('100')),
+    ('100-500', Decimal('100'), Decimal('500')),
+    ('500+', Decimal('500'), None),
+]
+NO_OFFER = 'unavailable'
+
+FACETS_DEFAULT_LIMIT = 20
+FACETS_MAX_LIMIT = 100
+
+
+def _price_bucket():
+    whens = []
+    for label, low, high in PRICE_BUCKETS:
+        condition = Q()
+        if low is not None:
+            condition &= Q(best_offer__price__gte=low)
+        if high is not None:
+            condition &= Q(best_offer__price__lt=high)
+        whens.append(When(condition, then=Value(label)))
+    return Case(*whens, default=Value(NO_OFFER), output_field=CharField())
+
+
+def _rating_bucket():
+    # 4 means "4 stars and up to 5", 0 means unrated
+    return Case(
+        *(When(rating_avg__gte=stars, then=Value(stars)) for stars in (5, 4, 3, 2, 1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def facet_counts(queryset):
+    """ Returns (total, facets) for a Product queryset using one grouped query. """
+    category = Counter()
+    category_names = {}
+    price = Counter()
+    rating = Counter()
+    total = 0
+
+    groups = (
+        queryset.order_by()
+        .values('category_id', 'category__name', price_bucket=_price_bucket(), rating_bucket=_rating_bucket())
+        .annotate(count=Count('id'))
+    )
+    for group in groups:
+        count = group['count']
+        total += count
+        category[group['category_id']] += count
+        category_names[group['category_id']] = group['category__name']
+        price[group['price_bucket']] += count
+        rating[group['rating_bucket']] += count
+
+    price_labels = [label for label, _, _ in PRICE_BUCKETS] + [NO_OFFER]
+    facets = {
+        'category': [
+            {'value': category_id, 'label': category_names[category_id], 'count': count}
+            for category_id, count in sorted(category.items(), key=lambda item: -item[1])
+        ],
+        'price': [{'value': label, 'count': price[label]} for label in price_labels if price[label]],
+        'rating': [{'value': stars, 'count': rating[stars]} for stars in (5, 4, 3, 2, 1, 0) if rating[stars]],
+    }
+    return total, facets
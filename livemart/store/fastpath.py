@@ -0,0 +1,155 @@
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from livemart.streaming import batched
+
+from .models import Product
+from .serializers import Fieldset
+
+# =========================================
+# === FAST READ PATH FOR HOT LIST ENDPOINTS
+# =========================================
+#
+# ModelSerializer builds field objects and nested serializers for every row.
+# For the big read-only lists (/api/products/, /api/inventory/) we instead
+# read plain tuples with values_list() and turn each one into a dict with a
+# converter compiled once per request. The dicts render to exactly the same
+# JSON bytes as ProductSerializer / InventorySerializer.
+
+# Reuse DRF's own field representations so formatting can never drift
+_price_representation = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+_date_representation = serializers.DateField().to_representation
+
+PRODUCT_COLUMNS = (
+    'id',
+    'name',
+    'description',
+    'category__name',  # ProductSerializer renders str(category), i.e. its name
+    'is_region_specific',
+    'image',
+    'rating_count',
+    'rating_avg',
+)
+
+INVENTORY_COLUMNS = (
+    'id',
+    *(f'product__{column}' for column in PRODUCT_COLUMNS),
+    'retailer_id',
+    'retailer__shop_name',
+    'wholesaler_id',
+    'wholesaler__business_name',
+    'price',
+    'stock',
+    'available_via_wholesaler',
+    'availability_date',
+)
+
+
+def _compile_image_url(request):
+    """ Mirrors serializers.ImageField: storage URL, made absolute when there is a request. """
+    storage = Product._meta.get_field('image').storage
+    if request is None:
+        return storage.url
+    build_absolute_uri = request.build_absolute_uri
+    return lambda name: build_absolute_uri(storage.url(name))
+
+
+def compile_product_converter(request=None):
+    """ Returns a function mapping one PRODUCT_COLUMNS row to ProductSerializer's dict. """
+    image_url = _compile_image_url(request)
+
+    def convert(row):
+        id, name, description, category, is_region_specific, image, rating_count, rating_avg = row
+        return {
+            'id': id,
+            'name': name,
+            'description': description,
+            'category': category,
+            'is_region_specific': is_region_specific,
+            'image': image_url(image) if image else None,
+            'rating_count': rating_count,
+            'rating_avg': rating_avg,
+        }
+    return convert
+
+
+def compile_inventory_converter(request=None):
+    """ Returns a function mapping one INVENTORY_COLUMNS row to InventorySerializer's dict. """
+    convert_product = compile_product_converter(request)
+    product_width = len(PRODUCT_COLUMNS)
+
+    def convert(row):
+        (retailer, retailer_name, wholesaler, wholesaler_name,
+         price, stock, available_via_wholesaler, availability_date) = row[1 + product_width:]
+        data = {
+            'id': row[0],
+            'product': convert_product(row[1:1 + product_width]),
+            'retailer': retailer,
+        }
+        # The serializer skips '<seller>_name' entirely when that seller is not set
+        if retailer is not None:
+            data['retailer_name'] = retailer_name
+        data['wholesaler'] = wholesaler
+        if wholesaler is not None:
+            data['wholesaler_name'] = wholesaler_name
+        data['price'] = _price_representation(price)
+        data['stock'] = stock
+        data['available_via_wholesaler'] = available_via_wholesaler
+        data['availability_date'] = _date_representation(availability_date)
+        return data
+    return convert
+
+
+class FastListMixin:
+    """
+    ViewSet mixin serving `list` through a values_list() query and a compiled
+    row converter instead of the ModelSerializer.
+
+    Used only when settings.FAST_LIST_SERIALIZERS is on and the request has
+    no ?fields= / ?expand= (those need the full serializer machinery).
+    Must come before ConditionalListMixin so 304 checks still run first, and
+    before StreamingListMixin so ?stream=1 uses the fast rows too.
+    """
+    fast_list_columns = ()
+    fast_list_converter = None  # staticmethod(request) -> function(row) -> dict
+
+    def use_fast_list(self):
+        return (
+            getattr(settings, 'FAST_LIST_SERIALIZERS', False)
+            and Fieldset.from_request(self.request).is_default
+        )
+
+    def get_fast_rows(self, queryset):
+        convert = self.fast_list_converter(self.request)
+        return [convert(row) for row in queryset.values_list(*self.fast_list_columns)]
+
+    def get_list_response(self, queryset):
+        if not self.use_fast_list():
+            return super().get_list_response(queryset)
+
+        page = self.paginate_queryset(queryset.values_list(*self.fast_list_columns))
+        if page is not None:
+            convert = self.fast_list_converter(self.request)
+            return self.get_paginated_response([convert(row) for row in page])
+
+        return Response(self.get_fast_rows(queryset))
+
+    async def aget_list_response(self, queryset):
+        # Used by livemart.asyncviews.AsyncReadMixin for /api/async/ lists
+        if not self.use_fast_list() or self.paginator is not None:
+            return await super().aget_list_response(queryset)
+
+        convert = self.fast_list_converter(self.request)
+        return Response([convert(row) async for row in queryset.values_list(*self.fast_list_columns)])
+
+    def iter_stream_batches(self, queryset):
+        # Used by livemart.streaming.StreamingListMixin for ?stream=1
+        if not self.use_fast_list():
+            yield from super().iter_stream_batches(queryset)
+            return
+
+        convert = self.fast_list_converter(self.request)
+        rows = queryset.values_list(*self.fast_list_columns).iterator(chunk_size=self.stream_chunk_size)
+        for batch in batched(rows, self.stream_chunk_size):
+            yield [convert(row) for row in batch]
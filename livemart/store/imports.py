@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from livemart.streaming import batched
+from users.models import User
+from .ledger import record_movements
+from .models import Product, Inventory, InventoryImportJob, StockMovement
+from .signals import send_inventory_changed
+
+# =========================================
+# === BULK INVENTORY IMPORT / UPSERT
+# =========================================
+#
+# A seller uploads a CSV or JSON-lines file with one row per product:
+#
+#     product_id,price,stock,available_via_wholesaler,availability_date
+#     42,30.00,120,,
+#
+# The file is parsed as a stream, product ids are resolved BATCH_SIZE rows at
+# a time, and each batch is upserted with one bulk_create(update_conflicts=True)
+# on the (product, seller) unique constraint. Each row carries the full listing
+# state: optional columns that are left out reset to their defaults.
+
+BATCH_SIZE = 1000
+
+# Uploads bigger than this are processed in the background (202 Accepted)
+SYNC_IMPORT_MAX_BYTES = 512 * 1024
+
+# The job keeps the first N row errors; error_count has the real total
+MAX_REPORTED_ERRORS = 1000
+
+UPSERT_FIELDS = ['price', 'stock', 'available_via_wholesaler', 'availability_date', 'updated_at']
+
+
+class InventoryImportRowSerializer(serializers.Serializer):
+    """ Validates one row of an import file. One instance is reused for every row. """
+    product_id = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock = serializers.IntegerField(min_value=0)
+    available_via_wholesaler = serializers.BooleanField(required=False, default=False)
+    availability_date = serializers.DateField(required=False, allow_null=True, default=None)
+
+
+def iter_csv_rows(fileobj):
+    """ Yields (row number, dict) pairs. Empty cells count as "not provided". """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    for number, row in enumerate(csv.DictReader(text), start=1):
+        yield number, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def iter_ndjson_rows(fileobj):
+    """ Yields (row number, dict-or-error-string) pairs, skipping blank lines. """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig')
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Invalid JSON: {exc}"
+            continue
+        yield number, row if isinstance(row, dict) else "Each line must be a JSON object."
+
+
+ROW_READERS = {
+    InventoryImportJob.Format.CSV: iter_csv_rows,
+    InventoryImportJob.Format.NDJSON: iter_ndjson_rows,
+}
+
+
+def seller_field_for(user):
+    """ 'retailer' or 'wholesaler': the Inventory FK that points at this seller's profile. """
+    return 'retailer' if user.role == User.Role.RETAILER else 'wholesaler'
+
+
+def fill_upserted_pks(listings, seller_field, seller_id):
+    """
+    Makes sure upserted listings carry their primary keys. bulk_create() fills
+    them in on databases that can return rows from an upsert; otherwise look them up.
+    """
+    if all(listing.pk is not None for listing in listings):
+        return
+    pks = dict(
+        Inventory.objects.filter(**{f'{seller_field}_id': seller_id}, product_id__in=[l.product_id for l in listings])
+        .values_list('product_id', 'id')
+    )
+    for listing in listings:
+        listing.pk = pks[listing.product_id]
+
+
+def import_inventory(job):
+    """
+    Runs an import job to completion and saves its counters and error report.
+    Every batch commits separately, so a failure part-way keeps earlier batches.
+    """
+    seller_field = seller_field_for(job.seller)
+    # Profiles share the user's primary key, so no profile lookup is needed
+    seller_id = job.seller_id
+    row_serializer = InventoryImportRowSerializer()
+    read_rows = ROW_READERS[job.file_format]
+
+    job.status = InventoryImportJob.Status.RUNNING
+    job.save(update_fields=['status'])
+
+    errors = []
+
+    def report(number, detail):
+        job.error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': number, 'errors': detail})
+
+    try:
+        with job.file.open('rb') as fileobj:
+            for batch in batched(read_rows(fileobj), BATCH_SIZE):
+                job.total_rows += len(batch)
+
+                # 1. Validate rows (a later row for the same product wins)
+                valid = {}
+                for number, row in batch:
+                    if isinstance(row, str):
+                        report(number, {'non_field_errors': [row]})
+                        continue
+                    try:
+                        data = row_serializer.run_validation(row)
+                    except serializers.ValidationError as exc:
+                        report(number, exc.detail)
+                        continue
+                    valid[data['product_id']] = (number, data)
+
+                # 2. Resolve product ids: one query per batch
+                known_products = set(Product.objects.filter(id__in=valid).values_list('id', flat=True))
+                listings = []
+                for product_id, (number, data) in valid.items():
+                    if product_id not in known_products:
+                        report(number, {'product_id': [f"Product {product_id} does not exist."]})
+                        continue
+                    listings.append(Inventory(
+                        product_id=product_id,
+                        **{f'{seller_field}_id': seller_id},
+                        price=data['price'],
+                        stock=data['stock'],
+                        available_via_wholesaler=data['available_via_wholesaler'],
+                        availability_date=data['availability_date'],
+                    ))
+
+                # 3. Upsert the batch, measuring stock deltas against the locked existing listings
+                with transaction.atomic():
+                    existing_stock = dict(
+                        Inventory.objects.select_for_update()
+                        .filter(**{f'{seller_field}_id': seller_id}, product_id__in=known_products)
+                        .values_list('product_id', 'stock')
+                    )
+                    Inventory.objects.bulk_create(
+                        listings,
+                        update_conflicts=True,
+                        unique_fields=['product', seller_field],
+                        update_fields=UPSERT_FIELDS,
+                    )
+                    fill_upserted_pks(listings, seller_field, seller_id)
+                    record_movements(
+                        StockMovement.Reason.IMPORT,
+                        [(listing.pk, listing.stock - existing_stock.get(listing.product_id, 0)) for listing in listings],
+                        reference=f'import:{job.pk}',
+                    )
+                    send_inventory_changed([listing.pk for listing in listings])
+                job.updated_count += len(existing_stock)
+                job.created_count += len(listings) - len(existing_stock)
+
+        job.status = InventoryImportJob.Status.DONE
+    except (UnicodeDecodeError, csv.Error) as exc:
+        report(job.total_rows + 1, {'non_field_errors': [f"Could not read the file: {exc}"]})
+        job.status = InventoryImportJob.Status.FAILED
+    except Exception:
+        # Database errors, bugs...: record the failure rather than leave the job RUNNING
+        report(job.total_rows + 1, {'non_field_errors': ["The import stopped unexpectedly. Earlier batches were saved."]})
+        job.status = InventoryImportJob.Status.FAILED
+        finish(job, errors)
+        raise
+
+    finish(job, errors)
+    return job
+
+
+def finish(job, errors):
+    job.errors = sorted(errors, key=lambda error: error['row'])
+    job.finished_at = timezone.now()
+    job.save()
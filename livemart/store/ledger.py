@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from livemart.streaming import batched
+from .models import Inventory, StockMovement, StockSnapshot
+
+# =========================================
+# === STOCK MOVEMENT LEDGER
+# =========================================
+#
+# Inventory.stock only holds the current level. Every write that changes it
+# also appends a StockMovement (delta, reason, reference) in bulk, so the
+# history can be audited and reconciled:
+#
+#     stock at T = latest StockSnapshot at or before T
+#                  + sum of the movements after that snapshot, up to T
+#
+# The store.0007 migration took a snapshot of every listing that existed
+# then; listings created later start from their LISTED movement.
+# compact_stock_ledger periodically folds old movements into snapshots so
+# the replay stays short and the table stays small. The movements before a
+# snapshot may be gone, so stock_as_of() raises HistoryCompacted for a time
+# earlier than the newest snapshot of a listing it is asked about, instead
+# of answering from incomplete history.
+
+COMPACT_BATCH_SIZE = 1000
+
+
+class HistoryCompacted(ValueError):
+    """ The ledger no longer holds exact stock levels before `horizon`. """
+
+    def __init__(self, horizon):
+        self.horizon = horizon
+        super().__init__(f"Stock history before {horizon.isoformat()} has been compacted.")
+
+
+def record_movements(reason, deltas, reference=''):
+    """
+    Appends one movement per (inventory id, delta) pair with one INSERT.
+    Zero deltas are skipped.
+    """
+    now = timezone.now()
+    movements = [
+        StockMovement(inventory_id=inventory_id, delta=delta, reason=reason, reference=reference, created_at=now)
+        for inventory_id, delta in deltas
+        if delta
+    ]
+    return StockMovement.objects.bulk_create(movements)
+
+
+@receiver(pre_delete, sender=Inventory, dispatch_uid='store.ledger.record_delisting')
+def record_delisting(sender, instance, **kwargs):
+    # Deleting a listing takes its remaining stock out of the books
+    record_movements(StockMovement.Reason.DELISTED, [(instance.pk, -instance.stock)])
+
+
+def stock_as_of(inventory_ids, when):
+    """
+    Returns {inventory id: stock} at time `when`, in at most three queries:
+    the horizon check, then the latest snapshot at or before `when` plus the
+    movements replayed on top of it, summed by the database. Listings with no
+    history yet are left out. Raises HistoryCompacted when one of the listings
+    has a snapshot after `when`.
+    """
+    inventory_ids = list(inventory_ids)
+
+    horizon = (
+        StockSnapshot.objects.filter(inventory_id__in=inventory_ids, taken_at__gt=when)
+        .order_by('-taken_at')
+        .values_list('taken_at', flat=True)
+        .first()
+    )
+    if horizon is not None:
+        raise HistoryCompacted(horizon)
+
+    latest_snapshot = (
+        StockSnapshot.objects.filter(inventory_id=OuterRef('inventory_id'), taken_at__lte=when)
+        .order_by('-taken_at')
+        .values('pk')[:1]
+    )
+    replayed = (
+        StockMovement.objects.filter(
+            inventory_id=OuterRef('inventory_id'),
+            created_at__gt=OuterRef('taken_at'),
+            created_at__lte=when,
+        )
+        .order_by()
+        .values('inventory_id')
+        .annotate(total=Sum('delta'))
+        .values('total')
+    )
+    stocks = {
+        inventory_id: stock + delta
+        for inventory_id, stock, delta in (
+            StockSnapshot.objects.filter(inventory_id__in=inventory_ids, pk=Subquery(latest_snapshot))
+            .annotate(delta=Coalesce(Subquery(replayed, output_field=IntegerField()), 0))
+            .values_list('inventory_id', 'stock', 'delta')
+        )
+    }
+
+    # No snapshot yet: the listing's whole history is in the movements
+    unsnapshotted = [inventory_id for inventory_id in inventory_ids if inventory_id not in stocks]
+    if unsnapshotted:
+        stocks.update(
+            StockMovement.objects.filter(inventory_id__in=unsnapshotted, created_at__lte=when)
+            .order_by()
+            .values('inventory_id')
+            .annotate(total=Sum('delta'))
+            .values_list('inventory_id', 'total')
+        )
+    return stocks
+
+
+def compact_ledger(cutoff, batch_size=COMPACT_BATCH_SIZE):
+    """
+    Rolls every movement at or before `cutoff` into a snapshot taken at
+    `cutoff`, then deletes those movements. stock_as_of() answers stay the
+    same for any time from `cutoff` on; earlier times of the compacted
+    listings raise HistoryCompacted from then on.
+    Returns (snapshots written, movements removed).
+    """
+    inventory_ids = list(
+        StockMovement.objects.filter(created_at__lte=cutoff)
+        .order_by()
+        .values_list('inventory_id', flat=True)
+        .distinct()
+    )
+    snapshots = removed = 0
+    for batch in batched(inventory_ids, batch_size):
+        with transaction.atomic():
+            stocks = stock_as_of(batch, cutoff)
+            StockSnapshot.objects.bulk_create(
+                [StockSnapshot(inventory_id=inventory_id, stock=stock, taken_at=cutoff) for inventory_id, stock in stocks.items()],
+                ignore_conflicts=True,
+            )
+            removed += StockMovement.objects.filter(inventory_id__in=batch, created_at__lte=cutoff).delete()[0]
+        snapshots += len(stocks)
+    return snapshots, removed
@@ -0,0 +1,160 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from store.models import Category, Product, Inventory
+from users.models import User, RetailerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the hot read endpoints through Django's real WSGI and ASGI "
+        "handlers (no network): sync views on a fixed pool of WSGI threads vs "
+        "sync and async (/api/async/) views on one ASGI event loop. Every query "
+        "is slowed down by --query-ms to stand in for a remote database. "
+        "Fixture rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=400, help="Requests per endpoint and deployment.")
+        parser.add_argument('--clients', type=int, default=50, help="Concurrent clients.")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads.")
+        parser.add_argument('--query-ms', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        self.query_seconds = options['query_ms'] / 1000
+        fixtures = self.create_rows(options['rows'])
+        try:
+            connection_created.connect(self.slow_down)
+            for connection in connections.all(initialized_only=True):
+                self.slow_down(None, connection)
+            self.run(fixtures, options)
+        finally:
+            connection_created.disconnect(self.slow_down)
+            for connection in connections.all(initialized_only=True):
+                connection.execute_wrappers.clear()
+            self.delete_rows(fixtures)
+
+    def slow_down(self, sender, connection, **kwargs):
+        def delayed(execute, sql, params, many, context):
+            time.sleep(self.query_seconds)
+            return execute(sql, params, many, context)
+        connection.execute_wrappers.append(delayed)
+
+    def create_rows(self, count):
+        category = Category.objects.create(name='Bench async category')
+        user = User.objects.create_user(username='bench_async_shop', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(
+            user=user, shop_name='Bench Async Shop', location_lat=Decimal('28.6'), location_lon=Decimal('77.2'),
+        )
+        products = Product.objects.bulk_create(
+            Product(name=f'Bench async product {i}', description='x' * 200, category=category)
+            for i in range(count)
+        )
+        Inventory.objects.bulk_create(
+            Inventory(product=product, retailer=retailer, price=Decimal('12.50') + i, stock=i % 50 + 1)
+            for i, product in enumerate(products)
+        )
+        return {'category': category, 'user': user, 'product': products[0]}
+
+    def delete_rows(self, fixtures):
+        Inventory.objects.filter(retailer_id=fixtures['user'].pk).delete()
+        Product.objects.filter(category=fixtures['category']).delete()
+        fixtures['category'].delete()
+        fixtures['user'].delete()
+
+    def run(self, fixtures, options):
+        paths = {
+            'products': f"products/?category={fixtures['category'].pk}",
+            'product': f"products/{fixtures['product'].pk}/",
+            'categories': 'categories/',
+            'shops': 'shops/?lat=28.6&lon=77.2&radius=5',
+        }
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+        requests, clients = options['requests'], options['clients']
+
+        for name, path in paths.items():
+            results = [
+                (f"WSGI x{options['threads']} threads", self.run_wsgi(
+                    wsgi, f'/api/{path}', requests, min(clients, options['threads']))),
+                ('ASGI sync view', asyncio.run(self.run_asgi(asgi, f'/api/{path}', requests, clients))),
+                ('ASGI async view', asyncio.run(self.run_asgi(asgi, f'/api/async/{path}', requests, clients))),
+            ]
+            for mode, (elapsed, latencies, errors) in results:
+                latencies.sort()
+                self.stdout.write(
+                    f"{name:<11} {mode:<19} {len(latencies) / elapsed:8.1f} req/s   "
+                    f"p50 {statistics.median(latencies) * 1000:8.1f} ms   "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:8.1f} ms"
+                    + (f"   {errors} errors" if errors else "")
+                )
+
+    def run_wsgi(self, application, url, requests, threads):
+        # Clients beyond the pool size wait for a free thread, as behind gunicorn
+        path, _, query = url.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+        }
+
+        def get():
+            statuses = []
+            start = time.perf_counter()
+            response = application({**environ, 'wsgi.input': BytesIO()}, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start, statuses[0].startswith('200')
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            outcomes = list(pool.map(lambda _: get(), range(requests)))
+        return self.summarize(time.perf_counter() - start, outcomes)
+
+    async def run_asgi(self, application, url, requests, clients):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(), 'root_path': '',
+            'query_string': parts.query.encode(), 'headers': [(b'host', b'localhost')],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+        }
+        slots = asyncio.Semaphore(clients)
+
+        async def get():
+            received = False
+            statuses = []
+
+            async def receive():
+                nonlocal received
+                if received:
+                    await asyncio.Event().wait()  # the client never disconnects early
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            async with slots:
+                start = time.perf_counter()
+                await application(dict(scope), receive, send)
+                return time.perf_counter() - start, statuses[0] == 200
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(get() for _ in range(requests)))
+        return self.summarize(time.perf_counter() - start, outcomes)
+
+    def summarize(self, elapsed, outcomes):
+        return elapsed, [latency for latency, _ in outcomes], sum(1 for _, ok in outcomes if not ok)
@@ -0,0 +1,95 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store.fastpath import (
+    PRODUCT_COLUMNS,
+    INVENTORY_COLUMNS,
+    compile_product_converter,
+    compile_inventory_converter,
+)
+from store.models import Category, Product, Inventory
+from store.serializers import Fieldset, ProductSerializer, InventorySerializer
+from users.models import User, RetailerProfile
+
+
+class Rollback(Exception):
+    """ Raised to undo the benchmark's fixture rows. """
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares CPU time of ModelSerializer vs the values_list() fast path "
+        "for the product and inventory lists. Fixture rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_rows(options['rows'])
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_rows(self, count):
+        category = Category.objects.create(name='Bench Category')
+        user = User.objects.create_user(username='bench_fastpath_shop', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(user=user, shop_name='Bench Shop')
+        products = Product.objects.bulk_create(
+            Product(name=f'Bench product {i}', description='x' * 200, category=category)
+            for i in range(count)
+        )
+        Inventory.objects.bulk_create(
+            Inventory(product=product, retailer=retailer, price=Decimal('12.50') + i, stock=i % 50 + 1)
+            for i, product in enumerate(products)
+        )
+
+    def run(self, rows, repeat):
+        request = Request(APIRequestFactory().get('/api/inventory/'))
+        renderer = JSONRenderer()
+        fieldset = Fieldset()
+
+        cases = [
+            ('products', ProductSerializer, Product.objects.filter(name__startswith='Bench product '),
+             PRODUCT_COLUMNS, compile_product_converter),
+            ('inventory', InventorySerializer, Inventory.objects.filter(retailer__shop_name='Bench Shop'),
+             INVENTORY_COLUMNS, compile_inventory_converter),
+        ]
+        for name, serializer_class, queryset, columns, compile_converter in cases:
+            queryset = serializer_class.prepare_queryset(queryset.order_by('id'), fieldset)
+
+            def serializer_path():
+                return serializer_class(queryset.all(), many=True, context={'request': request}).data
+
+            def fast_path():
+                convert = compile_converter(request)
+                return [convert(row) for row in queryset.values_list(*columns)]
+
+            if renderer.render(serializer_path()) != renderer.render(fast_path()):
+                self.stderr.write(f"{name}: fast path output differs from the serializer!")
+
+            slow_ms = self.cpu_ms_per_1000(serializer_path, rows, repeat)
+            fast_ms = self.cpu_ms_per_1000(fast_path, rows, repeat)
+            self.stdout.write(
+                f"{name:<10} serializer: {slow_ms:8.2f} CPU-ms/1000 rows   "
+                f"fast path: {fast_ms:8.2f} CPU-ms/1000 rows   ({slow_ms / fast_ms:.1f}x)"
+            )
+
+    def cpu_ms_per_1000(self, func, rows, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.process_time()
+            func()
+            elapsed = time.process_time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000 * 1000 / rows
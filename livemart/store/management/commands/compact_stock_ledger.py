@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from store.ledger import compact_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Rolls stock movements older than --days into per-listing snapshots "
+        "and deletes them. Run it periodically (e.g. nightly from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Keep this many days of individual movements.")
+
+    def handle(self, *args, **options):
+        # Snapshot at midnight so snapshots from daily runs line up on day boundaries
+        cutoff = (timezone.localtime() - timedelta(days=options['days'])).replace(hour=0, minute=0, second=0, microsecond=0)
+        snapshots, removed = compact_ledger(cutoff)
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {removed} movements into {snapshots} snapshots taken at {cutoff:%Y-%m-%d %H:%M}."
+        ))
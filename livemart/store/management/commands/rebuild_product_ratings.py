@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recomputes every product's rating aggregates from Feedback (drift correction)."
+
+    def handle(self, *args, **options):
+        fixed = rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating aggregates; {fixed} products were out of date."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from store.models import RegionAvailability
+from store.regions import rebuild_region_availability
+
+
+class Command(BaseCommand):
+    help = "Re-assigns retailers to regions and recomputes per-region product availability (after editing regions)."
+
+    def handle(self, *args, **options):
+        rebuild_region_availability()
+        rows = RegionAvailability.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt region availability; {rows} (region, product) rows."))
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+def seed_feed(apps, schema_editor):
+    """One upsert per existing listing, so clients can sync from since=0."""
+    Inventory = apps.get_model("store", "Inventory")
+    InventoryChange = apps.get_model("store", "InventoryChange")
+    InventoryChange.objects.bulk_create(
+        (
+            InventoryChange(
+                op="upsert",
+                inventory_id=inventory.id,
+                product_id=inventory.product_id,
+                retailer_id=inventory.retailer_id,
+                wholesaler_id=inventory.wholesaler_id,
+                price=inventory.price,
+                stock=inventory.stock,
+                available_via_wholesaler=inventory.available_via_wholesaler,
+                availability_date=inventory.availability_date,
+            )
+            for inventory in Inventory.objects.order_by("id").iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_inventory_import"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="InventoryChange",
+            fields=[
+                ("seq", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "op",
+                    models.CharField(
+                        choices=[
+                            ("upsert", "Created or updated"),
+                            ("delete", "Deleted"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("inventory_id", models.BigIntegerField()),
+                ("product_id", models.BigIntegerField()),
+                ("retailer_id", models.BigIntegerField(blank=True, null=True)),
+                ("wholesaler_id", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "price",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("stock", models.PositiveIntegerField(blank=True, null=True)),
+                (
+                    "available_via_wholesaler",
+                    models.BooleanField(blank=True, null=True),
+                ),
+                ("availability_date", models.DateField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["seq"],
+                "indexes": [
+                    models.Index(
+                        fields=["retailer_id", "seq"], name="inventory_change_retailer"
+                    ),
+                    models.Index(
+                        fields=["wholesaler_id", "seq"],
+                        name="inventory_change_wholesaler",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(seed_feed, migrations.RunPython.noop),
+    ]
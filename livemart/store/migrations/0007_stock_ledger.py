@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:47
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_current_stock(apps, schema_editor):
+    """Opening balance of the ledger: one snapshot per existing listing."""
+    Inventory = apps.get_model("store", "Inventory")
+    StockSnapshot = apps.get_model("store", "StockSnapshot")
+    now = django.utils.timezone.now()
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(inventory_id=inventory_id, stock=stock, taken_at=now)
+            for inventory_id, stock in Inventory.objects.values_list("id", "stock")
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_inventory_change"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("inventory_id", models.BigIntegerField()),
+                ("delta", models.IntegerField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("LISTED", "Listing created"),
+                            ("SALE", "Customer order"),
+                            ("WHOLESALE_SALE", "Wholesale order"),
+                            ("ADJUSTMENT", "Seller edit"),
+                            ("IMPORT", "Bulk import"),
+                            ("DELISTED", "Listing deleted"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("reference", models.CharField(blank=True, max_length=50)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "ordering": ["created_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["inventory_id", "created_at"],
+                        name="stock_movement_replay",
+                    ),
+                    models.Index(fields=["created_at"], name="stock_movement_created"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("inventory_id", models.BigIntegerField()),
+                ("stock", models.IntegerField()),
+                ("taken_at", models.DateTimeField()),
+            ],
+            options={
+                "ordering": ["taken_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("inventory_id", "taken_at"),
+                        name="unique_stock_snapshot",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(snapshot_current_stock, migrations.RunPython.noop),
+    ]
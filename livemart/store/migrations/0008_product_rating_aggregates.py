@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:49
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, NullIf, Round
+
+
+def backfill_ratings(apps, schema_editor):
+    """Initial aggregates from the existing Feedback rows."""
+    Feedback = apps.get_model("store", "Feedback")
+    Product = apps.get_model("store", "Product")
+    stars = range(1, 6)
+    fields = ["rating_count", "rating_sum", *(f"rating_{star}" for star in stars)]
+    products = []
+    for row in (
+        Feedback.objects.order_by()
+        .values("product_id")
+        .annotate(
+            rating_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{f"rating_{star}": Count("id", filter=Q(rating=star)) for star in stars},
+        )
+    ):
+        products.append(
+            Product(pk=row["product_id"], **{field: row[field] for field in fields})
+        )
+    Product.objects.bulk_update(products, fields, batch_size=1000)
+    Product.objects.filter(rating_count__gt=0).update(
+        rating_avg=Round(
+            Cast(F("rating_sum"), FloatField()) / NullIf(F("rating_count"), Value(0)), 2
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_stock_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_1",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_avg",
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_count",
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="feedback",
+            name="rating",
+            field=models.PositiveIntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(5),
+                ]
+            ),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
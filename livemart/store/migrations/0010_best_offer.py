@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_best_offers(apps, schema_editor):
+    """Cheapest in-stock retailer listing of every product (see store.offers)."""
+    Inventory = apps.get_model("store", "Inventory")
+    Product = apps.get_model("store", "Product")
+    BestOffer = apps.get_model("store", "BestOffer")
+    offers = {}
+    for inventory_id, product_id, retailer_id, price in (
+        Inventory.objects.filter(retailer__isnull=False, stock__gt=0)
+        .order_by("product_id", "price", "id")
+        .values_list("id", "product_id", "retailer_id", "price")
+    ):
+        offers.setdefault(product_id, (inventory_id, retailer_id, price))
+    best_offers = []
+    for product_id in Product.objects.values_list("id", flat=True):
+        inventory_id, retailer_id, price = offers.get(product_id, (None, None, None))
+        best_offers.append(
+            BestOffer(
+                product_id=product_id,
+                inventory_id=inventory_id,
+                retailer_id=retailer_id,
+                price=price,
+            )
+        )
+    BestOffer.objects.bulk_create(best_offers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_feedback_helpful_votes"),
+        ("users", "0002_retailerprofile_shop_address"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BestOffer",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="best_offer",
+                        serialize=False,
+                        to="store.product",
+                    ),
+                ),
+                ("inventory_id", models.BigIntegerField(blank=True, null=True)),
+                ("retailer_id", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "price",
+                    models.DecimalField(
+                        blank=True,
+                        db_index=True,
+                        decimal_places=2,
+                        max_digits=10,
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="inventory",
+            index=models.Index(
+                fields=["product", "price", "id"], name="inventory_product_price"
+            ),
+        ),
+        migrations.RunPython(backfill_best_offers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0010_best_offer"),
+        ("users", "0003_region_retailerprofile_region"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RegionAvailability",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("retailer_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True, db_index=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="region_availability",
+                        to="store.product",
+                    ),
+                ),
+                (
+                    "region",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="availability",
+                        to="users.region",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Region availability",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("region", "product"), name="unique_region_product"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from users.models import User, RetailerProfile, WholesalerProfile
+from django.utils import timezone
+from users.models import User, RetailerProfile, WholesalerProfile, Region
 
 # --- OOP Class Design (Store) ---
 
@@ -8,6 +10,9 @@ class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
 
+    # --- ADDED for conditional GET: product and inventory lists show the name ---
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name_plural = "Categories"
 
@@ -23,6 +28,20 @@ class Product(models.Model):
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
     is_region_specific = models.BooleanField(default=False)
 
+    # --- ADDED for conditional GET (ETag) ---
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # --- ADDED: rating aggregates, kept in step with Feedback by store.ratings ---
+    rating_count = models.PositiveIntegerField(default=0, db_index=True)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_avg = models.FloatField(null=True, blank=True, db_index=True)  # rounded to 2 places; null when unrated
+    # Star histogram: how many 1-star ... 5-star ratings
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.name
 
@@ -48,8 +67,20 @@ class Inventory(models.Model):
     availability_date = models.DateField(null=True, blank=True, help_text="Date when the item will be available if out of stock.")
     # --------------------
 
+    # --- ADDED for conditional GET (ETag) ---
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         verbose_name_plural = "Inventories"
+        constraints = [
+            # One listing per product per seller. Bulk imports upsert on these.
+            models.UniqueConstraint(fields=['product', 'retailer'], name='unique_retailer_product'),
+            models.UniqueConstraint(fields=['product', 'wholesaler'], name='unique_wholesaler_product'),
+        ]
+        indexes = [
+            # Cheapest listing per product (store.offers)
+            models.Index(fields=['product', 'price', 'id'], name='inventory_product_price'),
+        ]
 
     def __str__(self):
         # Handle cases where retailer or wholesaler might be None safely
@@ -61,16 +92,192 @@ class Inventory(models.Model):
             
         return f"{self.product.name} at {seller_name} (Stock: {self.stock})"
 
+class BestOffer(models.Model):
+    """
+    The cheapest in-stock retailer listing of a product, kept up to date by
+    store.offers on every Inventory write. The offer fields are empty when
+    no retailer has the product in stock.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='best_offer')
+    # Plain ids: the listing can be deleted before its replacement is chosen
+    inventory_id = models.BigIntegerField(null=True, blank=True)
+    retailer_id = models.BigIntegerField(null=True, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"Best offer for product {self.product_id}: {self.price}"
+
+class RegionAvailability(models.Model):
+    """
+    Materialized "which products can be bought in which region": one row per
+    (region, product) with at least one in-stock retailer listing there.
+    Maintained by store.regions on every Inventory write.
+    """
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='availability')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='region_availability')
+    retailer_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Region availability"
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'product'], name='unique_region_product'),
+        ]
+
+    def __str__(self):
+        return f"Product {self.product_id} in region {self.region_id} ({self.retailer_count} retailers)"
+
+class InventoryChange(models.Model):
+    """
+    One entry of the inventory change feed (/api/inventory/changes/?since=<seq>).
+    Written for every Inventory write by store.changefeed; `seq` only grows.
+    Plain id columns (not ForeignKeys) so that tombstones outlive the rows.
+    """
+    class Op(models.TextChoices):
+        UPSERT = "upsert", "Created or updated"
+        DELETE = "delete", "Deleted"
+
+    seq = models.BigAutoField(primary_key=True)
+    op = models.CharField(max_length=10, choices=Op.choices)
+
+    inventory_id = models.BigIntegerField()
+    product_id = models.BigIntegerField()
+    retailer_id = models.BigIntegerField(null=True, blank=True)
+    wholesaler_id = models.BigIntegerField(null=True, blank=True)
+
+    # Listing state after the change (left empty on tombstones)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    available_via_wholesaler = models.BooleanField(null=True, blank=True)
+    availability_date = models.DateField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            # Per-seller feeds read "WHERE <seller>_id = ? AND seq > ? ORDER BY seq"
+            models.Index(fields=['retailer_id', 'seq'], name='inventory_change_retailer'),
+            models.Index(fields=['wholesaler_id', 'seq'], name='inventory_change_wholesaler'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} inventory {self.inventory_id}"
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger: one row per change of an Inventory's stock.
+    Rows are never updated; old ones are rolled into StockSnapshots by the
+    compact_stock_ledger command (see store.ledger).
+    """
+    class Reason(models.TextChoices):
+        LISTED = "LISTED", "Listing created"
+        SALE = "SALE", "Customer order"
+        WHOLESALE_SALE = "WHOLESALE_SALE", "Wholesale order"
+        ADJUSTMENT = "ADJUSTMENT", "Seller edit"
+        IMPORT = "IMPORT", "Bulk import"
+        DELISTED = "DELISTED", "Listing deleted"
+
+    inventory_id = models.BigIntegerField()
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+    # What caused it, e.g. "order:12" or "import:3"
+    reference = models.CharField(max_length=50, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['inventory_id', 'created_at'], name='stock_movement_replay'),
+            models.Index(fields=['created_at'], name='stock_movement_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.delta:+d} on inventory {self.inventory_id} ({self.reason})"
+
+class StockSnapshot(models.Model):
+    """ The stock of one Inventory at `taken_at`, including every movement up to then. """
+    inventory_id = models.BigIntegerField()
+    stock = models.IntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['taken_at']
+        constraints = [
+            models.UniqueConstraint(fields=['inventory_id', 'taken_at'], name='unique_stock_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"Inventory {self.inventory_id}: {self.stock} at {self.taken_at:%Y-%m-%d %H:%M}"
+
+class InventoryImportJob(models.Model):
+    """
+    One bulk inventory upload (CSV or JSON lines) by a seller.
+    Small files are processed during the request; large ones in the background.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        NDJSON = "ndjson", "JSON lines"
+
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory_imports')
+    file = models.FileField(upload_to='inventory_imports/')
+    file_format = models.CharField(max_length=10, choices=Format.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    total_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # Per-row error report: [{"row": 12, "errors": {...}}, ...] (capped, see store.imports)
+    errors = models.JSONField(default=list, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.id} by {self.seller.username} ({self.status})"
+
 class Feedback(models.Model):
     """Model for product-specific feedback from customers."""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='feedback')
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feedback')
-    rating = models.PositiveIntegerField() # e.g., 1-5 stars
+    rating = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)]) # 1-5 stars
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # --- ADDED: number of FeedbackVotes ("was this helpful?") ---
+    helpful_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of one product's reviews (see store.reviews)
+            models.Index(fields=['product', '-created_at', '-id'], name='feedback_recent'),
+            models.Index(fields=['product', '-helpful_count', '-id'], name='feedback_helpful'),
+        ]
+
+    def __str__(self):
+        return f"Feedback for {self.product.name} by {self.customer.username}"
+
+class FeedbackVote(models.Model):
+    """ A user marking a review as helpful (at most once per review). """
+    feedback = models.ForeignKey(Feedback, on_delete=models.CASCADE, related_name='helpful_votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feedback_votes')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['feedback', 'user'], name='unique_feedback_vote'),
+        ]
 
     def __str__(self):
-        return f"Feedback for {self.product.name} by {self.customer.username}"
\ No newline at end of file
+        return f"{self.user.username} found feedback #{self.feedback_id} helpful"
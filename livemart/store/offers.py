@@ -0,0 +1,84 @@
+from django.db.models import OuterRef, Subquery
+from django.dispatch import receiver
+from django.utils import timezone
+
+from livemart.streaming import batched
+from .models import Inventory, BestOffer, Product
+from .signals import inventory_changed
+
+# =========================================
+# === BEST OFFER PER PRODUCT
+# =========================================
+#
+# BestOffer holds, for each product, the cheapest retailer listing that is
+# in stock (ties go to the oldest listing). It is refreshed for the
+# products touched by every inventory_changed batch: seller edits, imports,
+# batch updates, deletions and checkouts. That way /api/products/?sort=best_price
+# is a single LEFT JOIN on the product's primary key instead of a scan of
+# every Inventory row.
+#
+# A BestOffer row is only rewritten when the chosen offer actually changed,
+# so its updated_at (which feeds the product list's ETag) stays stable
+# while stock merely goes up and down.
+
+REFRESH_BATCH_SIZE = 500
+
+
+def _offer_candidates(exclude_ids=()):
+    return (
+        Inventory.objects.filter(retailer__isnull=False, stock__gt=0)
+        .exclude(id__in=exclude_ids)
+    )
+
+
+def refresh_best_offers(product_ids, exclude_ids=()):
+    """
+    Recomputes the best offer of these products in three queries per batch:
+    pick the cheapest listing per product, read the current rows, upsert the
+    ones that changed. `exclude_ids` are listings about to be deleted.
+    """
+    for batch in batched(sorted(set(product_ids)), REFRESH_BATCH_SIZE):
+        cheapest = (
+            _offer_candidates(exclude_ids)
+            .filter(product_id=OuterRef('pk'))
+            .order_by('price', 'id')
+        )
+        offers = {
+            product_id: (inventory_id, retailer_id, price)
+            for product_id, inventory_id, retailer_id, price in Product.objects.filter(pk__in=batch)
+            .annotate(
+                best_id=Subquery(cheapest.values('id')[:1]),
+                best_retailer=Subquery(cheapest.values('retailer_id')[:1]),
+                best_price=Subquery(cheapest.values('price')[:1]),
+            )
+            .values_list('pk', 'best_id', 'best_retailer', 'best_price')
+        }
+        current = {
+            product_id: (inventory_id, retailer_id, price)
+            for product_id, inventory_id, retailer_id, price in BestOffer.objects.filter(
+                product_id__in=offers
+            ).values_list('product_id', 'inventory_id', 'retailer_id', 'price')
+        }
+
+        now = timezone.now()
+        changed = []
+        for product_id, offer in offers.items():
+            if current.get(product_id) != offer:
+                inventory_id, retailer_id, price = offer
+                changed.append(BestOffer(
+                    product_id=product_id, inventory_id=inventory_id,
+                    retailer_id=retailer_id, price=price, updated_at=now,
+                ))
+        BestOffer.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['inventory_id', 'retailer_id', 'price', 'updated_at'],
+        )
+
+
+@receiver(inventory_changed, dispatch_uid='store.offers.on_inventory_changed')
+def on_inventory_changed(sender, ids, deleted=False, product_ids=(), **kwargs):
+    # product_ids: the products a moved listing left, which may have lost their best offer
+    product_ids = {*Inventory.objects.filter(id__in=ids).values_list('product_id', flat=True), *product_ids}
+    refresh_best_offers(product_ids, exclude_ids=ids if deleted else ())
@@ -0,0 +1,134 @@
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, NullIf, Round
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from livemart.streaming import batched
+from .models import Product, Feedback
+from .reviews import invalidate_reviews
+
+# =========================================
+# === PRODUCT RATING AGGREGATES
+# =========================================
+#
+# Product carries rating_count, rating_sum, the 1-5 star histogram
+# (rating_1 ... rating_5) and rating_avg, so product lists can sort and
+# filter by rating without aggregating Feedback.
+#
+# Every Feedback save or delete adjusts them with a single UPDATE of F()
+# expressions inside the write's transaction (no read-modify-write race),
+# from the model signals below, so the API, the admin and cascades (e.g.
+# deleting a user) all keep them right. QuerySet.update() and raw SQL
+# bypass the signals: if the aggregates ever drift,
+# `manage.py rebuild_product_ratings` recomputes them from Feedback.
+
+STARS = range(1, 6)
+REBUILD_BATCH_SIZE = 1000
+
+
+def _average(rating_sum, rating_count):
+    # NULL when there are no ratings left, instead of dividing by zero
+    return Round(Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)), 2)
+
+
+def _apply(product_id, rating, sign):
+    rating_sum = F('rating_sum') + sign * rating
+    rating_count = F('rating_count') + sign
+    Product.objects.filter(pk=product_id).update(**{
+        'rating_sum': rating_sum,
+        'rating_count': rating_count,
+        f'rating_{rating}': F(f'rating_{rating}') + sign,
+        'rating_avg': _average(rating_sum, rating_count),
+        # .update() skips auto_now; product lists' ETags depend on it
+        'updated_at': timezone.now(),
+    })
+
+
+def rating_added(feedback):
+    _apply(feedback.product_id, feedback.rating, 1)
+
+
+def rating_removed(feedback):
+    _apply(feedback.product_id, feedback.rating, -1)
+
+
+def rating_changed(old_product_id, old_rating, feedback):
+    """ After an edit: move the rating between buckets (or products) if it changed. """
+    if (old_product_id, old_rating) == (feedback.product_id, feedback.rating):
+        return
+    _apply(old_product_id, old_rating, -1)
+    rating_added(feedback)
+
+
+def _remember(feedback):
+    # __dict__: don't load deferred fields just to remember them
+    feedback._rated = (feedback.__dict__.get('product_id'), feedback.__dict__.get('rating'))
+
+
+@receiver(post_init, sender=Feedback, dispatch_uid='store.ratings.on_feedback_loaded')
+def on_feedback_loaded(sender, instance, **kwargs):
+    _remember(instance)
+
+
+@receiver(pre_save, sender=Feedback, dispatch_uid='store.ratings.on_feedback_saving')
+def on_feedback_saving(sender, instance, **kwargs):
+    if not instance._state.adding and None in instance._rated:
+        # Loaded with .only()/.defer(): read what is stored before it is overwritten
+        instance._rated = Feedback.objects.filter(pk=instance.pk).values_list('product_id', 'rating').first()
+
+
+@receiver(post_save, sender=Feedback, dispatch_uid='store.ratings.on_feedback_saved')
+def on_feedback_saved(sender, instance, created, **kwargs):
+    old_product_id, old_rating = instance._rated or (None, None)
+    if created or old_product_id is None:
+        rating_added(instance)
+    else:
+        rating_changed(old_product_id, old_rating, instance)
+    invalidate_reviews(*{old_product_id, instance.product_id} - {None})
+    _remember(instance)
+
+
+@receiver(post_delete, sender=Feedback, dispatch_uid='store.ratings.on_feedback_deleted')
+def on_feedback_deleted(sender, instance, **kwargs):
+    rating_removed(instance)
+    invalidate_reviews(instance.product_id)
+
+
+def rebuild_ratings(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recomputes every product's aggregates from Feedback with one grouped
+    query and batched bulk_update()s. Returns the number of products whose
+    stored aggregates were wrong.
+    """
+    fields = ['rating_count', 'rating_sum', *(f'rating_{star}' for star in STARS)]
+    totals = {
+        row['product_id']: row
+        for row in Feedback.objects.order_by().values('product_id').annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{f'rating_{star}': Count('id', filter=Q(rating=star)) for star in STARS},
+        )
+    }
+
+    fixed = 0
+    now = timezone.now()
+    products = list(Product.objects.only('pk', *fields).order_by('pk'))
+    for batch in batched(products, batch_size):
+        stale = []
+        for product in batch:
+            row = totals.get(product.pk, {})
+            expected = {field: row.get(field, 0) for field in fields}
+            if any(getattr(product, field) != value for field, value in expected.items()):
+                for field, value in expected.items():
+                    setattr(product, field, value)
+                product.updated_at = now
+                stale.append(product)
+        if stale:
+            Product.objects.bulk_update(stale, [*fields, 'updated_at'])
+            # Same rounding as the incremental path
+            Product.objects.filter(pk__in=[product.pk for product in stale]).update(
+                rating_avg=_average(F('rating_sum'), F('rating_count')),
+            )
+        fixed += len(stale)
+    return fixed
@@ -0,0 +1,127 @@
+from django.db.models import Count, Exists, OuterRef, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from livemart.streaming import batched
+from users.models import Region, RetailerProfile
+from .models import Inventory, Product, RegionAvailability
+from .signals import inventory_changed
+
+# =========================================
+# === REGION-AWARE CATALOG
+# =========================================
+#
+# Retailers are assigned to a Region from their shop coordinates
+# (users.models.RetailerProfile.save). RegionAvailability materializes,
+# per region, the products that at least one retailer there has in stock.
+# It is refreshed for the products touched by every inventory_changed batch
+# and whenever a retailer profile is saved (the shop may have moved region).
+#
+#     /api/products/?region=<slug or id>   national products + region-specific ones stocked there
+#     /api/inventory/?region=<slug or id>  listings of retailers in the region
+#
+# Both filters are a single indexed lookup: an EXISTS on the
+# (region, product) unique index, or retailer.region_id for listings.
+
+REFRESH_BATCH_SIZE = 500
+
+
+def refresh_region_availability(product_ids, exclude_ids=()):
+    """
+    Recomputes the availability rows of these products in every region:
+    one grouped count, one read of the current rows, then an upsert of the
+    changed rows and a delete of the rows that no longer apply.
+    `exclude_ids` are listings about to be deleted.
+    """
+    for batch in batched(sorted(set(product_ids)), REFRESH_BATCH_SIZE):
+        counts = {
+            (row['retailer__region_id'], row['product_id']): row['retailers']
+            for row in Inventory.objects.filter(product_id__in=batch, retailer__region__isnull=False, stock__gt=0)
+            .exclude(id__in=exclude_ids)
+            .order_by()
+            .values('retailer__region_id', 'product_id')
+            .annotate(retailers=Count('retailer_id', distinct=True))
+        }
+        current = {
+            (region_id, product_id): (pk, retailer_count)
+            for pk, region_id, product_id, retailer_count in RegionAvailability.objects.filter(product_id__in=batch)
+            .values_list('pk', 'region_id', 'product_id', 'retailer_count')
+        }
+
+        now = timezone.now()
+        changed = [
+            RegionAvailability(region_id=region_id, product_id=product_id, retailer_count=retailers, updated_at=now)
+            for (region_id, product_id), retailers in counts.items()
+            if current.get((region_id, product_id), (None, None))[1] != retailers
+        ]
+        RegionAvailability.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['region', 'product'],
+            update_fields=['retailer_count', 'updated_at'],
+        )
+        gone = {key: pk for key, (pk, _) in current.items() if key not in counts}
+        if gone:
+            RegionAvailability.objects.filter(pk__in=gone.values()).delete()
+
+        # Products appearing in or leaving a region change its catalog (and its list ETags)
+        regions = {region_id for region_id, _ in gone} | {
+            region_id for region_id, product_id in counts if (region_id, product_id) not in current
+        }
+        if regions:
+            Region.objects.filter(pk__in=regions).update(catalog_changed_at=now)
+
+
+def rebuild_region_availability():
+    """ Re-assigns every retailer to its region, then recomputes all availability rows. """
+    retailers = list(RetailerProfile.objects.filter(location_lat__isnull=False, location_lon__isnull=False))
+    regions = list(Region.objects.all())
+    for retailer in retailers:
+        retailer.region = Region.for_coordinates(retailer.location_lat, retailer.location_lon, regions=regions)
+    RetailerProfile.objects.bulk_update(retailers, ['region'], batch_size=REFRESH_BATCH_SIZE)
+    refresh_region_availability(Product.objects.values_list('id', flat=True))
+    Region.objects.update(catalog_changed_at=timezone.now())
+
+
+@receiver(inventory_changed, dispatch_uid='store.regions.on_inventory_changed')
+def on_inventory_changed(sender, ids, deleted=False, product_ids=(), **kwargs):
+    # product_ids: the products a moved listing left, which may have lost a region
+    product_ids = {
+        *Inventory.objects.filter(id__in=ids, retailer__isnull=False).values_list('product_id', flat=True), *product_ids,
+    }
+    refresh_region_availability(product_ids, exclude_ids=ids if deleted else ())
+
+
+@receiver(post_save, sender=RetailerProfile, dispatch_uid='store.regions.on_retailer_saved')
+def on_retailer_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_region_id', None)
+    if created or previous == instance.region_id:
+        return
+    refresh_region_availability(instance.inventory.values_list('product_id', flat=True))
+    # The shop's listings moved between the two regions' inventory lists
+    moved = [region_id for region_id in (previous, instance.region_id) if region_id is not None]
+    Region.objects.filter(pk__in=moved).update(catalog_changed_at=timezone.now())
+
+
+def region_from_request(request):
+    """ The Region named by ?region= (slug or id), None without the parameter. """
+    value = request.query_params.get('region')
+    if not value:
+        return None
+    # Looked up once per request (the list and its validators both need it)
+    region = getattr(request, '_region', None)
+    if region is None:
+        lookup = Q(slug=value) | Q(pk=int(value)) if value.isdigit() else Q(slug=value)
+        region = Region.objects.filter(lookup).first()
+        if region is None:
+            raise ValidationError({'region': f'Unknown region "{value}".'})
+        request._region = region
+    return region
+
+
+def products_in_region(queryset, region):
+    """ National products, plus region-specific ones in stock somewhere in `region`. """
+    stocked = RegionAvailability.objects.filter(region=region, product=OuterRef('pk'))
+    return queryset.filter(Q(is_region_specific=False) | Exists(stocked))
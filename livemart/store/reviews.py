@@ -0,0 +1,40 @@
+from django.core.cache import caches
+from django.db import transaction
+
+# =========================================
+# === PER-PRODUCT REVIEW PAGES
+# =========================================
+#
+# GET /api/feedback/?product=7               newest first
+# GET /api/feedback/?product=7&sort=helpful  most helpful first
+#
+# Feedback is keyset-paginated (livemart.pagination.KeysetPagination).
+# The first page of each sort order is what almost every product page
+# asks for, so it is kept, already serialized, in the bounded LRU cache
+# settings.CACHES['reviews'] and dropped whenever that product's feedback
+# changes. Later pages (?cursor=...) always go to the database; with the
+# (product, ...) indexes each one is a short range scan.
+#
+# The 'reviews' cache is per process. Its TIMEOUT bounds how long another
+# process can serve a stale first page; point it at a shared backend
+# (Redis, Memcached) to make invalidation immediate everywhere.
+
+REVIEW_ORDERINGS = {
+    'recent': ('-created_at', '-id'),
+    'helpful': ('-helpful_count', '-id'),
+}
+DEFAULT_REVIEW_SORT = 'recent'
+
+
+def review_cache():
+    return caches['reviews']
+
+
+def review_cache_key(product_id, sort):
+    return f'product:{product_id}:{sort}'
+
+
+def invalidate_reviews(*product_ids):
+    """ Drops the cached pages of these products once the current transaction commits. """
+    keys = [review_cache_key(product_id, sort) for product_id in set(product_ids) for sort in REVIEW_ORDERINGS]
+    transaction.on_commit(lambda: review_cache().delete_many(keys))
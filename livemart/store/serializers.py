@@ -1,23 +1,217 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Category, Product, Inventory, Feedback
-from users.models import User, RetailerProfile # --- UPDATED IMPORT ---
+from rest_framework.permissions import SAFE_METHODS
+from .models import Category, Product, Inventory, Feedback, InventoryImportJob, BestOffer
+from users.models import User, RetailerProfile, Region # --- UPDATED IMPORT ---
+
+# =========================================
+# === SPARSE FIELDSETS (?fields= / ?expand=)
+# =========================================
+
+class Fieldset:
+    """
+    The parsed ?fields= and ?expand= query parameters of a read request.
+
+    Paths are dotted and relative to the top-level object, e.g.
+    /api/inventory/?fields=id,price,stock,product.name&expand=product
+
+    - fields: only the listed fields are rendered. A nested level that is
+      not mentioned (e.g. just `product`) keeps all of its fields.
+    - expand: only the listed relations are rendered as nested objects;
+      every other relation is rendered as its primary key.
+    Leaving a parameter out keeps the full legacy payload for that aspect.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = None if fields is None else [tuple(path.split('.')) for path in fields]
+        self.expand = None if expand is None else set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        # Sparse fieldsets only apply to reads; writes always get the full serializer
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+
+        fieldset = getattr(request, '_fieldset', None)
+        if fieldset is None:
+            params = request.query_params
+            fieldset = cls(
+                fields=_split_param(params['fields']) if 'fields' in params else None,
+                expand=_split_param(params['expand']) if 'expand' in params else None,
+            )
+            request._fieldset = fieldset
+        return fieldset
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, path):
+        """ Is the field at this dotted path rendered? """
+        if not self.fields:
+            return True
+        segments = tuple(path.split('.'))
+        for depth, segment in enumerate(segments):
+            parent = segments[:depth]
+            allowed = {entry[depth] for entry in self.fields if len(entry) > depth and entry[:depth] == parent}
+            if allowed and segment not in allowed:
+                return False
+        return True
+
+    def expands(self, path):
+        """ Is the relation at this dotted path rendered as a nested object? """
+        if self.expand is None:
+            return True
+        if any(entry == path or entry.startswith(path + '.') for entry in self.expand):
+            return True
+        # Asking for a nested field (fields=product.name) implies expanding its parent
+        segments = tuple(path.split('.'))
+        return any(entry[:len(segments)] == segments and len(entry) > len(segments) for entry in self.fields or [])
+
+
+def _split_param(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _join(prefix, name, separator):
+    return f'{prefix}{separator}{name}' if prefix else name
+
+
+class FieldsetMixin:
+    """
+    Serializer mixin that applies the request's Fieldset.
+
+    - get_fields() drops unrequested fields and collapses unexpanded nested
+      serializers to primary keys.
+    - prepare_queryset() joins / prefetches only what will be rendered and
+      defers heavy text columns that were not requested.
+
+    Subclasses describe their queryset needs declaratively:
+    - related_fields: {field name: relation to select_related when it is rendered}
+    - deferrable_fields: heavy columns to defer when they are not rendered
+    """
+    related_fields = {}
+    deferrable_fields = []
+
+    @property
+    def field_path(self):
+        """ Dotted path of this serializer from the root (list children have no name). """
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = Fieldset.from_request(self.context.get('request'))
+        if fieldset.is_default:
+            return fields
+
+        path = self.field_path
+        for name, field in list(fields.items()):
+            if field.write_only:
+                continue
+            field_path = _join(path, name, '.')
+            if not fieldset.includes(field_path):
+                del fields[name]
+            elif isinstance(field, serializers.BaseSerializer) and not fieldset.expands(field_path):
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    source=field.source,
+                    many=isinstance(field, serializers.ListSerializer),
+                    read_only=True,
+                )
+        return fields
+
+    @classmethod
+    def prepare_queryset(cls, queryset, fieldset, path='', lookup=''):
+        """
+        Returns `queryset` with the joins, prefetches and deferrals needed to
+        render it through this serializer. `path` is the dotted field path of
+        this serializer and `lookup` the ORM path of its model in `queryset`.
+        """
+        for name, relation in cls.related_fields.items():
+            if fieldset.includes(_join(path, name, '.')):
+                queryset = queryset.select_related(_join(lookup, relation, '__'))
+
+        for name in cls.deferrable_fields:
+            if not fieldset.includes(_join(path, name, '.')):
+                queryset = queryset.defer(_join(lookup, name, '__'))
+
+        model = cls.Meta.model
+        for name, field in cls._declared_fields.items():
+            field_path = _join(path, name, '.')
+            if not isinstance(field, serializers.BaseSerializer) or field.write_only or not fieldset.includes(field_path):
+                continue
+
+            source = field.source or name
+            expanded = fieldset.expands(field_path)
+            if isinstance(field, serializers.ListSerializer):
+                # Reverse relation (e.g. Order.items): one extra query for all parents
+                child = field.child
+                related_model = child.Meta.model
+                if expanded:
+                    related = child.prepare_queryset(related_model.objects.all(), fieldset, field_path)
+                else:
+                    remote_field = model._meta.get_field(source).field.name
+                    related = related_model.objects.only('pk', remote_field)
+                queryset = queryset.prefetch_related(Prefetch(_join(lookup, source, '__'), queryset=related))
+            elif expanded:
+                # Forward relation: joined into the same query
+                relation = _join(lookup, source, '__')
+                queryset = field.prepare_queryset(queryset.select_related(relation), fieldset, field_path, relation)
+        return queryset
+
 
 # --- API Serializers (Store) ---
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(FieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(FieldsetMixin, serializers.ModelSerializer):
     # We show the category name instead of just its ID
     category = serializers.StringRelatedField()
 
+    related_fields = {'category': 'category'}
+    deferrable_fields = ['description']
+
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'category', 'is_region_specific', 'image']
+        fields = ['id', 'name', 'description', 'category', 'is_region_specific', 'image', 'rating_count', 'rating_avg']
+        read_only_fields = ['rating_count', 'rating_avg']
+
+class ProductDetailSerializer(ProductSerializer):
+    """
+    A single product: adds the star histogram, e.g. {"1": 0, ..., "5": 12},
+    and the cheapest in-stock retailer offer (null when there is none).
+    """
+    rating_histogram = serializers.SerializerMethodField()
+    best_offer = serializers.SerializerMethodField()
 
-class InventorySerializer(serializers.ModelSerializer):
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['rating_histogram', 'best_offer']
+
+    def get_rating_histogram(self, obj):
+        return {str(star): getattr(obj, f'rating_{star}') for star in range(1, 6)}
+
+    def get_best_offer(self, obj):
+        try:
+            offer = obj.best_offer
+        except BestOffer.DoesNotExist:
+            return None
+        if offer.inventory_id is None:
+            return None
+        return {
+            'inventory': offer.inventory_id,
+            'retailer': offer.retailer_id,
+            'price': serializers.DecimalField(max_digits=10, decimal_places=2).to_representation(offer.price),
+        }
+
+class InventorySerializer(FieldsetMixin, serializers.ModelSerializer):
     # --- This is a Nested Serializer ---
     # It shows the full Product details, not just the product ID.
     product = ProductSerializer(read_only=True)
@@ -34,6 +228,8 @@ class InventorySerializer(serializers.ModelSerializer):
     retailer_name = serializers.CharField(source='retailer.shop_name', read_only=True)
     wholesaler_name = serializers.CharField(source='wholesaler.business_name', read_only=True)
 
+    related_fields = {'retailer_name': 'retailer', 'wholesaler_name': 'wholesaler'}
+
     class Meta:
         model = Inventory
         fields = [
@@ -54,13 +250,56 @@ class InventorySerializer(serializers.ModelSerializer):
         read_only_fields = ['retailer', 'wholesaler']
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class InventoryImportJobSerializer(serializers.ModelSerializer):
+    """
+    Upload (file + optional file_format) and progress report of a bulk import.
+    The format is taken from the file extension (.csv, .ndjson, .jsonl) unless given.
+    """
+    file_format = serializers.ChoiceField(choices=InventoryImportJob.Format.choices, required=False)
+
+    class Meta:
+        model = InventoryImportJob
+        fields = [
+            'id',
+            'file',
+            'file_format',
+            'status',
+            'total_rows',
+            'created_count',
+            'updated_count',
+            'error_count',
+            'errors',
+            'created_at',
+            'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'total_rows', 'created_count', 'updated_count',
+            'error_count', 'errors', 'created_at', 'finished_at',
+        ]
+        extra_kwargs = {'file': {'write_only': True}}
+
+    def validate(self, attrs):
+        if 'file_format' not in attrs:
+            name = attrs['file'].name.lower()
+            if name.endswith('.csv'):
+                attrs['file_format'] = InventoryImportJob.Format.CSV
+            elif name.endswith(('.ndjson', '.jsonl')):
+                attrs['file_format'] = InventoryImportJob.Format.NDJSON
+            else:
+                raise serializers.ValidationError({'file_format': 'Could not infer the format; send "csv" or "ndjson".'})
+        return attrs
+
+
+class FeedbackSerializer(FieldsetMixin, serializers.ModelSerializer):
     customer_name = serializers.CharField(source='customer.username', read_only=True)
 
+    related_fields = {'customer_name': 'customer'}
+    deferrable_fields = ['comment']
+
     class Meta:
         model = Feedback
-        fields = ['id', 'product', 'customer', 'customer_name', 'rating', 'comment', 'created_at']
-        read_only_fields = ['customer'] # Customer is set automatically
+        fields = ['id', 'product', 'customer', 'customer_name', 'rating', 'comment', 'created_at', 'helpful_count']
+        read_only_fields = ['customer', 'helpful_count'] # Customer is set automatically
 
 # --- ADDED: Serializer for "Shops Near Me" ---
 class RetailerListSerializer(serializers.ModelSerializer):
@@ -70,4 +309,10 @@ class RetailerListSerializer(serializers.ModelSerializer):
     class Meta:
         model = RetailerProfile
         # We return the user ID so the frontend can filter inventory by this retailer
-        fields = ['user_id', 'shop_name', 'shop_address', 'location_lat', 'location_lon', 'distance_km']
\ No newline at end of file
+        fields = ['user_id', 'shop_name', 'shop_address', 'location_lat', 'location_lon', 'region', 'distance_km']
+
+# --- ADDED: catalog regions ---
+class RegionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Region
+        fields = ['id', 'name', 'slug', 'center_lat', 'center_lon', 'radius_km']
@@ -0,0 +1,41 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import Signal, receiver
+
+from .models import Inventory
+
+# =========================================
+# === INVENTORY CHANGE NOTIFICATIONS
+# =========================================
+#
+# Sent once per write operation on Inventory rows, however many rows it
+# touched: a single-item create/update/delete, a checkout, a batch update,
+# or one batch of a bulk import. Receivers (caches, derived tables, feeds)
+# therefore do their work once per batch instead of once per row.
+#
+#     inventory_changed.send(sender=Inventory, ids=[1, 2, 3], deleted=False, product_ids=[7])
+#
+# - ids: primary keys of the Inventory rows that changed
+# - deleted: True when the rows are about to be deleted
+# - product_ids: products the rows belonged to before the write, when an
+#   update moved them to another product (their derived rows need refreshing
+#   too); receivers look up the current products themselves
+#
+# The signal is sent inside the writer's transaction, right after the write
+# (or right before it, for deletions, so the rows can still be read).
+# Deletions are announced from pre_delete, so cascades (a product or a
+# seller being removed) are covered too.
+# Receivers that talk to anything outside the database should defer that
+# work with transaction.on_commit().
+inventory_changed = Signal()
+
+
+def send_inventory_changed(ids, deleted=False, product_ids=()):
+    """ Sends inventory_changed for a batch of ids; does nothing for an empty batch. """
+    ids = list(ids)
+    if ids:
+        inventory_changed.send(sender=Inventory, ids=ids, deleted=deleted, product_ids=list(product_ids))
+
+
+@receiver(pre_delete, sender=Inventory, dispatch_uid='store.signals.announce_deletion')
+def announce_deletion(sender, instance, **kwargs):
+    send_inventory_changed([instance.pk], deleted=True)
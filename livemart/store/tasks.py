@@ -0,0 +1,54 @@
+import io
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image
+
+from tasks.queue import task
+from .imports import import_inventory
+from .models import Product, InventoryImportJob
+
+# =========================================
+# === STORE BACKGROUND TASKS
+# =========================================
+
+# Uploaded product images are scaled down to fit in this box
+PRODUCT_IMAGE_MAX_SIZE = (1200, 1200)
+
+
+@task(max_attempts=1)
+def run_inventory_import(job_id):
+    """
+    Processes a large import upload. Not retried: batches commit as they go,
+    so the job is marked FAILED and the seller re-uploads instead.
+    """
+    try:
+        import_inventory(InventoryImportJob.objects.select_related('seller').get(pk=job_id))
+    except Exception:
+        InventoryImportJob.objects.filter(pk=job_id).update(
+            status=InventoryImportJob.Status.FAILED, finished_at=timezone.now(),
+        )
+        raise
+
+
+@task
+def shrink_product_image(product_id):
+    """ Scales an oversized product image down in place, keeping its format. """
+    product = Product.objects.filter(pk=product_id).first()
+    if product is None or not product.image:
+        return
+    with product.image.open('rb') as fileobj:
+        image = Image.open(fileobj)
+        image.load()
+    if image.width <= PRODUCT_IMAGE_MAX_SIZE[0] and image.height <= PRODUCT_IMAGE_MAX_SIZE[1]:
+        return
+
+    image_format = image.format
+    image.thumbnail(PRODUCT_IMAGE_MAX_SIZE)
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+
+    # Same name, so product URLs (and list ETags) stay valid
+    storage, name = product.image.storage, product.image.name
+    storage.delete(name)
+    storage.save(name, ContentFile(buffer.getvalue()))
@@ -1,3 +1,833 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.client import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+
+from tasks.queue import run_pending
+from users.models import User, RetailerProfile, WholesalerProfile, Region
+from users.permissions import IsOwnerOfInventory, IsOwnerOfFeedbackOrReadOnly
+from .models import Category, Product, Inventory, InventoryChange, Feedback, BestOffer, RegionAvailability, StockMovement, StockSnapshot, InventoryImportJob
+from .ledger import compact_ledger, stock_as_of, HistoryCompacted
+from .ratings import rebuild_ratings
+from .reviews import review_cache
+from .offers import refresh_best_offers
+from .regions import rebuild_region_availability
+from .serializers import Fieldset, InventorySerializer
+from .signals import inventory_changed
+from .views import InventoryViewSet
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Dairy')
+        self.product = Product.objects.create(name='Amul Milk 1L', category=category)
+        user = User.objects.create_user(username='shop', password='pass', role=User.Role.RETAILER)
+        self.retailer = RetailerProfile.objects.create(user=user, shop_name='Corner Shop')
+        Inventory.objects.create(product=self.product, retailer=self.retailer, price=Decimal('30.00'), stock=5)
+
+    def test_unchanged_list_returns_304(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_shrinking_list_is_not_reported_unmodified(self):
+        response = self.client.get('/api/inventory/')
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)  # deletions would not move it
+
+        Inventory.objects.all().delete()
+        response = self.client.get(
+            '/api/inventory/', HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])
+
+    def test_product_edit_changes_inventory_etag(self):
+        etag = self.client.get('/api/inventory/')['ETag']
+
+        self.product.name = 'Amul Milk 500ml'
+        self.product.save()
+
+        response = self.client.get('/api/inventory/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Renaming the shop or the category changes what the rows show
+        for rename in (self.retailer, self.product.category):
+            with self.subTest(renamed=type(rename).__name__):
+                etag = self.client.get('/api/inventory/')['ETag']
+                setattr(rename, 'shop_name' if rename is self.retailer else 'name', 'Renamed')
+                rename.save()
+                response = self.client.get('/api/inventory/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertIn('Renamed', response.content.decode())
+
+
+class FieldsetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Dairy')
+        self.product = Product.objects.create(name='Amul Milk 1L', description='Full cream', category=category)
+        user = User.objects.create_user(username='shop', password='pass', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(user=user, shop_name='Corner Shop')
+        self.inventory = Inventory.objects.create(product=self.product, retailer=retailer, price=Decimal('30.00'), stock=5)
+
+    def test_default_payload_is_unchanged(self):
+        row = self.client.get('/api/inventory/').json()[0]
+        self.assertEqual(row['product']['description'], 'Full cream')
+        self.assertEqual(row['retailer_name'], 'Corner Shop')
+
+    def test_unexpanded_relation_renders_primary_key(self):
+        response = self.client.get('/api/inventory/?fields=id,price,stock,product&expand=')
+        self.assertEqual(response.json(), [
+            {'id': self.inventory.id, 'product': self.product.id, 'price': '30.00', 'stock': 5},
+        ])
+
+    def test_nested_fields_imply_expansion(self):
+        response = self.client.get('/api/inventory/?fields=id,product.name&expand=')
+        self.assertEqual(response.json(), [{'id': self.inventory.id, 'product': {'name': 'Amul Milk 1L'}}])
+
+    def test_unrequested_text_columns_are_deferred(self):
+        fieldset = Fieldset(fields=['id', 'product.name'])
+        queryset = InventorySerializer.prepare_queryset(Inventory.objects.all(), fieldset)
+        with self.assertNumQueries(1):
+            item = queryset.get()
+            self.assertEqual(item.product.name, 'Amul Milk 1L')
+        self.assertIn('description', item.product.get_deferred_fields())
+
+
+class ListTestCase(TestCase):
+    """ Shared fixture: a retail and a wholesale listing, for comparing list renderings. """
+
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name='Dairy')
+        product = Product.objects.create(
+            name='Amul Milk 1L', description='Full cream', category=category, image='product_images/milk.png',
+            rating_count=3, rating_sum=13, rating_avg=4.33,
+        )
+        loose = Product.objects.create(name='Loose Rice', is_region_specific=True)
+        user = User.objects.create_user(username='shop', password='pass', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(user=user, shop_name='Corner Shop')
+        user = User.objects.create_user(username='bulk', password='pass', role=User.Role.WHOLESALER)
+        wholesaler = WholesalerProfile.objects.create(user=user, business_name='Bulk Co')
+        Inventory.objects.create(product=product, retailer=retailer, price=Decimal('30.5'), stock=5)
+        Inventory.objects.create(
+            product=loose, wholesaler=wholesaler, price=Decimal('1200.00'), stock=2, availability_date=date(2026, 1, 2),
+        )
+
+
+class FastListTest(ListTestCase):
+    def assertSameBytes(self, url):
+        with override_settings(FAST_LIST_SERIALIZERS=False):
+            expected = self.client.get(url).content
+        with override_settings(FAST_LIST_SERIALIZERS=True):
+            actual = self.client.get(url).content
+        self.assertEqual(actual, expected)
+
+    def test_inventory_list_is_byte_identical(self):
+        self.assertSameBytes('/api/inventory/')
+
+    def test_product_list_is_byte_identical(self):
+        self.assertSameBytes('/api/products/')
+        self.assertSameBytes('/api/products/?search=rice')
+
+
+class StreamingListTest(ListTestCase):
+    def assertStreamMatches(self, url):
+        expected = self.client.get(url).content
+        response = self.client.get(url + ('&' if '?' in url else '?') + 'stream=1')
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), expected)
+
+    def test_streamed_inventory_matches_list(self):
+        self.assertStreamMatches('/api/inventory/')
+        with override_settings(FAST_LIST_SERIALIZERS=False):
+            self.assertStreamMatches('/api/inventory/')
+        self.assertStreamMatches('/api/inventory/?fields=id,price&search=rice')
+
+    def test_empty_stream_is_empty_array(self):
+        response = self.client.get('/api/products/?search=nothing&stream=1')
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class InventoryImportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='shop', role=User.Role.RETAILER)
+        self.retailer = RetailerProfile.objects.create(user=self.user, shop_name='Corner Shop')
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.rice = Product.objects.create(name='Basmati Rice 5kg')
+        Inventory.objects.create(product=self.milk, retailer=self.retailer, price=Decimal('28.00'), stock=1)
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        return self.client.post('/api/inventory-imports/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_csv_upsert_with_row_errors(self):
+        content = (
+            "product_id,price,stock,availability_date\n"
+            f"{self.milk.id},30.00,120,\n"
+            f"{self.rice.id},450.5,8,2026-02-01\n"
+            "99999,10.00,1,\n"
+            f"{self.rice.id},-1,8,\n"
+        ).encode()
+        response = self.upload('stock.csv', content)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        job = response.json()
+        self.assertEqual(job['status'], 'DONE')
+        self.assertEqual((job['total_rows'], job['created_count'], job['updated_count'], job['error_count']), (4, 1, 1, 2))
+        self.assertEqual([error['row'] for error in job['errors']], [3, 4])
+
+        milk = Inventory.objects.get(product=self.milk, retailer=self.retailer)
+        self.assertEqual((milk.price, milk.stock), (Decimal('30.00'), 120))
+        rice = Inventory.objects.get(product=self.rice, retailer=self.retailer)
+        self.assertEqual((rice.price, rice.availability_date), (Decimal('450.50'), date(2026, 2, 1)))
+
+    def test_ndjson_upload(self):
+        content = (
+            f'{{"product_id": {self.rice.id}, "price": "99.00", "stock": 3}}\n'
+            '\n'
+            'not json\n'
+        ).encode()
+        job = self.upload('stock.jsonl', content).json()
+        self.assertEqual((job['created_count'], job['error_count']), (1, 1))
+        self.assertEqual(Inventory.objects.filter(retailer=self.retailer).count(), 2)
+
+    def test_large_files_run_in_background(self):
+        with patch('store.views.SYNC_IMPORT_MAX_BYTES', 10), self.captureOnCommitCallbacks() as callbacks:
+            response = self.upload('stock.csv', f"product_id,price,stock\n{self.rice.id},1.00,1\n".encode())
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertEqual(len(callbacks), 1)
+
+        # The request only queued the job; the task worker runs it
+        callbacks[0]()
+        self.assertEqual(run_pending(), 1)
+        job = InventoryImportJob.objects.get(pk=response.json()['id'])
+        self.assertEqual((job.status, job.created_count), ('DONE', 1))
+
+    def test_unexpected_errors_fail_the_job(self):
+        with patch('store.imports.record_movements', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                self.upload('stock.csv', f"product_id,price,stock\n{self.rice.id},1.00,1\n".encode())
+        job = InventoryImportJob.objects.get()
+        self.assertEqual((job.status, job.error_count), ('FAILED', 1))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_duplicate_listing_is_rejected(self):
+        response = self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '1.00', 'stock': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BatchUpdateTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='shop', role=User.Role.RETAILER)
+        retailer = RetailerProfile.objects.create(user=self.user, shop_name='Corner Shop')
+        other = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='rival', role=User.Role.RETAILER), shop_name='Rival Shop',
+        )
+        products = [Product.objects.create(name=f'Product {i}') for i in range(3)]
+        self.mine = [
+            Inventory.objects.create(product=product, retailer=retailer, price=Decimal('10.00'), stock=1)
+            for product in products
+        ]
+        self.theirs = Inventory.objects.create(product=products[0], retailer=other, price=Decimal('10.00'), stock=1)
+        self.client.force_authenticate(self.user)
+
+        self.signals = []
+        handler = lambda sender, **kwargs: self.signals.append(kwargs)
+        inventory_changed.connect(handler)
+        self.addCleanup(inventory_changed.disconnect, handler)
+
+    def batch(self, items):
+        return self.client.post('/api/inventory/batch-update/', {'items': items}, format='json')
+
+    def test_updates_the_batch_in_one_write(self):
+        with CaptureQueriesContext(connection) as single:
+            self.batch([{'id': self.mine[2].id, 'price': '11.00', 'stock': 2}])
+        self.signals.clear()
+
+        items = [{'id': inventory.id, 'price': '12.50'} for inventory in self.mine]
+        items[0]['stock'] = 40
+        with CaptureQueriesContext(connection) as batch:
+            response = self.batch(items)
+
+        # The query count does not grow with the batch, and there is one UPDATE for all rows
+        self.assertEqual(len(batch), len(single))
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "store_inventory"') for query in batch), 1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'updated': 3})
+        rows = {row.id: row for row in Inventory.objects.filter(retailer__user=self.user)}
+        self.assertEqual((rows[self.mine[0].id].price, rows[self.mine[0].id].stock), (Decimal('12.50'), 40))
+        self.assertEqual(rows[self.mine[1].id].stock, 1)
+        self.assertGreater(rows[self.mine[1].id].updated_at, self.mine[1].updated_at)
+        self.assertEqual(len(self.signals), 1)
+        self.assertEqual(sorted(self.signals[0]['ids']), sorted(inventory.id for inventory in self.mine))
+
+    def test_foreign_listing_rejects_the_whole_batch(self):
+        response = self.batch([{'id': self.mine[0].id, 'stock': 9}, {'id': self.theirs.id, 'stock': 0}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Inventory.objects.get(pk=self.mine[0].id).stock, 1)
+        self.assertEqual(Inventory.objects.get(pk=self.theirs.id).stock, 1)
+        self.assertEqual(self.signals, [])
+
+    def test_invalid_items(self):
+        self.assertEqual(self.batch([{'id': self.mine[0].id}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([{'id': self.mine[0].id, 'stock': 1}] * 2).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ChangeFeedTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='shop', role=User.Role.RETAILER)
+        self.retailer = RetailerProfile.objects.create(user=self.user, shop_name='Corner Shop')
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.rice = Product.objects.create(name='Basmati Rice 5kg')
+        self.client.force_authenticate(self.user)
+
+    def feed(self, since=0, **params):
+        return self.client.get('/api/inventory/changes/', {'since': since, **params}).json()
+
+    def test_deltas_and_tombstones(self):
+        milk = self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '30.00', 'stock': 5}).json()
+        self.client.post('/api/inventory/', {'product_id': self.rice.id, 'price': '99.00', 'stock': 2})
+        first = self.feed()
+        self.assertEqual([change['op'] for change in first['changes']], ['upsert', 'upsert'])
+        self.assertEqual(first['changes'][0]['price'], '30.00')
+
+        self.client.post('/api/inventory/batch-update/', {'items': [{'id': milk['id'], 'stock': 0}]}, format='json')
+        self.client.delete(f"/api/inventory/{milk['id']}/")
+        second = self.feed(first['next_since'])
+        self.assertEqual(
+            [(change['op'], change['id'], change.get('stock')) for change in second['changes']],
+            [('upsert', milk['id'], 0), ('delete', milk['id'], None)],
+        )
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.feed(second['next_since'])['changes'], [])
+
+    def test_paging_and_scoping(self):
+        other = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='rival', role=User.Role.RETAILER), shop_name='Rival Shop',
+        )
+        Inventory.objects.create(product=self.milk, retailer=other, price=Decimal('1.00'), stock=1)
+        for product in (self.milk, self.rice):
+            self.client.post('/api/inventory/', {'product_id': product.id, 'price': '1.00', 'stock': 1})
+
+        page = self.feed(limit=1)
+        self.assertEqual((len(page['changes']), page['has_more']), (1, True))
+        self.assertEqual(len(self.feed(page['next_since'])['changes']), 1)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(len(self.feed(retailer=other.pk)['changes']), 0)  # created outside the API
+        self.assertEqual(len(self.feed(retailer=self.retailer.pk)['changes']), 2)
+        self.assertEqual(self.client.get('/api/inventory/changes/', {'since': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    def test_admin_is_read_only(self):
+        self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '1.00', 'stock': 1})
+        change = InventoryChange.objects.get()
+        self.client.force_login(User.objects.create_superuser(username='admin', password='x'))
+        self.assertEqual(self.client.get('/admin/store/inventorychange/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/admin/store/inventorychange/add/').status_code, status.HTTP_403_FORBIDDEN)
+        self.client.post(f'/admin/store/inventorychange/{change.pk}/change/', {'stock': 99})
+        self.client.post(f'/admin/store/inventorychange/{change.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(InventoryChange.objects.get().stock, 1)
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='shop', role=User.Role.RETAILER)
+        RetailerProfile.objects.create(user=self.user, shop_name='Corner Shop')
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.client.force_authenticate(self.user)
+
+    def test_edits_are_recorded(self):
+        listing = self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '30.00', 'stock': 10}).json()
+        self.client.patch(f"/api/inventory/{listing['id']}/", {'stock': 7})
+        self.client.patch(f"/api/inventory/{listing['id']}/", {'price': '31.00'})  # no stock change, no movement
+        self.client.post('/api/inventory/batch-update/', {'items': [{'id': listing['id'], 'stock': 12}]}, format='json')
+        self.client.delete(f"/api/inventory/{listing['id']}/")
+
+        self.assertEqual(
+            list(StockMovement.objects.values_list('delta', 'reason')),
+            [(10, 'LISTED'), (-3, 'ADJUSTMENT'), (5, 'ADJUSTMENT'), (-12, 'DELISTED')],
+        )
+
+    def test_edits_apply_to_the_current_stock(self):
+        listing = self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '30.00', 'stock': 10}).json()
+        get_object = InventoryViewSet.get_object
+
+        def sold_meanwhile(view):
+            # A checkout takes 2 between the view loading the row and saving it
+            instance = get_object(view)
+            Inventory.objects.filter(pk=instance.pk).update(stock=F('stock') - 2)
+            return instance
+
+        with patch.object(InventoryViewSet, 'get_object', sold_meanwhile):
+            self.client.patch(f"/api/inventory/{listing['id']}/", {'price': '31.00'})
+            self.assertEqual(Inventory.objects.get().stock, 8)  # the sale isn't undone
+            self.client.patch(f"/api/inventory/{listing['id']}/", {'stock': 20})
+        self.assertEqual(list(StockMovement.objects.values_list('delta', flat=True)), [10, 14])
+
+    def test_stock_as_of_survives_compaction(self):
+        t0 = timezone.make_aware(datetime(2026, 1, 1))
+        StockSnapshot.objects.create(inventory_id=1, stock=100, taken_at=t0)
+        for day, delta in [(1, -10), (2, -5), (3, 20), (4, -1)]:
+            StockMovement.objects.create(inventory_id=1, delta=delta, reason='SALE', created_at=t0 + timedelta(days=day))
+        StockMovement.objects.create(inventory_id=2, delta=8, reason='LISTED', created_at=t0 + timedelta(days=1))
+        StockMovement.objects.create(inventory_id=2, delta=-2, reason='SALE', created_at=t0 + timedelta(days=3))
+
+        times = [t0 + timedelta(days=day, hours=12) for day in range(5)]
+        expected = [stock_as_of([1, 2], when) for when in times]
+        self.assertEqual(expected[0], {1: 100})
+        self.assertEqual(expected[2], {1: 85, 2: 8})
+        self.assertEqual(expected[4], {1: 104, 2: 6})
+
+        with self.assertNumQueries(3):
+            stock_as_of([1, 2], times[4])
+
+        snapshots, removed = compact_ledger(t0 + timedelta(days=2, hours=12))
+        self.assertEqual((snapshots, removed), (2, 3))
+        self.assertEqual(StockMovement.objects.count(), 3)
+        for when, stocks in zip(times[2:], expected[2:]):
+            self.assertEqual(stock_as_of([1, 2], when), stocks)
+        # The movements before the cutoff are gone: refuse rather than answer from the old snapshot
+        with self.assertRaises(HistoryCompacted):
+            stock_as_of([1, 2], times[1])
+
+    def test_stock_at_endpoint(self):
+        listing = self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': '30.00', 'stock': 10}).json()
+        response = self.client.get('/api/inventory/stock-at/')
+        self.assertEqual(response.json()['items'], [{'id': listing['id'], 'stock': 10}])
+        self.assertEqual(self.client.get('/api/inventory/stock-at/', {'at': '2000-01-01'}).json()['items'], [])
+
+        compact_ledger(timezone.now())
+        response = self.client.get('/api/inventory/stock-at/', {'at': '2000-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('compacted', response.json()['at'][0])
+        self.assertEqual(self.client.get('/api/inventory/stock-at/').json()['items'], [{'id': listing['id'], 'stock': 10}])
+
+    def test_ledger_is_read_only_in_the_admin(self):
+        StockMovement.objects.create(inventory_id=1, delta=5, reason='SALE')
+        self.client.force_login(User.objects.create_superuser(username='admin', password='x'))
+        for model in ('stockmovement', 'stocksnapshot'):
+            with self.subTest(model=model):
+                self.assertEqual(self.client.get(f'/admin/store/{model}/').status_code, status.HTTP_200_OK)
+                self.assertEqual(self.client.get(f'/admin/store/{model}/add/').status_code, status.HTTP_403_FORBIDDEN)
+        movement = StockMovement.objects.get()
+        self.client.post(f'/admin/store/stockmovement/{movement.pk}/delete/', {'post': 'yes'})
+        self.assertTrue(StockMovement.objects.filter(pk=movement.pk).exists())
+
+
+class RatingAggregatesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.rice = Product.objects.create(name='Basmati Rice 5kg')
+        self.customers = [User.objects.create_user(username=f'customer{i}', role=User.Role.CUSTOMER) for i in range(3)]
+
+    def review(self, customer, product, rating):
+        self.client.force_authenticate(customer)
+        return self.client.post('/api/feedback/', {'product': product.id, 'rating': rating, 'comment': 'ok'})
+
+    def assertAggregates(self, product, count, avg, histogram):
+        product.refresh_from_db()
+        self.assertEqual((product.rating_count, product.rating_avg), (count, avg))
+        self.assertEqual([getattr(product, f'rating_{star}') for star in range(1, 6)], histogram)
+
+    def test_aggregates_follow_feedback_writes(self):
+        first = self.review(self.customers[0], self.milk, 5).json()
+        self.review(self.customers[1], self.milk, 4)
+        self.review(self.customers[2], self.milk, 4)
+        self.assertAggregates(self.milk, 3, 4.33, [0, 0, 0, 2, 1])
+
+        self.client.force_authenticate(self.customers[0])
+        self.client.patch(f"/api/feedback/{first['id']}/", {'rating': 1})
+        self.assertAggregates(self.milk, 3, 3.0, [1, 0, 0, 2, 0])
+
+        self.client.patch(f"/api/feedback/{first['id']}/", {'product': self.rice.id})
+        self.assertAggregates(self.milk, 2, 4.0, [0, 0, 0, 2, 0])
+        self.assertAggregates(self.rice, 1, 1.0, [1, 0, 0, 0, 0])
+
+        self.client.delete(f"/api/feedback/{first['id']}/")
+        self.assertAggregates(self.rice, 0, None, [0, 0, 0, 0, 0])
+
+    def test_rating_must_be_one_to_five(self):
+        self.assertEqual(self.review(self.customers[0], self.milk, 6).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.review(self.customers[0], self.milk, 0).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sort_and_filter_by_rating(self):
+        self.review(self.customers[0], self.milk, 3)
+        self.review(self.customers[0], self.rice, 5)
+        self.client.force_authenticate(None)
+        names = [row['name'] for row in self.client.get('/api/products/?ordering=-rating_avg').json()]
+        self.assertEqual(names, ['Basmati Rice 5kg', 'Amul Milk 1L'])
+        self.assertEqual(len(self.client.get('/api/products/?rating_avg__gte=4').json()), 1)
+        detail = self.client.get(f'/api/products/{self.rice.id}/').json()
+        self.assertEqual(detail['rating_histogram'], {'1': 0, '2': 0, '3': 0, '4': 0, '5': 1})
+
+    def test_model_writes_outside_the_api_are_counted(self):
+        # As FeedbackAdmin and cascades do
+        feedback = Feedback.objects.create(product=self.milk, customer=self.customers[0], rating=2)
+        Feedback.objects.create(product=self.milk, customer=self.customers[1], rating=4)
+        self.assertAggregates(self.milk, 2, 3.0, [0, 1, 0, 1, 0])
+
+        feedback = Feedback.objects.only('id').get(pk=feedback.pk)
+        feedback.rating = 5
+        feedback.save()
+        self.assertAggregates(self.milk, 2, 4.5, [0, 0, 0, 1, 1])
+
+        self.customers[1].delete()
+        self.assertAggregates(self.milk, 1, 5.0, [0, 0, 0, 0, 1])
+        self.assertEqual(rebuild_ratings(), 0)
+
+    def test_rebuild_corrects_drift(self):
+        Feedback.objects.create(product=self.milk, customer=self.customers[0], rating=4)
+        Feedback.objects.update(rating=2)  # bypasses the signals
+        Product.objects.filter(pk=self.rice.pk).update(rating_count=7)
+        self.assertEqual(rebuild_ratings(), 2)
+        self.assertAggregates(self.milk, 1, 2.0, [0, 1, 0, 0, 0])
+        self.assertAggregates(self.rice, 0, None, [0, 0, 0, 0, 0])
+        self.assertEqual(rebuild_ratings(), 0)
+
+
+class FeedbackPagesTest(TestCase):
+    def setUp(self):
+        review_cache().clear()
+        self.client = APIClient()
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.customer = User.objects.create_user(username='customer', role=User.Role.CUSTOMER)
+        self.reviews = [
+            Feedback.objects.create(product=self.milk, customer=self.customer, rating=4, helpful_count=i % 3)
+            for i in range(25)
+        ]
+
+    def test_keyset_pages_cover_every_review_once(self):
+        for sort in ('recent', 'helpful'):
+            seen = []
+            url = f'/api/feedback/?product={self.milk.id}&sort={sort}'
+            while url:
+                page = self.client.get(url).json()
+                seen += [row['id'] for row in page['results']]
+                url = page['next']
+            self.assertEqual(sorted(seen), sorted(review.id for review in self.reviews))
+            if sort == 'recent':
+                self.assertEqual(seen, [review.id for review in reversed(self.reviews)])
+            else:
+                helpful = [Feedback.objects.get(pk=pk).helpful_count for pk in seen]
+                self.assertEqual(helpful, sorted(helpful, reverse=True))
+
+    def test_first_page_is_cached_until_feedback_changes(self):
+        url = f'/api/feedback/?product={self.milk.id}'
+        with self.assertNumQueries(1):  # one joined query, no per-row customer lookups
+            first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 20)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        self.client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/feedback/', {'product': self.milk.id, 'rating': 5}).json()
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(url).json()['results'][0]['id'], created['id'])
+
+    def test_helpful_votes(self):
+        review = self.reviews[0]
+        self.client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f'/api/feedback/{review.id}/helpful/').json(), {'helpful_count': 1})
+        self.assertEqual(self.client.post(f'/api/feedback/{review.id}/helpful/').json(), {'helpful_count': 1})
+        top = self.client.get(f'/api/feedback/?product={self.milk.id}&sort=helpful').json()['results'][0]
+        self.assertEqual(top['helpful_count'], 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(f'/api/feedback/?product={self.milk.id}&cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BestOfferTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.milk = Product.objects.create(name='Amul Milk 1L')
+        self.rice = Product.objects.create(name='Basmati Rice 5kg')
+        self.shops = []
+        for name in ('corner', 'market'):
+            user = User.objects.create_user(username=name, role=User.Role.RETAILER)
+            self.shops.append(RetailerProfile.objects.create(user=user, shop_name=name.title()))
+        wholesaler = WholesalerProfile.objects.create(
+            user=User.objects.create_user(username='bulk', role=User.Role.WHOLESALER), business_name='Bulk Co',
+        )
+        # Wholesale prices are not customer offers
+        Inventory.objects.create(product=self.milk, wholesaler=wholesaler, price=Decimal('5.00'), stock=500)
+
+    def list_milk(self, shop, price, stock):
+        self.client.force_authenticate(shop.user)
+        return self.client.post('/api/inventory/', {'product_id': self.milk.id, 'price': price, 'stock': stock}).json()
+
+    def best(self, product):
+        offer = BestOffer.objects.filter(product=product).first()
+        return offer and (offer.inventory_id, offer.price)
+
+    def test_offer_follows_inventory_writes(self):
+        corner = self.list_milk(self.shops[0], '30.00', 5)
+        market = self.list_milk(self.shops[1], '28.00', 1)
+        self.assertEqual(self.best(self.milk), (market['id'], Decimal('28.00')))
+
+        self.client.force_authenticate(self.shops[1].user)
+        self.client.post('/api/inventory/batch-update/', {'items': [{'id': market['id'], 'stock': 0}]}, format='json')
+        self.assertEqual(self.best(self.milk), (corner['id'], Decimal('30.00')))
+
+        self.client.force_authenticate(self.shops[0].user)
+        stamp = BestOffer.objects.get(product=self.milk).updated_at
+        self.client.patch(f"/api/inventory/{corner['id']}/", {'stock': 4})  # same offer: row left alone
+        self.assertEqual(BestOffer.objects.get(product=self.milk).updated_at, stamp)
+
+        self.client.delete(f"/api/inventory/{corner['id']}/")
+        self.assertEqual(self.best(self.milk), (None, None))
+
+    def test_moving_a_listing_refreshes_both_products(self):
+        corner = self.list_milk(self.shops[0], '30.00', 5)
+        self.assertEqual(self.best(self.milk), (corner['id'], Decimal('30.00')))
+
+        self.client.patch(f"/api/inventory/{corner['id']}/", {'product_id': self.rice.id})
+        self.assertEqual(self.best(self.milk), (None, None))
+        self.assertEqual(self.best(self.rice), (corner['id'], Decimal('30.00')))
+
+    def test_sort_by_best_price(self):
+        self.list_milk(self.shops[0], '30.00', 5)
+        self.client.force_authenticate(self.shops[1].user)
+        rice = self.client.post('/api/inventory/', {'product_id': self.rice.id, 'price': '20.00', 'stock': 5}).json()
+        Product.objects.create(name='Unlisted')
+
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/products/?sort=best_price')
+        self.assertEqual([row['name'] for row in response.json()], ['Basmati Rice 5kg', 'Amul Milk 1L', 'Unlisted'])
+        detail = self.client.get(f'/api/products/{self.rice.id}/').json()
+        self.assertEqual(detail['best_offer'], {'inventory': rice['id'], 'retailer': self.shops[1].pk, 'price': '20.00'})
+
+        # A price change reorders the list, so the validators must change too
+        etag = response['ETag']
+        self.client.force_authenticate(self.shops[1].user)
+        self.client.patch(f"/api/inventory/{rice['id']}/", {'price': '99.00'})
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/products/?sort=best_price', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]['name'], 'Amul Milk 1L')
+
+
+class FacetsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        dairy = Category.objects.create(name='Dairy')
+        grains = Category.objects.create(name='Grains')
+        retailer = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='shop', role=User.Role.RETAILER), shop_name='Corner Shop',
+        )
+        for name, category, price, rating in [
+            ('Milk', dairy, '30.00', 4.5),
+            ('Paneer', dairy, '120.00', 3.0),
+            ('Ghee', dairy, None, None),
+            ('Rice', grains, '450.00', 5.0),
+        ]:
+            product = Product.objects.create(name=name, category=category, rating_avg=rating)
+            if price:
+                Inventory.objects.create(product=product, retailer=retailer, price=Decimal(price), stock=1)
+        refresh_best_offers(Product.objects.values_list('id', flat=True))
+
+    def test_page_and_facets_in_two_queries(self):
+        with self.assertNumQueries(2):
+            body = self.client.get('/api/products/facets/?limit=2').json()
+        self.assertEqual(body['count'], 4)
+        self.assertEqual([row['name'] for row in body['results']], ['Milk', 'Paneer'])
+        self.assertEqual(
+            [(facet['label'], facet['count']) for facet in body['facets']['category']], [('Dairy', 3), ('Grains', 1)],
+        )
+        self.assertEqual(body['facets']['price'], [
+            {'value': '0-50', 'count': 1}, {'value': '100-500', 'count': 2}, {'value': 'unavailable', 'count': 1},
+        ])
+        self.assertEqual(body['facets']['rating'], [
+            {'value': 5, 'count': 1}, {'value': 4, 'count': 1}, {'value': 3, 'count': 1}, {'value': 0, 'count': 1},
+        ])
+
+    def test_facets_follow_the_list_filters(self):
+        body = self.client.get('/api/products/facets/?best_offer__price__gte=100&best_offer__price__lt=500').json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual([facet['label'] for facet in body['facets']['category']], ['Dairy', 'Grains'])
+
+
+class RegionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.delhi = Region.objects.create(name='Delhi', slug='delhi', center_lat='28.6139', center_lon='77.2090', radius_km=30)
+        self.mumbai = Region.objects.create(name='Mumbai', slug='mumbai', center_lat='19.0760', center_lon='72.8777', radius_km=30)
+        self.shop = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='delhi_shop', role=User.Role.RETAILER),
+            shop_name='Delhi Shop', location_lat=Decimal('28.65'), location_lon=Decimal('77.23'),
+        )
+        self.national = Product.objects.create(name='Salt')
+        self.local = Product.objects.create(name='Kulfi', is_region_specific=True)
+
+    def names(self, url):
+        return sorted(row['name'] for row in self.client.get(url).json())
+
+    def test_retailer_region_follows_coordinates(self):
+        self.assertEqual(self.shop.region, self.delhi)
+        self.shop.location_lat, self.shop.location_lon = Decimal('19.10'), Decimal('72.90')
+        self.shop.save(update_fields=['location_lat', 'location_lon'])
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.region, self.mumbai)
+
+        self.shop.location_lat = self.shop.location_lon = None
+        self.shop.save(update_fields=['location_lat', 'location_lon'])
+        self.shop.refresh_from_db()
+        self.assertIsNone(self.shop.region)
+
+        response = self.client.get('/api/regions/locate/?lat=0&lon=0')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/regions/locate/?lat=28.6&lon=77.2').json()['slug'], 'delhi')
+
+    def test_region_catalog(self):
+        self.client.force_authenticate(self.shop.user)
+        listing = self.client.post('/api/inventory/', {'product_id': self.local.id, 'price': '40.00', 'stock': 3}).json()
+        self.assertEqual(RegionAvailability.objects.get(product=self.local).region, self.delhi)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.names('/api/products/?region=delhi'), ['Kulfi', 'Salt'])
+        self.assertEqual(self.names(f'/api/products/?region={self.mumbai.pk}'), ['Salt'])
+        self.assertEqual(len(self.client.get('/api/inventory/?region=delhi').json()), 1)
+        self.assertEqual(self.client.get('/api/inventory/?region=mumbai').json(), [])
+        response = self.client.get('/api/products/?region=nowhere')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Selling out removes the product from the region without touching the product row
+        etag = self.client.get('/api/products/?region=delhi')['ETag']
+        self.client.force_authenticate(self.shop.user)
+        self.client.patch(f"/api/inventory/{listing['id']}/", {'stock': 0})
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/products/?region=delhi', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['name'] for row in response.json()], ['Salt'])
+        self.assertFalse(RegionAvailability.objects.exists())
+
+    def test_moving_a_listing_leaves_the_old_product(self):
+        self.client.force_authenticate(self.shop.user)
+        listing = self.client.post('/api/inventory/', {'product_id': self.local.id, 'price': '40.00', 'stock': 3}).json()
+        self.client.patch(f"/api/inventory/{listing['id']}/", {'product_id': self.national.id})
+        self.assertEqual(list(RegionAvailability.objects.values_list('product', flat=True)), [self.national.pk])
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.names('/api/products/?region=delhi'), ['Salt'])
+
+    def test_moving_the_shop_moves_its_availability(self):
+        Inventory.objects.create(product=self.local, retailer=self.shop, price=Decimal('40.00'), stock=3)
+        inventory_changed.send(sender=Inventory, ids=list(Inventory.objects.values_list('id', flat=True)))
+        self.shop.location_lat, self.shop.location_lon = Decimal('19.10'), Decimal('72.90')
+        self.shop.save()
+        self.assertEqual(list(RegionAvailability.objects.values_list('region__slug', flat=True)), ['mumbai'])
+
+        Region.objects.filter(pk=self.mumbai.pk).update(radius_km=1)
+        RegionAvailability.objects.all().delete()
+        rebuild_region_availability()
+        self.shop.refresh_from_db()
+        self.assertIsNone(self.shop.region)
+        self.assertFalse(RegionAvailability.objects.exists())
+
+
+class AsyncReadViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        region = Region.objects.create(name='Delhi', slug='delhi', center_lat='28.6139', center_lon='77.2090', radius_km=30)
+        shop = RetailerProfile.objects.create(
+            user=User.objects.create_user(username='async_shop', role=User.Role.RETAILER),
+            shop_name='Async Shop', location_lat=Decimal('28.65'), location_lon=Decimal('77.23'),
+        )
+        category = Category.objects.create(name='Dairy')
+        self.product = Product.objects.create(name='Milk', category=category)
+        Product.objects.create(name='Kulfi', category=category, is_region_specific=True)
+        Inventory.objects.create(product=self.product, retailer=shop, price=Decimal('30.00'), stock=5)
+        refresh_best_offers([self.product.pk])
+        self.assertEqual(shop.region, region)
+
+    async def get_both(self, path):
+        sync_response = await sync_to_async(self.client.get)(f'/api/{path}')
+        async_response = await AsyncClient().get(f'/api/async/{path}')
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.content, sync_response.content)
+        return sync_response, async_response
+
+    async def test_same_payloads_as_the_sync_views(self):
+        for path in [
+            'products/', 'products/?region=delhi', 'products/?fields=id,name&ordering=name',
+            f'products/{self.product.pk}/', 'products/999/', 'categories/', 'shops/?lat=28.6&lon=77.2',
+        ]:
+            with self.subTest(path=path):
+                await self.get_both(path)
+
+        _, listed = await self.get_both('products/?region=delhi')
+        response = await AsyncClient().get('/api/async/products/?region=delhi', headers={'If-None-Match': listed['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = await AsyncClient().get('/api/async/products/?region=nowhere')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_read_only(self):
+        response = await AsyncClient().post('/api/async/products/', {'name': 'Butter'})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class OwnershipTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.milk = Product.objects.create(name='Milk')
+        self.author, self.other = (User.objects.create_user(username=name, role=User.Role.CUSTOMER) for name in ('author', 'other'))
+        self.feedback = Feedback.objects.create(product=self.milk, customer=self.author, rating=4)
+        self.shops = [
+            RetailerProfile.objects.create(user=User.objects.create_user(username=f'shop{i}', role=User.Role.RETAILER), shop_name=f'Shop {i}')
+            for i in range(2)
+        ]
+        self.listing = Inventory.objects.create(product=self.milk, retailer=self.shops[0], price=Decimal('30.00'), stock=5)
+
+    def test_object_checks_compare_ids_only(self):
+        request = Request(APIRequestFactory().patch('/'))
+        request.user = self.shops[0].user
+        listing = Inventory.objects.get(pk=self.listing.pk)
+        feedback = Feedback.objects.get(pk=self.feedback.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsOwnerOfInventory().has_object_permission(request, None, listing))
+            self.assertFalse(IsOwnerOfFeedbackOrReadOnly().has_object_permission(request, None, feedback))
+
+    def test_other_owners_rows_are_not_found(self):
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.delete(f'/api/feedback/{self.feedback.pk}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/feedback/{self.feedback.pk}/').status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.patch(f'/api/feedback/{self.feedback.pk}/', {'rating': 5}).status_code, status.HTTP_200_OK)
+
+        self.client.force_authenticate(self.shops[1].user)
+        response = self.client.patch(f'/api/inventory/{self.listing.pk}/', {'stock': 0})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(self.shops[0].user)
+        self.assertEqual(self.client.patch(f'/api/inventory/{self.listing.pk}/', {'stock': 0}).status_code, status.HTTP_200_OK)
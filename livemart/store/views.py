@@ -1,50 +1,190 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, mixins, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product, Inventory, Feedback
-from users.models import RetailerProfile
+from .models import Category, Product, Inventory, InventoryChange, StockMovement, Feedback, FeedbackVote, InventoryImportJob
+from users.models import RetailerProfile, Region
 from .serializers import (
     CategorySerializer, 
     ProductSerializer, 
+    ProductDetailSerializer,
     InventorySerializer, 
     FeedbackSerializer,
-    RetailerListSerializer 
+    RetailerListSerializer,
+    RegionSerializer,
+    InventoryImportJobSerializer,
+    Fieldset,
 )
+from .imports import import_inventory, seller_field_for, SYNC_IMPORT_MAX_BYTES
+from .tasks import run_inventory_import
+from .batch import InventoryBatchUpdateSerializer, apply_batch_update
+from .signals import send_inventory_changed
+from .ledger import record_movements, stock_as_of, HistoryCompacted
+from .facets import facet_counts, FACETS_DEFAULT_LIMIT, FACETS_MAX_LIMIT
+from .reviews import REVIEW_ORDERINGS, DEFAULT_REVIEW_SORT, review_cache, review_cache_key, invalidate_reviews
+from .changefeed import read_feed, FEED_DEFAULT_LIMIT, FEED_MAX_LIMIT
+from .regions import region_from_request, products_in_region
 
 # --- Import geopy for distance calculation ---
 from geopy.distance import geodesic
 # ---------------------------------------------
 
 from users.permissions import IsCustomer, IsSeller, IsOwnerOfInventory, IsOwnerOfFeedbackOrReadOnly
+from livemart.asyncviews import AsyncReadMixin
+from livemart.conditional import ConditionalListMixin
+from livemart.pagination import KeysetPagination
+from livemart.streaming import StreamingListMixin, ExportMixin, parse_datetime_param
+from orders.slots import available_slots
+from .fastpath import (
+    FastListMixin,
+    PRODUCT_COLUMNS,
+    INVENTORY_COLUMNS,
+    compile_product_converter,
+    compile_inventory_converter,
+)
 
 # --- API Views (Store) ---
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint to view product categories.
+    Async twin under ASGI: /api/async/categories/
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(FastListMixin, StreamingListMixin, ConditionalListMixin, AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint to view products.
+    Supports conditional GET (ETag / If-None-Match).
+    Supports streaming the full list: ?stream=1
+    Supports rating filters and sorting: ?rating_avg__gte=4&ordering=-rating_avg
+    Supports sorting by the cheapest in-stock offer: ?sort=best_price
+    Facet counts for filter sidebars: /api/products/facets/ (same filters as the list)
+    Region catalog: ?region=<slug or id> (national products + region-specific ones stocked there)
+    Async twins under ASGI: /api/async/products/ and /api/async/products/<id>/ (see livemart.asyncviews)
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    # Rows show their category's name
+    conditional_timestamp_fields = ['updated_at', 'category__updated_at']
+    fast_list_columns = PRODUCT_COLUMNS
+    fast_list_converter = staticmethod(compile_product_converter)
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['category', 'is_region_specific']
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'category': ['exact'],
+        'is_region_specific': ['exact'],
+        # --- ADDED: ?rating_avg__gte=4&rating_count__gte=10 ---
+        'rating_avg': ['gte'],
+        'rating_count': ['gte'],
+        # --- ADDED: price facet buckets, e.g. ?best_offer__price__gte=50&best_offer__price__lt=100 ---
+        'best_offer__price': ['gte', 'lt'],
+    }
+    # --- ADDED: ?ordering=-rating_avg (or rating_count, name) ---
+    ordering_fields = ['rating_avg', 'rating_count', 'name']
     search_fields = ['name', 'description']
 
-class InventoryViewSet(viewsets.ModelViewSet): 
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ProductDetailSerializer
+        return ProductSerializer
+
+    def sorts_by_best_price(self):
+        return self.request.query_params.get('sort') == 'best_price'
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        One page of the filtered products (?limit=, ?offset=) plus per-category,
+        best-price and rating counts over the whole result set.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            limit = min(int(request.query_params.get('limit', FACETS_DEFAULT_LIMIT)), FACETS_MAX_LIMIT)
+            offset = int(request.query_params.get('offset', 0))
+            if limit < 1 or offset < 0:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'detail': '"limit" must be a positive integer and "offset" a non-negative one.'})
+
+        total, facets = facet_counts(queryset)
+        if not queryset.ordered:
+            queryset = queryset.order_by('id')  # stable pages
+        page = queryset[offset:offset + limit]
+        if self.use_fast_list():
+            results = self.get_fast_rows(page)
+        else:
+            results = self.get_serializer(page, many=True).data
+        return Response({'count': total, 'results': results, 'facets': facets})
+
+    def get_conditional_timestamp_fields(self):
+        if self.sorts_by_best_price():
+            # Price changes reorder the list without touching the products
+            return ['updated_at', 'category__updated_at', 'best_offer__updated_at']
+        return super().get_conditional_timestamp_fields()
+
+    def get_extra_conditional_stamps(self):
+        # Region-specific products leave the region's list without being modified
+        region = region_from_request(self.request)
+        return [region.catalog_changed_at] if region else []
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        region = region_from_request(self.request)
+        if region is not None:
+            # --- ADDED: one EXISTS on RegionAvailability's (region, product) index (see store.regions) ---
+            queryset = products_in_region(queryset, region)
+        if self.sorts_by_best_price():
+            # --- ADDED: cheapest in-stock offer first (see store.offers); unavailable products last ---
+            queryset = queryset.order_by(F('best_offer__price').asc(nulls_last=True), 'id')
+        if self.action == 'retrieve':
+            # ProductDetailSerializer renders the best offer; join it instead of a second query
+            queryset = queryset.select_related('best_offer')
+        # Only join/load what ?fields= and ?expand= will render
+        return ProductSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
+
+class InventoryViewSet(FastListMixin, StreamingListMixin, ExportMixin, ConditionalListMixin, viewsets.ModelViewSet): 
     """
     API endpoint to view and manage inventory.
     - Supports standard filtering (price, product name).
     - Supports LOCATION filtering: ?lat=28.7&lon=77.1&radius=5
+    - Supports conditional GET (ETag) on the list.
+    - Supports streaming the full list: ?stream=1
+    - Sellers can export their stock: /api/inventory/export/?format=csv|ndjson
+    - Sellers can update many listings at once: POST /api/inventory/batch-update/
+    - Incremental sync: /api/inventory/changes/?since=<seq>
+    - Sellers can reconcile past stock levels: /api/inventory/stock-at/?at=2026-01-31T23:59
+    - Supports REGION filtering: ?region=<slug or id> (listings of retailers in that region)
     """
     serializer_class = InventorySerializer
+    # Each row embeds its Product (and its category's name) and its seller's name,
+    # so edits to any of them must change the validators too
+    conditional_timestamp_fields = [
+        'updated_at', 'product__updated_at', 'product__category__updated_at',
+        'retailer__updated_at', 'wholesaler__updated_at',
+    ]
+    fast_list_columns = INVENTORY_COLUMNS
+    fast_list_converter = staticmethod(compile_inventory_converter)
+
+    export_filename = 'inventory'
+    export_columns = [
+        ('inventory_id', 'id'),
+        ('product_id', 'product_id'),
+        ('product_name', 'product__name'),
+        ('category', 'product__category__name'),
+        ('price', 'price'),
+        ('stock', 'stock'),
+        ('available_via_wholesaler', 'available_via_wholesaler'),
+        ('availability_date', 'availability_date'),
+        ('updated_at', 'updated_at'),
+    ]
     
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = {
@@ -64,14 +204,20 @@ class InventoryViewSet(viewsets.ModelViewSet):
         
         # 1. Role-based Base Filtering
         if user.is_authenticated and user.role in ['RETAILER', 'WHOLESALER']:
+            # --- UPDATED: filter on the FK id (profiles share the user's pk), no profile lookup ---
             if user.role == 'RETAILER':
-                queryset = Inventory.objects.filter(retailer=user.retailerprofile)
+                queryset = Inventory.objects.filter(retailer_id=user.pk)
             else: # Wholesaler
-                queryset = Inventory.objects.filter(wholesaler=user.wholesalerprofile)
+                queryset = Inventory.objects.filter(wholesaler_id=user.pk)
         else:
             # For customers/anonymous: Only show in-stock items
             queryset = Inventory.objects.filter(stock__gt=0)
 
+        # --- ADDED: Region filtering (retailer.region is set from the shop's coordinates) ---
+        region = region_from_request(self.request)
+        if region is not None:
+            queryset = queryset.filter(retailer__region=region)
+
         # 2. Location-based Filtering (The New Feature)
         user_lat = self.request.query_params.get('lat')
         user_lon = self.request.query_params.get('lon')
@@ -102,12 +248,13 @@ class InventoryViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass # If params are invalid, ignore location filter
 
-        return queryset
+        # 3. Only join/load what ?fields= and ?expand= will render
+        return InventorySerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
 
     def get_permissions(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'changes']:
             permission_classes = [permissions.AllowAny]
-        elif self.action == 'create':
+        elif self.action in ['create', 'export', 'batch_update', 'stock_at']:
             permission_classes = [permissions.IsAuthenticated, IsSeller]
         else: 
             permission_classes = [permissions.IsAuthenticated, IsSeller, IsOwnerOfInventory]
@@ -115,43 +262,233 @@ class InventoryViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         user = self.request.user
+
+        # --- ADDED: one listing per product per seller (see Inventory.Meta.constraints) ---
+        seller_field = seller_field_for(user)
+        if Inventory.objects.filter(product=serializer.validated_data['product'], **{f'{seller_field}_id': user.pk}).exists():
+            raise ValidationError({'product_id': 'You already sell this product. Update the existing inventory item instead.'})
+
         if user.role == 'RETAILER':
-            serializer.save(retailer=user.retailerprofile)
+            instance = serializer.save(retailer=user.retailerprofile)
         elif user.role == 'WHOLESALER':
-            serializer.save(wholesaler=user.wholesalerprofile)
+            instance = serializer.save(wholesaler=user.wholesalerprofile)
+        record_movements(StockMovement.Reason.LISTED, [(instance.pk, instance.stock)])
+        send_inventory_changed([instance.pk])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            # Lock the row and re-read what a checkout or import may have changed since get_object()
+            previous_stock, previous_product_id = (
+                Inventory.objects.select_for_update()
+                .values_list('stock', 'product_id')
+                .get(pk=serializer.instance.pk)
+            )
+            serializer.instance.stock = previous_stock  # an edit without `stock` keeps the current count
+            instance = serializer.save()
+            record_movements(StockMovement.Reason.ADJUSTMENT, [(instance.pk, instance.stock - previous_stock)])
+            moved_from = [previous_product_id] if instance.product_id != previous_product_id else []
+            send_inventory_changed([instance.pk], product_ids=moved_from)
+
+    @action(detail=False, methods=['post'], url_path='batch-update')
+    def batch_update(self, request):
+        """
+        Updates price / stock / availability of many listings in one request.
+        Body: {"items": [{"id": 12, "price": "30.00", "stock": 120}, ...]}
+        All-or-nothing: if any id is not one of the seller's listings, nothing changes.
+        ACCESS: Retailers and Wholesalers (their own inventory only).
+        """
+        serializer = InventoryBatchUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = apply_batch_update(request.user, serializer.validated_data['items'])
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Change feed for mirroring inventory: ?since=<seq>&limit=<n>
+        Returns {"changes": [...], "next_since": <seq>, "has_more": bool}; each
+        change is an "upsert" with the listing's new state or a "delete" tombstone.
+        ACCESS: Sellers get their own feed. Everyone else gets all listings,
+        optionally narrowed with ?retailer=<id> or ?wholesaler=<id>.
+        """
+        params = request.query_params
+        try:
+            since = int(params.get('since', 0))
+            limit = min(int(params.get('limit', FEED_DEFAULT_LIMIT)), FEED_MAX_LIMIT)
+            if since < 0 or limit < 1:
+                raise ValueError
+        except ValueError:
+            raise ValidationError({'detail': '"since" must be a non-negative integer and "limit" a positive one.'})
+
+        queryset = InventoryChange.objects.all()
+        user = request.user
+        if user.is_authenticated and user.role in ['RETAILER', 'WHOLESALER']:
+            queryset = queryset.filter(**{f'{seller_field_for(user)}_id': user.pk})
+        else:
+            for seller_field in ('retailer', 'wholesaler'):
+                if params.get(seller_field, '').isdigit():
+                    queryset = queryset.filter(**{f'{seller_field}_id': int(params[seller_field])})
+
+        return Response(read_feed(queryset, since, limit))
+
+    @action(detail=False, methods=['get'], url_path='stock-at')
+    def stock_at(self, request):
+        """
+        Stock of each of the seller's listings at a past time, from the stock ledger.
+        ?at= takes a date (midnight) or an ISO 8601 datetime; defaults to now.
+        Times before the ledger was last compacted are refused (400).
+        ACCESS: Retailers and Wholesalers (their own inventory only).
+        """
+        at = request.query_params.get('at')
+        when = parse_datetime_param('at', at) if at else timezone.now()
+        inventory_ids = Inventory.objects.filter(
+            **{f'{seller_field_for(request.user)}_id': request.user.pk}
+        ).values_list('id', flat=True)
+        try:
+            stocks = stock_as_of(inventory_ids, when)
+        except HistoryCompacted as exc:
+            raise ValidationError({'at': [str(exc)]})
+        return Response({
+            'at': when,
+            'items': [{'id': inventory_id, 'stock': stocks[inventory_id]} for inventory_id in sorted(stocks)],
+        })
+
+
+class InventoryImportViewSet(mixins.CreateModelMixin,
+                             mixins.ListModelMixin,
+                             mixins.RetrieveModelMixin,
+                             viewsets.GenericViewSet):
+    """
+    Bulk inventory import / upsert for sellers.
+    POST a multipart `file` (CSV or JSON lines, see store.imports for the columns).
+    - Small files are imported right away: 201 with the finished report.
+    - Large files are imported in the background: 202, then poll GET /api/inventory-imports/{id}/
+    ACCESS: Retailers and Wholesalers (their own imports only).
+    """
+    serializer_class = InventoryImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsSeller]
+    parser_classes = [MultiPartParser]
+
+    def get_queryset(self):
+        return InventoryImportJob.objects.filter(seller=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        job = serializer.save(seller=request.user)
+
+        if upload.size > SYNC_IMPORT_MAX_BYTES:
+            # Processed by the task worker (manage.py run_tasks) once the job row commits
+            run_inventory_import.delay(job_id=job.pk)
+            return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        import_inventory(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_201_CREATED)
 
 
 class FeedbackViewSet(viewsets.ModelViewSet):
     """
     API endpoint for reading and writing product feedback.
+    - Keyset-paginated: {"next": <url or null>, "results": [...]}
+    - ?product=<id>&sort=recent|helpful; first pages are served from the reviews cache
+    - POST /api/feedback/{id}/helpful/ marks a review as helpful
     """
     queryset = Feedback.objects.all()
     serializer_class = FeedbackSerializer
+    pagination_class = KeysetPagination
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [permissions.AllowAny]
         elif self.action == 'create':
             permission_classes = [permissions.IsAuthenticated, IsCustomer]
+        elif self.action == 'helpful':
+            permission_classes = [permissions.IsAuthenticated]
         else: 
             permission_classes = [permissions.IsAuthenticated, IsOwnerOfFeedbackOrReadOnly]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.action in ['update', 'partial_update', 'destroy']:
+            # --- ADDED: someone else's feedback is a 404 without being loaded first ---
+            queryset = queryset.filter(customer_id=self.request.user.pk)
         product_id = self.request.query_params.get('product')
         if product_id:
             queryset = queryset.filter(product_id=product_id)
-        return queryset
+        return FeedbackSerializer.prepare_queryset(queryset, Fieldset.from_request(self.request))
+
+    @property
+    def review_sort(self):
+        sort = self.request.query_params.get('sort')
+        return sort if sort in REVIEW_ORDERINGS else DEFAULT_REVIEW_SORT
+
+    @property
+    def keyset_ordering(self):
+        # Read by KeysetPagination
+        return REVIEW_ORDERINGS[self.review_sort]
+
+    def list(self, request, *args, **kwargs):
+        product_id = request.query_params.get('product', '')
+        cacheable = (
+            product_id.isdigit()
+            and self.paginator.cursor_query_param not in request.query_params
+            and Fieldset.from_request(request).is_default
+        )
+        if not cacheable:
+            return super().list(request, *args, **kwargs)
 
+        key = review_cache_key(int(product_id), self.review_sort)
+        page = review_cache().get(key)
+        if page is None:
+            rows = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+            page = {
+                'results': list(self.get_serializer(rows, many=True).data),
+                'cursor': self.paginator.get_next_cursor(),
+            }
+            review_cache().set(key, page)
+        return Response({
+            'next': self.paginator.get_link(request, page['cursor']),
+            'results': page['results'],
+        })
+
+    # --- ADDED: keep Product rating aggregates and the reviews cache in step ---
+    # Rating aggregates and cached review pages follow Feedback saves and deletes (see store.ratings)
     def perform_create(self, serializer):
-        serializer.save(customer=self.request.user)
+        with transaction.atomic():
+            serializer.save(customer=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
+    @action(detail=True, methods=['post'])
+    def helpful(self, request, pk=None):
+        """
+        Marks a review as helpful; voting twice has no further effect.
+        ACCESS: Any logged-in user.
+        """
+        feedback = self.get_object()
+        with transaction.atomic():
+            _, created = FeedbackVote.objects.get_or_create(feedback=feedback, user=request.user)
+            if created:
+                Feedback.objects.filter(pk=feedback.pk).update(helpful_count=F('helpful_count') + 1)
+                invalidate_reviews(feedback.product_id)
+        feedback.refresh_from_db(fields=['helpful_count'])
+        return Response({'helpful_count': feedback.helpful_count})
 
-class RetailerViewSet(viewsets.ReadOnlyModelViewSet):
+
+class RetailerViewSet(AsyncReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     API to list shops.
     Supports location filtering: ?lat=12.34&lon=56.78&radius=10
+    Async twin under ASGI: /api/async/shops/
+    Bookable delivery slots of a shop: /api/shops/<id>/slots/
     """
     serializer_class = RetailerListSerializer
     permission_classes = [permissions.AllowAny]
@@ -160,8 +497,21 @@ class RetailerViewSet(viewsets.ReadOnlyModelViewSet):
         return RetailerProfile.objects.all()
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
+        return self.get_nearby_response(self.get_queryset())
+
+    async def async_list(self, request, *args, **kwargs):
+        return self.get_nearby_response([retailer async for retailer in self.get_queryset()])
+
+    # --- ADDED: delivery slots still open for scheduled_delivery_date ---
+    @action(detail=True, methods=['get'])
+    def slots(self, request, pk=None):
+        """ The free one-hour slots of the next SLOT_DAYS_AHEAD days (see orders.slots). """
+        retailer = self.get_object()
+        return Response({'shop': retailer.pk, 'days': available_slots(retailer.pk)})
+
+    def get_nearby_response(self, queryset):
+        """ All shops, or those within ?radius= km of ?lat=&lon=, nearest first. """
+        request = self.request
         user_lat = request.query_params.get('lat')
         user_lon = request.query_params.get('lon')
         radius = float(request.query_params.get('radius', 50)) 
@@ -194,4 +544,27 @@ class RetailerViewSet(viewsets.ReadOnlyModelViewSet):
             return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(nearby_retailers, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class RegionViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API to list catalog regions.
+    Find the region of a point: /api/regions/locate/?lat=12.34&lon=56.78
+    ACCESS: Anyone
+    """
+    queryset = Region.objects.order_by('name')
+    serializer_class = RegionSerializer
+    permission_classes = [permissions.AllowAny]
+
+    @action(detail=False, methods=['get'])
+    def locate(self, request):
+        try:
+            lat = float(request.query_params['lat'])
+            lon = float(request.query_params['lon'])
+        except (KeyError, ValueError):
+            raise ValidationError({'detail': '"lat" and "lon" are required numbers.'})
+        region = Region.for_coordinates(lat, lon)
+        if region is None:
+            return Response({'detail': 'No region covers this location.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(region).data)
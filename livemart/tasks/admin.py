@@ -0,0 +1,29 @@
+from django.contrib import admin
+from .models import Task, DeadTask
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('last_error', 'locked_by', 'locked_at', 'created_at')
+
+@admin.register(DeadTask)
+class DeadTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'attempts', 'failed_at')
+    list_filter = ('name',)
+    readonly_fields = ('name', 'kwargs', 'attempts', 'error', 'created_at', 'failed_at')
+    actions = ['requeue']
+
+    @admin.action(description="Requeue the selected tasks")
+    def requeue(self, request, queryset):
+        from .queue import TASKS, DEFAULT_MAX_ATTEMPTS
+        dead = list(queryset)
+        Task.objects.bulk_create([
+            Task(
+                name=item.name, kwargs=item.kwargs,
+                max_attempts=getattr(TASKS.get(item.name), 'max_attempts', DEFAULT_MAX_ATTEMPTS),
+            )
+            for item in dead
+        ])
+        queryset.delete()
+        self.message_user(request, f"Requeued {len(dead)} tasks.")
@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from tasks.queue import claim_jobs, run_in_worker_thread
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background tasks (emails, geocoding, image processing, imports) "
+        "on a thread pool. Keep one or more of these running next to the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Tasks run concurrently.")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due instead of polling.")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='task') as pool:
+            try:
+                while True:
+                    # Claim a pool's worth at a time so other workers can share the queue
+                    jobs = claim_jobs(workers)
+                    if not jobs:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll'])
+                        continue
+                    for ok in pool.map(run_in_worker_thread, jobs):
+                        done += ok
+                        failed += not ok
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {done + failed} jobs ({failed} failed)."))
@@ -0,0 +1,52 @@
+from django.db import models
+from django.utils import timezone
+
+# --- OOP Class Design (Background tasks) ---
+
+
+class Task(models.Model):
+    """
+    One queued call of a registered task function (see tasks.queue).
+    Rows are deleted once the call succeeds; calls that keep failing
+    end up in DeadTask.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Not picked up before this time (set to now + backoff after a failure)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    # Which worker claimed it and when (renewed while it runs); a RUNNING row
+    # whose lease ran out is claimed again, or moved to DeadTask after its last attempt
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class DeadTask(models.Model):
+    """ A task that failed on every attempt, kept for inspection and manual requeueing. """
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} (failed {self.failed_at:%Y-%m-%d %H:%M})"
@@ -0,0 +1,241 @@
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from livemart.streaming import batched
+from .models import Task, DeadTask
+
+# =========================================
+# === BACKGROUND TASK QUEUE
+# =========================================
+#
+# Slow side effects (SMTP, geocoding, image processing, big imports) do not
+# run in the request. The request only enqueues them:
+#
+#     @task(max_attempts=5)
+#     def notify_item_delivered(item_id): ...
+#
+#     notify_item_delivered.delay(item_id=item.pk)
+#
+# delay() writes a Task row once the current transaction commits, so a
+# worker never sees a task whose data was rolled back. `manage.py run_tasks`
+# claims due rows and runs them on a thread pool. A failed call is retried
+# with exponential backoff; after max_attempts it moves to DeadTask.
+#
+# A claimed task holds a lease (LEASE_SECONDS) that the worker renews every
+# HEARTBEAT_SECONDS while the task runs, however long it takes. A lease only
+# runs out when the worker died; the task is then claimed again, or moved to
+# DeadTask if that was already its last attempt.
+#
+# Task kwargs are stored as JSON: pass ids, not model instances.
+#
+# A batch task (@task(batch_size=200)) is called once with the kwargs of up
+# to batch_size queued calls, so e.g. 200 queued emails share one SMTP
+# connection. A failed batch is retried as a whole: delivery is at least once.
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+# A RUNNING task whose worker died is claimed again after this long
+LEASE_SECONDS = 10 * 60
+# How often a running task's lease is renewed
+HEARTBEAT_SECONDS = LEASE_SECONDS / 5
+
+TASKS = {}
+
+
+class RegisteredTask:
+    def __init__(self, func, max_attempts, batch_size=None):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, countdown=0, **kwargs):
+        """ Queues a call once the current transaction commits (immediately outside one). """
+        enqueue(self.name, kwargs, max_attempts=self.max_attempts, countdown=countdown)
+
+    def run(self, calls):
+        """ Runs the queued calls of one job: each kwargs dict in turn, or all at once for a batch task. """
+        if self.batch_size:
+            self.func(calls)
+        else:
+            for kwargs in calls:
+                self.func(**kwargs)
+
+
+def task(func=None, *, max_attempts=DEFAULT_MAX_ATTEMPTS, batch_size=None):
+    """
+    Registers a function as a task: `@task`, `@task(max_attempts=1)`.
+    With batch_size, the function takes one argument: a list of kwargs dicts.
+    """
+    def register(func):
+        registered = RegisteredTask(func, max_attempts, batch_size)
+        TASKS[registered.name] = registered
+        return registered
+    return register(func) if func is not None else register
+
+
+def enqueue(name, kwargs, max_attempts=DEFAULT_MAX_ATTEMPTS, countdown=0):
+    def write():
+        Task.objects.create(
+            name=name, kwargs=kwargs, max_attempts=max_attempts,
+            run_at=timezone.now() + timedelta(seconds=countdown),
+        )
+    transaction.on_commit(write)
+
+
+def backoff(attempts):
+    """ Seconds to wait before the next try: 10s, 20s, 40s, ... capped at an hour. """
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+
+def _expired(now):
+    return Q(status=Task.Status.RUNNING, locked_at__lt=now - timedelta(seconds=LEASE_SECONDS))
+
+
+def _due(now):
+    return Q(status=Task.Status.PENDING, run_at__lte=now) | (_expired(now) & Q(attempts__lt=F('max_attempts')))
+
+
+def _bury_expired(now):
+    """ Moves tasks whose worker died during their last attempt to DeadTask instead of running them again. """
+    for expired in Task.objects.filter(_expired(now), attempts__gte=F('max_attempts')):
+        with transaction.atomic():
+            # Conditional DELETE: only one worker gets to bury it
+            if Task.objects.filter(pk=expired.pk, locked_by=expired.locked_by, locked_at=expired.locked_at).delete()[0]:
+                DeadTask.objects.create(
+                    name=expired.name, kwargs=expired.kwargs, attempts=expired.attempts,
+                    error=f'Lease expired: the worker running attempt {expired.attempts} stopped.',
+                    created_at=expired.created_at,
+                )
+
+
+def _claim(queryset, token, now, limit):
+    ids = list(queryset.order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    if ids:
+        # Conditional UPDATE: a row another worker claimed meanwhile no longer matches
+        Task.objects.filter(_due(now), pk__in=ids).update(
+            status=Task.Status.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return ids
+
+
+def claim_jobs(limit):
+    """
+    Marks up to `limit` due tasks as RUNNING for this worker and returns them
+    as jobs (lists of Task rows run together). A batch task also takes along
+    the other due calls of the same name, up to its batch_size.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    _bury_expired(now)
+    if not _claim(Task.objects.filter(_due(now)), token, now, limit):
+        return []
+    names = set(Task.objects.filter(locked_by=token).values_list('name', flat=True))
+    for name in names:
+        registered = TASKS.get(name)
+        if registered is not None and registered.batch_size:
+            claimed = Task.objects.filter(locked_by=token, name=name).count()
+            extra = registered.batch_size - claimed
+            if extra > 0:
+                _claim(Task.objects.filter(_due(now), name=name), token, now, extra)
+
+    jobs = []
+    batches = {}
+    for claimed in Task.objects.filter(locked_by=token).order_by('run_at', 'id'):
+        registered = TASKS.get(claimed.name)
+        if registered is not None and registered.batch_size:
+            batches.setdefault(claimed.name, []).append(claimed)
+        else:
+            jobs.append([claimed])
+    for name, rows in batches.items():
+        jobs.extend(batched(rows, TASKS[name].batch_size))
+    return jobs
+
+
+def _failed(claimed, error, give_up):
+    mine = Task.objects.filter(pk=claimed.pk, locked_by=claimed.locked_by)
+    if give_up or claimed.attempts >= claimed.max_attempts:
+        with transaction.atomic():
+            DeadTask.objects.create(
+                name=claimed.name, kwargs=claimed.kwargs, attempts=claimed.attempts,
+                error=error, created_at=claimed.created_at,
+            )
+            mine.delete()
+    else:
+        mine.update(
+            status=Task.Status.PENDING, locked_by='', locked_at=None, last_error=error,
+            run_at=timezone.now() + timedelta(seconds=backoff(claimed.attempts)),
+        )
+
+
+@contextmanager
+def _heartbeat(job):
+    """ Renews the job's lease from a side thread until the block exits. """
+    ids = [claimed.pk for claimed in job]
+    token = job[0].locked_by
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(HEARTBEAT_SECONDS):
+                try:
+                    Task.objects.filter(pk__in=ids, locked_by=token).update(locked_at=timezone.now())
+                except DatabaseError:
+                    pass  # try again next beat; the lease still has time left
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'{threading.current_thread().name}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_job(job):
+    """ Runs one claimed job and records the outcome. Returns True on success. """
+    first = job[0]
+    registered = TASKS.get(first.name)
+    try:
+        if registered is None:
+            raise LookupError(f'No task named "{first.name}" is registered.')
+        with _heartbeat(job):
+            registered.run([claimed.kwargs for claimed in job])
+    except Exception:
+        error = traceback.format_exc()
+        print(f"Task {first.name} ({len(job)} calls) failed: {error.strip().splitlines()[-1]}")
+        for claimed in job:
+            _failed(claimed, error, give_up=registered is None)
+        return False
+    Task.objects.filter(pk__in=[claimed.pk for claimed in job], locked_by=first.locked_by).delete()
+    return True
+
+
+def run_in_worker_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        # Each pool thread has its own connection; don't leave it open between jobs
+        connection.close()
+
+
+def run_pending(limit=100):
+    """ Runs due tasks in the calling thread (tests, one-off draining). Returns how many jobs ran. """
+    jobs = claim_jobs(limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
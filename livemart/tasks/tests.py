@@ -0,0 +1,133 @@
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .models import Task, DeadTask
+from .queue import task, run_pending, claim_jobs, backoff, run_in_worker_thread
+
+calls = []
+
+
+@task(max_attempts=3)
+def record(value):
+    calls.append(value)
+
+
+@task(batch_size=3)
+def record_batch(batch):
+    calls.append(sorted(kwargs['value'] for kwargs in batch))
+
+
+@task(max_attempts=2)
+def explode():
+    raise ConnectionError('SMTP is down')
+
+
+@task(max_attempts=1)
+def outlive_the_heartbeat():
+    before = Task.objects.get().locked_at
+    time.sleep(0.2)
+    calls.append(Task.objects.get().locked_at > before)
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_only_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.delay(value=1)
+            self.assertFalse(Task.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Task.objects.get().name, 'tasks.tests.record')
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())  # done rows are removed
+
+    def test_failures_back_off_then_dead_letter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            explode.delay()
+
+        start = timezone.now()
+        self.assertEqual(run_pending(), 1)
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('PENDING', 1))
+        self.assertIn('SMTP is down', queued.last_error)
+        self.assertGreaterEqual(queued.run_at, start + timedelta(seconds=backoff(1)))
+        self.assertEqual(run_pending(), 0)  # not due yet
+
+        Task.objects.update(run_at=timezone.now())
+        run_pending()
+        self.assertFalse(Task.objects.exists())
+        dead = DeadTask.objects.get()
+        self.assertEqual((dead.name, dead.attempts), ('tasks.tests.explode', 2))
+
+    def test_claims_are_exclusive_and_leases_expire(self):
+        Task.objects.create(name='tasks.tests.record', kwargs={'value': 1})
+        self.assertEqual(len(claim_jobs(10)), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+        # A worker that died mid-task: its lease runs out and the task is claimed again
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(claim_jobs(10)[0][0].attempts, 2)
+
+        # ... unless that was its last attempt: then it is dead, not run twice
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1), max_attempts=2)
+        self.assertEqual(claim_jobs(10), [])
+        self.assertFalse(Task.objects.exists())
+        self.assertIn('Lease expired', DeadTask.objects.get().error)
+
+    def test_batch_tasks_take_other_due_calls_along(self):
+        Task.objects.bulk_create([Task(name='tasks.tests.record_batch', kwargs={'value': value}) for value in range(5)])
+        self.assertEqual(run_pending(limit=1), 1)
+        self.assertEqual(run_pending(limit=1), 1)
+        self.assertEqual(calls, [[0, 1, 2], [3, 4]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_unknown_task_goes_to_dead_letter(self):
+        Task.objects.create(name='tasks.tests.removed_long_ago')
+        run_pending()
+        self.assertIn('LookupError', DeadTask.objects.get().error)
+
+
+class RunTasksCommandTest(TransactionTestCase):
+    def setUp(self):
+        # The pool threads open their own connections: have their SQLite transactions take
+        # the write lock up front, so concurrent writers wait for it instead of failing
+        # with "database is locked". Only connections opened during the test are affected.
+        options = connection.settings_dict['OPTIONS']
+        patcher = patch.dict(options, {'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_worker_pool_drains_the_queue(self):
+        calls.clear()
+        for value in range(6):
+            record.delay(value=value)  # outside a transaction: written immediately
+        threads = set()
+
+        def run_and_record_thread(job):
+            threads.add(threading.get_ident())
+            time.sleep(0.05)  # long enough for the pool to start its other threads
+            return run_in_worker_thread(job)
+
+        with patch('sys.stdout'), patch('tasks.management.commands.run_tasks.run_in_worker_thread', run_and_record_thread):
+            call_command('run_tasks', workers=3, once=True)
+        self.assertEqual(sorted(calls), list(range(6)))
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(len(threads), 3)  # the jobs really ran side by side
+
+    def test_running_tasks_renew_their_lease(self):
+        calls.clear()
+        outlive_the_heartbeat.delay()
+        with patch('tasks.queue.HEARTBEAT_SECONDS', 0.02):
+            self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [True])
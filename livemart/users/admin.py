@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, CustomerProfile, RetailerProfile, WholesalerProfile
+from .models import User, CustomerProfile, RetailerProfile, WholesalerProfile, Region
 
 # We're just modifying the base User admin to show our new 'role' field
 class CustomUserAdmin(BaseUserAdmin):
@@ -20,7 +20,13 @@ class CustomerProfileAdmin(admin.ModelAdmin):
 class RetailerProfileAdmin(admin.ModelAdmin):
     # We replace 'shop_address' with the actual fields:
     # 'location_lat' and 'location_lon'
-    list_display = ('user', 'shop_name', 'location_lat', 'location_lon')
+    list_display = ('user', 'shop_name', 'location_lat', 'location_lon', 'region')
+    list_filter = ('region',)
+
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'center_lat', 'center_lon', 'radius_km')
+    prepopulated_fields = {'slug': ('name',)}
 
 # --- THIS IS THE FIX ---
 @admin.register(WholesalerProfile)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "users"
+
+    def ready(self):
+        # Connect the auth cache invalidation receivers, and refuse a per-process cache in production
+        from .authentication import check_auth_cache
+        check_auth_cache()
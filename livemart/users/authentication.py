@@ -0,0 +1,163 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import User, CustomerProfile, RetailerProfile, WholesalerProfile
+
+# =========================================
+# === CACHED TOKEN AUTHENTICATION
+# =========================================
+#
+# DRF's TokenAuthentication reads the token and its user on every request,
+# and views then load the user's profile with another query. Here a cache
+# miss loads the token, its user and the user's profile with ONE query, and
+# the bounded cache settings.CACHES['auth'] keeps what requests need of
+# them: the user's id, username, role and permission flags, and the id of
+# the profile matching the role. A cache hit rebuilds request.user and its
+# profile from that without any query; their other columns (never cached,
+# so no password hashes in the cache) load on first access.
+#
+# Entries are dropped on logout (the token is deleted) and whenever the
+# user or their profile is saved or deleted (role change, deactivation,
+# new shop address...). QuerySet.update() sends no signals: call
+# invalidate_user() after bulk updates of users.
+#
+# Revocation must reach every process, so outside DEBUG the 'auth' cache
+# has to be shared (Redis, Memcached, the database cache): the app refuses
+# to start with a per-process LocMemCache.
+
+# Cache backends that are private to one process
+PROCESS_LOCAL_CACHES = {'django.core.cache.backends.locmem.LocMemCache'}
+
+# The User columns kept in the cache
+CACHED_USER_FIELDS = ('id', 'username', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+
+def auth_cache():
+    return caches['auth']
+
+
+def check_auth_cache():
+    """ Raises ImproperlyConfigured when revoked tokens could stay valid in other processes. """
+    backend = settings.CACHES['auth']['BACKEND']
+    if not settings.DEBUG and backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f"CACHES['auth'] uses {backend}, which is private to each process: a logged-out or "
+            "deactivated user would stay authenticated in the others. Use a shared cache backend."
+        )
+
+
+def token_cache_key(key):
+    # Tokens are credentials: don't use them as-is in (possibly shared) cache keys
+    return 'token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _partial_instance(model, values):
+    """ A model instance as if loaded from the database with only `values`; other fields are deferred. """
+    fields = model._meta.concrete_fields
+    return model.from_db(
+        router.db_for_read(model), [field.attname for field in fields],
+        [values.get(field.attname, DEFERRED) for field in fields],
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ TokenAuthentication backed by settings.CACHES['auth']. Same header: `Authorization: Token <key>`. """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        entry = auth_cache().get(cache_key)
+        if entry is not None:
+            token = self.token_from_entry(key, entry)
+        else:
+            token = self.load_token(key)
+            auth_cache().set(cache_key, self.entry_for(token))
+        return token.user, token
+
+    def load_token(self, key):
+        """ The token with its user and the user's profile (see User.profile), in one query. """
+        profiles = [f'user__{relation}' for relation in User.PROFILE_RELATIONS.values()]
+        try:
+            token = Token.objects.select_related('user', *profiles).get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return token
+
+    @staticmethod
+    def entry_for(token):
+        """ What the cache keeps for a token: the user's CACHED_USER_FIELDS and their profile's id. """
+        user = token.user
+        profile = user.profile
+        return {
+            'user': {name: getattr(user, name) for name in CACHED_USER_FIELDS},
+            'profile_id': profile.pk if profile is not None else None,
+        }
+
+    @staticmethod
+    def token_from_entry(key, entry):
+        """ The token, its user and the user's profile rebuilt from a cache entry, without queries. """
+        user = _partial_instance(User, entry['user'])
+        relation = User.PROFILE_RELATIONS.get(user.role)
+        if relation is not None:
+            related = getattr(User, relation).related
+            profile = None
+            if entry['profile_id'] is not None:
+                profile = _partial_instance(related.related_model, {related.field.attname: entry['profile_id']})
+                related.field.set_cached_value(profile, user)
+            # A cached None answers user.profile too: the role's profile doesn't exist yet
+            related.set_cached_value(user, profile)
+
+        token = _partial_instance(Token, {'key': key, 'user_id': user.pk})
+        Token._meta.get_field('user').set_cached_value(token, user)
+        return token
+
+
+def invalidate_tokens(*keys):
+    """ Forgets these tokens now and again once the current transaction commits. """
+    cache_keys = [token_cache_key(key) for key in keys]
+    if not cache_keys:
+        return
+    # The second pass catches a request that cached the old rows before the commit
+    auth_cache().delete_many(cache_keys)
+    transaction.on_commit(lambda: auth_cache().delete_many(cache_keys))
+
+
+def invalidate_user(user_id):
+    invalidate_tokens(*Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token, dispatch_uid='users.authentication.on_token_deleted')
+def on_token_deleted(sender, instance, **kwargs):
+    # dj-rest-auth's logout deletes the token
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=User, dispatch_uid='users.authentication.on_user_saved')
+def on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Logging in only bumps last_login, which nothing reads from request.user
+    if created or update_fields == frozenset(['last_login']):
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=CustomerProfile, dispatch_uid='users.authentication.on_customer_saved')
+@receiver(post_save, sender=RetailerProfile, dispatch_uid='users.authentication.on_retailer_saved')
+@receiver(post_save, sender=WholesalerProfile, dispatch_uid='users.authentication.on_wholesaler_saved')
+@receiver(post_delete, sender=CustomerProfile, dispatch_uid='users.authentication.on_customer_deleted')
+@receiver(post_delete, sender=RetailerProfile, dispatch_uid='users.authentication.on_retailer_deleted')
+@receiver(post_delete, sender=WholesalerProfile, dispatch_uid='users.authentication.on_wholesaler_deleted')
+def on_profile_changed(sender, instance, **kwargs):
+    # Profiles share their user's primary key
+    invalidate_user(instance.pk)
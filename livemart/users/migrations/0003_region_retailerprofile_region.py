@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_retailerprofile_shop_address"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Region",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("slug", models.SlugField(unique=True)),
+                ("center_lat", models.DecimalField(decimal_places=6, max_digits=9)),
+                ("center_lon", models.DecimalField(decimal_places=6, max_digits=9)),
+                ("radius_km", models.FloatField(default=25)),
+                (
+                    "catalog_changed_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="retailerprofile",
+            name="region",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="retailers",
+                to="users.region",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_region_retailerprofile_region"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="calendar_secret",
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from geopy.distance import geodesic
 
 # --- OOP Class Design (Users) ---
 
@@ -39,9 +41,31 @@ class User(AbstractUser):
         related_query_name="user",
     )
     
+    # --- ADDED: part of the signed calendar feed URLs (orders.calendar); changing it revokes them ---
+    calendar_secret = models.CharField(max_length=32, blank=True)
+
+    # --- ADDED: the profile each role has (reverse one-to-one accessors) ---
+    PROFILE_RELATIONS = {
+        Role.CUSTOMER: 'customerprofile',
+        Role.RETAILER: 'retailerprofile',
+        Role.WHOLESALER: 'wholesalerprofile',
+    }
+
     def __str__(self):
         return self.username
 
+    @property
+    def profile(self):
+        """
+        The profile matching this user's role, or None when it has not been created.
+        Loaded at most once per User instance, i.e. once per request; users
+        authenticated by users.authentication arrive with it already loaded.
+        """
+        try:
+            return getattr(self, self.PROFILE_RELATIONS[self.role])
+        except (KeyError, ObjectDoesNotExist):
+            return None
+
 # --- Profile Models ---
 
 class CustomerProfile(models.Model):
@@ -53,6 +77,36 @@ class CustomerProfile(models.Model):
     def __str__(self):
         return f"Customer: {self.user.username}"
 
+class Region(models.Model):
+    """
+    A catalog region: a circle around a center point.
+    Retailers belong to the region that contains their shop (see RetailerProfile.save).
+    """
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(unique=True)
+    center_lat = models.DecimalField(max_digits=9, decimal_places=6)
+    center_lon = models.DecimalField(max_digits=9, decimal_places=6)
+    radius_km = models.FloatField(default=25)
+    # Bumped whenever a product starts or stops being available here (store.regions)
+    catalog_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_coordinates(cls, lat, lon, regions=None):
+        """
+        The region with the nearest center whose circle contains the point, or None.
+        Pass `regions` to reuse an already loaded list.
+        """
+        point = (float(lat), float(lon))
+        best, best_km = None, None
+        for region in (cls.objects.all() if regions is None else regions):
+            km = geodesic(point, (float(region.center_lat), float(region.center_lon))).km
+            if km <= region.radius_km and (best_km is None or km < best_km):
+                best, best_km = region, km
+        return best
+
 class RetailerProfile(models.Model):
     """Profile for a Retailer, linked to the main User."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='retailerprofile')
@@ -65,14 +119,35 @@ class RetailerProfile(models.Model):
     location_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     location_lon = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
+    # --- ADDED: catalog region, derived from the coordinates on save ---
+    region = models.ForeignKey(Region, on_delete=models.SET_NULL, null=True, blank=True, related_name='retailers')
+
+    # --- ADDED for conditional GET: inventory lists show the shop name ---
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Retailer: {self.shop_name} ({self.user.username})"
 
+    def save(self, *args, **kwargs):
+        # store.regions uses this to refresh the catalogs of both regions after a move
+        self._previous_region_id = self.region_id
+        if self.location_lat is not None and self.location_lon is not None:
+            self.region = Region.for_coordinates(self.location_lat, self.location_lon)
+        else:
+            self.region = None  # coordinates cleared: the shop is in no region any more
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'region'}
+        super().save(*args, **kwargs)
+
 class WholesalerProfile(models.Model):
     """Profile for a Wholesaler, linked to the main User."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='wholesalerprofile')
     business_name = models.CharField(max_length=100)
     warehouse_location = models.CharField(max_length=255, blank=True)
 
+    # --- ADDED for conditional GET: inventory lists show the business name ---
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"Wholesaler: {self.business_name} ({self.user.username})"
\ No newline at end of file
@@ -57,6 +57,8 @@ class IsOwnerOfInventory(BasePermission):
     """
     Object-level permission to only allow owners of an inventory item to edit it.
     Assumes the object has 'retailer' or 'wholesaler' attributes.
+    InventoryViewSet already scopes sellers' querysets to their own items, so
+    this is a second line of defence that costs no queries.
     """
     message = "You do not have permission to edit this inventory item."
 
@@ -64,10 +66,12 @@ class IsOwnerOfInventory(BasePermission):
         # Read permissions are allowed for any request (e.g., GET, HEAD, OPTIONS)
         # This is handled by the View's get_permissions() method.
         # This check is for write permissions.
-        if obj.retailer:
-            return obj.retailer.user == request.user
-        if obj.wholesaler:
-            return obj.wholesaler.user == request.user
+        # --- UPDATED: compare foreign key ids; profiles share their user's primary key,
+        # so no RetailerProfile/WholesalerProfile or User row is loaded ---
+        if obj.retailer_id is not None:
+            return obj.retailer_id == request.user.pk
+        if obj.wholesaler_id is not None:
+            return obj.wholesaler_id == request.user.pk
         return False
 
 class IsOwnerOfFeedbackOrReadOnly(BasePermission):
@@ -83,4 +87,5 @@ class IsOwnerOfFeedbackOrReadOnly(BasePermission):
             return True
         
         # Write permissions are only allowed to the customer who wrote it
-        return obj.customer == request.user
\ No newline at end of file
+        # --- UPDATED: compare ids instead of loading obj.customer ---
+        return obj.customer_id == request.user.pk
\ No newline at end of file
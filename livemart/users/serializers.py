@@ -2,11 +2,8 @@ from rest_framework import serializers
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from django.db import transaction
 from .models import User, CustomerProfile, RetailerProfile, WholesalerProfile
+from .tasks import geocode_retailer
 
-# --- IMPORT GEOPY ---
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-# --------------------
 
 class CustomRegisterSerializer(RegisterSerializer):
     """
@@ -32,32 +29,6 @@ class CustomRegisterSerializer(RegisterSerializer):
     business_name = serializers.CharField(max_length=100, required=False, allow_blank=True)
     warehouse_location = serializers.CharField(max_length=255, required=False, allow_blank=True)
 
-    # --- HELPER FUNCTION FOR GEOCODING (FREE) ---
-    def get_lat_lon(self, address_string):
-        """
-        Converts an address string to (lat, lon) using OpenStreetMap (Nominatim).
-        No API key required.
-        """
-        if not address_string:
-            return None, None
-            
-        try:
-            # IMPORTANT: Provide a unique user_agent to identify your app
-            geolocator = Nominatim(user_agent="livemart_project_edu_app")
-            
-            # timeout=10 prevents hanging if the free service is slow
-            location = geolocator.geocode(address_string, timeout=10)
-            
-            if location:
-                return location.latitude, location.longitude
-            else:
-                print(f"Warning: Address '{address_string}' could not be geocoded.")
-                return None, None
-                
-        except (GeocoderTimedOut, GeocoderServiceError) as e:
-            print(f"Geocoding service error: {e}")
-            return None, None
-    # --------------------------------------------
 
     @transaction.atomic
     def save(self, request):
@@ -95,17 +66,16 @@ class CustomRegisterSerializer(RegisterSerializer):
                 if not shop_name:
                     raise serializers.ValidationError({'shop_name': 'Shop name is required for retailers.'})
                 
-                # --- GEOCODING LOGIC ---
-                # Calculate coordinates from the address
-                lat, lon = self.get_lat_lon(shop_address)
-                
                 RetailerProfile.objects.create(
                     user=user,
                     shop_name=shop_name,
                     shop_address=shop_address,
-                    location_lat=lat, # Saved automatically
-                    location_lon=lon  # Saved automatically
                 )
+
+                # --- GEOCODING LOGIC ---
+                # Coordinates are looked up by the task worker after signup commits
+                if shop_address:
+                    geocode_retailer.delay(user_id=user.pk)
             
             elif role == User.Role.WHOLESALER:
                 business_name = self.validated_data.get('business_name')
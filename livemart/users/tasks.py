@@ -0,0 +1,35 @@
+from decimal import Decimal
+
+from geopy.geocoders import Nominatim
+
+from tasks.queue import task
+from .models import RetailerProfile
+
+
+def geocode_address(address_string):
+    """
+    Converts an address string to (lat, lon) using OpenStreetMap (Nominatim).
+    No API key required. Returns (None, None) when the address is unknown;
+    service errors (timeouts, rate limits) are raised so the task is retried.
+    """
+    # IMPORTANT: Provide a unique user_agent to identify your app
+    geolocator = Nominatim(user_agent="livemart_project_edu_app")
+    location = geolocator.geocode(address_string, timeout=10)
+    if location is None:
+        print(f"Warning: Address '{address_string}' could not be geocoded.")
+        return None, None
+    return location.latitude, location.longitude
+
+
+@task
+def geocode_retailer(user_id):
+    """ Fills in a new shop's coordinates (and so its region) from its address. """
+    retailer = RetailerProfile.objects.filter(pk=user_id).first()
+    if retailer is None or not retailer.shop_address:
+        return
+    lat, lon = geocode_address(retailer.shop_address)
+    if lat is None:
+        return
+    retailer.location_lat = Decimal(str(round(lat, 6)))
+    retailer.location_lon = Decimal(str(round(lon, 6)))
+    retailer.save(update_fields=['location_lat', 'location_lon'])
@@ -1,10 +1,16 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from django.core import mail
 import re
 
+from .authentication import CachedTokenAuthentication, auth_cache, check_auth_cache, token_cache_key
+from .models import CustomerProfile, RetailerProfile
+
 User = get_user_model()
 
 class EmailVerificationFlowTest(TestCase):
@@ -80,4 +86,51 @@ class EmailVerificationFlowTest(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('key', response.data)
-        print(f"   Login Successful! Token: {response.data['key']}")
\ No newline at end of file
+        print(f"   Login Successful! Token: {response.data['key']}")
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        auth_cache().clear()
+        self.user = User.objects.create_user(username='cached', password='pw', role=User.Role.CUSTOMER)
+        CustomerProfile.objects.create(user=self.user, address='1 Main St')
+        self.key = Token.objects.create(user=self.user).key
+        self.auth = CachedTokenAuthentication()
+
+    def test_cache_hit_costs_no_queries(self):
+        with self.assertNumQueries(1):
+            user, token = self.auth.authenticate_credentials(self.key)
+            self.assertEqual(user.profile.address, '1 Main St')
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.key)
+            self.assertEqual((token.key, user.role, user.profile.pk), (self.key, User.Role.CUSTOMER, self.user.pk))
+        # Other columns load when read; the cache holds no password hash
+        with self.assertNumQueries(1):
+            self.assertEqual(user.profile.address, '1 Main St')
+        self.assertNotIn(self.user.password, str(auth_cache().get(token_cache_key(self.key))))
+
+    def test_per_process_cache_refused_in_production(self):
+        with override_settings(DEBUG=False):
+            with self.assertRaises(ImproperlyConfigured):
+                check_auth_cache()
+            shared = {**settings.CACHES, 'auth': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache'}}
+            with override_settings(CACHES=shared):
+                check_auth_cache()
+
+    def test_role_change_and_profile_edits_invalidate(self):
+        self.auth.authenticate_credentials(self.key)
+        self.user.role = User.Role.RETAILER
+        self.user.save()
+        user, _ = self.auth.authenticate_credentials(self.key)
+        self.assertEqual(user.role, User.Role.RETAILER)
+        self.assertIsNone(user.profile)  # no retailer profile yet
+
+        RetailerProfile.objects.create(user=self.user, shop_name='Corner Shop')
+        user, _ = self.auth.authenticate_credentials(self.key)
+        self.assertEqual(user.profile.shop_name, 'Corner Shop')
+
+    def test_logout_revokes_the_cached_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+        self.assertEqual(client.get('/api/orders/').status_code, status.HTTP_200_OK)
+        self.assertEqual(client.post('/api/auth/logout/').status_code, status.HTTP_200_OK)
+        self.assertEqual(client.get('/api/orders/').status_code, status.HTTP_401_UNAUTHORIZED)